@@ -1,109 +1,255 @@
-from typing import Annotated, Any
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-import shutil
 import os
+from typing import Annotated, Any, List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.orm import undefer, undefer_group
 import json
 
 from app.api import deps
+from app.core.config import settings
+from app.core.metrics import timed_stage
 from app.models.user import User
 from app.models.course import Course, Lesson, Module
-from app.services.video_processing import extract_audio, generate_video_insights
-from app.services.chunking import chunk_text
-from app.models.rag import DocumentChunk
-from app.services.embeddings import get_embedding
+from app.crud import jobs as jobs_crud
+from app.crud import courses as courses_crud
+from app.crud import rag as rag_crud
+from app.models.job import JobType, ProcessingJob
+from app.schemas.job import ProcessingStatus
+from app.schemas.course import CoursePage, CourseSummary, ModulePage, ModuleSummary, LessonPage, LessonSummary
+from app.services.uploads import save_upload_content_addressed, UploadTooLarge
+from app.services.video_pipeline import create_video_lesson
+from app.services.video_delivery import FileRangeResponse
+from app.services.hls import find_hls_package
 from app.services.playlist_importer import import_youtube_playlist
-from app.models.course import Language
+from app.models.course import Language, CourseCategory, DifficultyLevel, VideoSourceType
 
 router = APIRouter()
 
-async def process_video_task(lesson_id: int, video_path: str, db_session_maker):
+PageSize = Annotated[int, Query(ge=1, le=settings.CATALOGUE_MAX_PAGE_SIZE)]
+
+def _module_summary(module: Module, include_lessons: bool) -> ModuleSummary:
+    return ModuleSummary(
+        id=module.id,
+        course_id=module.course_id,
+        title=module.title,
+        order=module.order,
+        lessons=[LessonSummary.model_validate(lesson) for lesson in module.lessons] if include_lessons else None,
+    )
+
+def _course_summary(course: Course, include: str | None) -> CourseSummary:
+    return CourseSummary(
+        id=course.id,
+        title=course.title,
+        description=course.description,
+        language=course.language,
+        category=course.category,
+        teacher_id=course.teacher_id,
+        modules=[_module_summary(module, include == "lessons") for module in course.modules] if include else None,
+    )
+
+@router.get("/", response_model=CoursePage)
+async def list_courses(
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+    language: Optional[Language] = None,
+    category: Optional[CourseCategory] = None,
+    difficulty: Optional[DifficultyLevel] = None,
+    include: Optional[Literal["modules", "lessons"]] = None,
+    cursor: Optional[str] = None,
+    limit: PageSize = settings.CATALOGUE_PAGE_SIZE,
+):
+    """
+    Course catalogue, one page at a time: pass `next_cursor` back as `cursor`
+    for the next page. `difficulty` keeps courses with lessons of that level.
+    `include` nests each course's modules, or its modules and their lessons
+    (filtered by `difficulty` too), in order.
+    """
+    try:
+        courses, next_cursor = await courses_crud.list_courses(
+            db, limit, cursor, language=language, category=category, difficulty=difficulty,
+            include_modules=include is not None, include_lessons=include == "lessons",
+        )
+    except courses_crud.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return CoursePage(items=[_course_summary(course, include) for course in courses], next_cursor=next_cursor)
+
+@router.get("/{course_id}/modules", response_model=ModulePage)
+async def list_course_modules(
+    course_id: int,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+    difficulty: Optional[DifficultyLevel] = None,
+    include_lessons: bool = False,
+    cursor: Optional[str] = None,
+    limit: PageSize = settings.CATALOGUE_PAGE_SIZE,
+):
     """
-    Background task to process video: Extract Audio -> Insights -> Update DB -> RAG Indexing.
+    A course's modules in order, paginated like the course list.
     """
     try:
-        # 1. Extract Audio
-        audio_path = f"{video_path}.mp3"
-        extract_audio(video_path, audio_path)
-        
-        # 2. Generate Insights with Gemini
-        insights = await generate_video_insights(audio_path)
-        
-        # 3. Update Database (New Session required for background task)
-        async with db_session_maker() as db:
-            stmt = (
-                update(Lesson)
-                .where(Lesson.id == lesson_id)
-                .values(
-                    transcript=insights.get("transcript", ""),
-                    key_takeaways=json.dumps(insights.get("key_takeaways", [])),
-                    chapters=json.dumps(insights.get("chapters", []))
-                )
-            )
-            await db.execute(stmt)
-            
-            # 4. Index Transcript for RAG
-            transcript = insights.get("transcript", "")
-            if transcript:
-                chunks = chunk_text(transcript)
-                for chunk in chunks:
-                    embedding = get_embedding(chunk)
-                    db_chunk = DocumentChunk(
-                        lesson_id=lesson_id,
-                        content=chunk,
-                        embedding=embedding
-                    )
-                    db.add(db_chunk)
-            
-            await db.commit()
-            
-        # Cleanup
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-            
-    except Exception as e:
-        print(f"Background Task Failed: {e}")
+        modules, next_cursor = await courses_crud.list_modules(
+            db, course_id, limit, cursor, difficulty=difficulty, include_lessons=include_lessons,
+        )
+    except courses_crud.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ModulePage(items=[_module_summary(module, include_lessons) for module in modules], next_cursor=next_cursor)
+
+@router.get("/{course_id}/modules/{module_id}/lessons", response_model=LessonPage)
+async def list_module_lessons(
+    course_id: int,
+    module_id: int,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+    difficulty: Optional[DifficultyLevel] = None,
+    cursor: Optional[str] = None,
+    limit: PageSize = settings.CATALOGUE_PAGE_SIZE,
+):
+    """
+    A module's lessons in order, paginated like the course list.
+    Full content is at /lessons/{lesson_id}/context.
+    """
+    try:
+        lessons, next_cursor = await courses_crud.list_lessons(db, course_id, module_id, limit, cursor, difficulty=difficulty)
+    except courses_crud.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return LessonPage(items=[LessonSummary.model_validate(lesson) for lesson in lessons], next_cursor=next_cursor)
 
 @router.post("/{course_id}/modules/{module_id}/lessons", response_model=Any)
 async def create_lesson_with_video(
     course_id: int,
     module_id: int,
     title: str,
-    background_tasks: BackgroundTasks,
     db: Annotated[AsyncSession, Depends(deps.get_db)],
     current_user: Annotated[User, Depends(deps.get_current_active_user)],
     file: UploadFile = File(...),
 ):
     """
-    Upload video lesson and trigger background AI processing.
+    Upload video lesson and queue it for AI processing by the worker.
+    Re-uploading a video that was already processed reuses its transcript and insights.
+    Large videos are better sent through the resumable /uploads endpoints.
     """
-    # 1. Save Video File
-    upload_dir = "uploads/videos"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_location = f"{upload_dir}/{file.filename}"
-    
-    with open(file_location, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
+    # 1. Save Video File, streamed and stored under its SHA-256
+    try:
+        with timed_stage("video", "save"):
+            file_location, video_sha256, _ = await save_upload_content_addressed(
+                file, settings.VIDEO_UPLOAD_DIR, max_bytes=settings.MAX_VIDEO_UPLOAD_SIZE,
+            )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     
-    # 2. Create Lesson Record
-    db_lesson = Lesson(
-        module_id=module_id,
-        title=title,
-        content="Video Lesson",
-        video_url=file_location,
-        order=1 # Simplify for demo
+    # 2. Create the lesson and queue processing (or reuse the results of an identical video)
+    return await create_video_lesson(db, module_id, title, file_location, video_sha256)
+
+@router.get("/lessons/{lesson_id}/processing-status", response_model=ProcessingStatus)
+async def get_processing_status(
+    lesson_id: int,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+):
+    """
+    State of the latest processing job for a lesson (queued, running with its
+    current stage, succeeded, or failed with the last error).
+    """
+    await _check_lesson_access(db, current_user, lesson_id)
+    job = await jobs_crud.get_latest_job(db, lesson_id, JobType.VIDEO_PROCESSING)
+    if not job:
+        raise HTTPException(status_code=404, detail="No processing job for this lesson")
+    return _job_status(job)
+
+def _short_error(error: str | None) -> str | None:
+    # Jobs store the full traceback for operators; clients only get its last line ("Type: message")
+    if not error:
+        return error
+    lines = [line for line in error.strip().splitlines() if line.strip()]
+    return lines[-1][:300] if lines else None
+
+async def _check_course_access(db: AsyncSession, user: User, course_id: int | None):
+    # Enrolled students and the course's teacher (admins: every course)
+    if course_id is None:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    course_ids = await rag_crud.get_accessible_course_ids(db, user)
+    if course_ids is not None and course_id not in course_ids:
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+
+async def _check_lesson_access(db: AsyncSession, user: User, lesson_id: int):
+    await _check_course_access(db, user, await rag_crud.get_lesson_course_id(db, lesson_id))
+
+def _job_status(job: ProcessingJob) -> ProcessingStatus:
+    return ProcessingStatus(
+        job_id=job.id,
+        lesson_id=job.lesson_id,
+        type=job.type,
+        status=job.status,
+        stage=job.stage,
+        progress=job.progress,
+        attempts=job.attempts,
+        max_attempts=job.max_attempts,
+        last_error=_short_error(job.last_error),
+        next_run_at=job.next_run_at,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        finished_at=job.finished_at,
     )
-    db.add(db_lesson)
-    await db.commit()
-    await db.refresh(db_lesson)
-    
-    # 3. Trigger Background Task
-    # We need to pass the session *maker* or manage session lifecycle, 
-    # but for simplicity passing a fresh session factory via imports or dependency would be cleaner.
-    # Here we import the sessionmaker directly to avoid pickling issues with running session.
-    from app.db.session import AsyncSessionLocal
-    background_tasks.add_task(process_video_task, db_lesson.id, file_location, AsyncSessionLocal)
+
+def _contained_path(root: str, file_path: str) -> str | None:
+    # Resolved path of file_path (relative to root, or absolute), or None if it is not a file inside root
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, file_path))
+    return path if path.startswith(root + os.sep) and os.path.isfile(path) else None
+
+async def _get_local_video_lesson(db: AsyncSession, user: User, lesson_id: int) -> Lesson:
+    await _check_lesson_access(db, user, lesson_id)
+    lesson = await db.get(Lesson, lesson_id)
+    if not lesson or lesson.video_source_type != VideoSourceType.LOCAL or not lesson.video_url:
+        raise HTTPException(status_code=404, detail="Lesson has no uploaded video")
+    return lesson
+
+@router.api_route("/lessons/{lesson_id}/video", methods=["GET", "HEAD"])
+async def get_lesson_video(
+    lesson_id: int,
+    request: Request,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+):
+    """
+    Stream an uploaded lesson video with byte-range support, so players can seek
+    without downloading the whole file. Only for users with access to the course. Handed to nginx when VIDEO_ACCEL_REDIRECT_PREFIX is set.
+    """
+    lesson = await _get_local_video_lesson(db, current_user, lesson_id)
+    upload_dir = os.path.realpath(settings.VIDEO_UPLOAD_DIR)
+    path = _contained_path(upload_dir, os.path.abspath(lesson.video_url))
+    if not path:
+        raise HTTPException(status_code=404, detail="Video file not found")
+
+    accel_redirect = None
+    if settings.VIDEO_ACCEL_REDIRECT_PREFIX:
+        accel_redirect = settings.VIDEO_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + os.path.relpath(path, upload_dir)
+    # Uploads are content-addressed, so the hash is a strong validator
+    etag = f'"{lesson.video_sha256}"' if lesson.video_sha256 else None
+    return FileRangeResponse(path, request, etag=etag, accel_redirect=accel_redirect)
+
+@router.get("/lessons/{lesson_id}/hls/{file_path:path}")
+async def get_lesson_hls(
+    lesson_id: int,
+    file_path: str,
+    request: Request,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+):
+    """
+    HLS playlists and segments of a lesson video (start from master.m3u8),
+    available once its packaging job has finished.
+    """
+    lesson = await _get_local_video_lesson(db, current_user, lesson_id)
+    directory = find_hls_package(lesson.video_sha256)
+    path = _contained_path(directory, file_path) if directory else None
+    if not path:
+        raise HTTPException(status_code=404, detail="HLS package not found")
+    # Segments never change once packaged; playlists are cheap to revalidate
+    cache_control = "private, no-cache" if path.endswith(".m3u8") else "private, max-age=31536000, immutable"
+    return FileRangeResponse(path, request, cache_control=cache_control)
 
 @router.post("/import-playlist", response_model=Any)
 async def import_playlist_endpoint(
@@ -116,11 +262,12 @@ async def import_playlist_endpoint(
     current_user: Annotated[User, Depends(deps.get_current_active_user)],
 ):
     """
-    Admin endpoint to import a YouTube playlist as a course.
+    Admin endpoint to import a YouTube playlist as a course. The lessons are
+    created right away; transcripts and titles are fetched by a background
+    job, whose progress is at /import-playlist/{job_id}.
     """
-    # Convert AsyncSession to sync Session for the service (or update service to be async)
     # For now, we simulate with the provided urls
-    course = await import_youtube_playlist(
+    return await import_youtube_playlist(
         db=db,
         playlist_url=playlist_url,
         title=title,
@@ -129,53 +276,78 @@ async def import_playlist_endpoint(
         teacher_id=current_user.id,
         video_urls=video_urls
     )
-    return course
 
-from app.services.youtube import get_transcript, generate_summary, generate_smart_chapters, generate_vocabulary, generate_quiz
-import json
+@router.get("/import-playlist/{job_id}", response_model=ProcessingStatus)
+async def get_playlist_import_status(
+    job_id: int,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+):
+    """
+    State of a playlist import job; `progress` counts the videos fetched so far.
+    """
+    job = await jobs_crud.get_job(db, job_id, JobType.PLAYLIST_IMPORT)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    await _check_course_access(db, current_user, job.payload.get("course_id"))
+    return _job_status(job)
+
+from app.services.lesson_warmup import wait_for_warm_lesson
+from app.services.lesson_context import build_lesson_context, context_cache, context_etag, serialize_context
+from app.services.video_delivery import etag_matches
+from app.crud import lesson_context as lesson_context_crud
 
 @router.get("/lessons/{lesson_id}/context")
 async def get_lesson_context(
     lesson_id: int,
+    request: Request,
     db: Annotated[AsyncSession, Depends(deps.get_db)],
     current_user: Annotated[User, Depends(deps.get_current_active_user)],
 ) -> Any:
     """
     Get context for a lesson, including YouTube transcript, summary, vocabulary and quiz.
+    The first view of a YouTube lesson starts a shared background fetch of its
+    transcript and waits up to LESSON_WARMUP_WAIT for it; `pending` is true
+    if the content is still being prepared.
+
+    The response is served pre-serialized (in-process LRU, then the lesson_contexts
+    table) with an ETag that changes with the lesson's context_version, so a
+    repeat view with If-None-Match gets a 304 after reading a single integer.
     """
-    result = await db.execute(select(Lesson).where(Lesson.id == lesson_id))
-    lesson = result.scalar_one_or_none()
-    
-    if not lesson:
+    version = await lesson_context_crud.get_context_version(db, lesson_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Lesson not found")
-    
-    context = {
-        "title": lesson.title,
-        "content": lesson.content,
-        "video_url": lesson.video_url,
-        "transcript": lesson.transcript,
-        "summary": lesson.key_takeaways,
-        "chapters": json.loads(lesson.chapters) if lesson.chapters else [],
-        "vocabulary": json.loads(lesson.vocabulary) if lesson.vocabulary else [],
-        "quiz": json.loads(lesson.quiz_questions) if lesson.quiz_questions else []
-    }
-
-    if lesson.video_source_type == VideoSourceType.YOUTUBE and lesson.video_url and not lesson.transcript:
-        # Fetch and store transcript + AI content in background or real-time for demo
-        transcript = get_transcript(lesson.video_url)
-        if transcript:
-            lesson.transcript = transcript
-            lesson.key_takeaways = generate_summary(transcript)
-            lesson.chapters = json.dumps(generate_smart_chapters(transcript))
-            lesson.vocabulary = json.dumps(generate_vocabulary(transcript))
-            lesson.quiz_questions = json.dumps(generate_quiz(transcript))
-            
+    etag = context_etag(lesson_id, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    payload = context_cache.get(lesson_id, etag) or await lesson_context_crud.get_context_payload(db, lesson_id, etag)
+    if payload is None:
+        result = await db.execute(
+            select(Lesson).options(undefer(Lesson.transcript), undefer_group("ai_content")).where(Lesson.id == lesson_id)
+        )
+        lesson = result.scalar_one_or_none()
+        if not lesson:
+            raise HTTPException(status_code=404, detail="Lesson not found")
+
+        if lesson.video_source_type == VideoSourceType.YOUTUBE and lesson.video_url and not lesson.transcript:
+            # End the transaction first, so waiting requests don't each hold a pooled connection
             await db.commit()
-            
-            context["transcript"] = lesson.transcript
-            context["summary"] = lesson.key_takeaways
-            context["chapters"] = json.loads(lesson.chapters)
-            context["vocabulary"] = json.loads(lesson.vocabulary)
-            context["quiz"] = json.loads(lesson.quiz_questions)
-    
-    return context
+            warmed = await wait_for_warm_lesson(lesson_id, settings.LESSON_WARMUP_WAIT)
+            if warmed:
+                # Deferred columns are only reloaded when named
+                await db.refresh(lesson, ["transcript", "key_takeaways", "chapters", "vocabulary", "quiz_questions", "context_version"])
+            else:
+                # Not final yet (or no transcript to be had): nothing to cache
+                return JSONResponse({**build_lesson_context(lesson), "pending": warmed is None}, headers={"Cache-Control": "no-store"})
+
+        # The ETag comes from the same row snapshot as the content
+        etag = context_etag(lesson_id, lesson.context_version)
+        headers["ETag"] = etag
+        payload = serialize_context({**build_lesson_context(lesson), "pending": False})
+        await lesson_context_crud.save_context_payload(db, lesson_id, etag, payload)
+        await db.commit()
+    context_cache.put(lesson_id, etag, payload)
+    return Response(content=payload, media_type="application/json", headers=headers)
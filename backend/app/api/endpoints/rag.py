@@ -1,11 +1,18 @@
-from typing import Annotated, Any
+import os
+from contextlib import aclosing
+from typing import Annotated, Any, Optional
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 
 from app.api import deps
+from app.core.metrics import timed_stage
 from app.crud import rag
-from app.services.chunking import extract_text_from_pdf
+from app.services.chunking import iter_pdf_chunks, iterate_in_thread
+from app.services.uploads import spool_upload_to_temp
 from app.models.user import User
+from app.models.course import Module
+from app.models.rag import SearchMode
 
 router = APIRouter()
 
@@ -19,28 +26,66 @@ async def upload_lesson_material(
     """
     Upload a PDF or text file for a lesson, chunk it, and store embeddings.
     """
+    source = file.filename or "material"
     if file.content_type == "application/pdf":
-        content = await file.read()
-        text = extract_text_from_pdf(content)
+        # Pages are parsed off the event loop and their chunks reach the embedder
+        # while the rest of the document is still being parsed
+        with timed_stage("ingest", "save"):
+            path, file_hash = await spool_upload_to_temp(file, suffix=".pdf")
+        try:
+            async with aclosing(iterate_in_thread(iter_pdf_chunks(path))) as chunks:
+                stats = await rag.add_lesson_documents(db, lesson_id, chunks, source=source, doc_hash=file_hash)
+        finally:
+            os.remove(path)
     elif file.content_type == "text/plain":
-        content = await file.read()
+        with timed_stage("ingest", "save"):
+            content = await file.read()
         text = content.decode("utf-8")
+        stats = await rag.add_lesson_documents(db, lesson_id, text, source=source)
     else:
         raise HTTPException(status_code=400, detail="Invalid file type")
     
-    await rag.add_lesson_documents(db, lesson_id, text)
-    return {"message": "Lesson material processed and indexed successfully."}
+    return {"message": "Lesson material processed and indexed successfully.", **stats}
 
 @router.post("/ask")
 async def ask_question(
     db: Annotated[AsyncSession, Depends(deps.get_db)],
     current_user: Annotated[User, Depends(deps.get_current_active_user)],
     query: str = Form(...),
+    mode: Optional[SearchMode] = Form(None),
+    course_id: Optional[int] = Form(None),
+    module_id: Optional[int] = Form(None),
+    lesson_id: Optional[int] = Form(None),
 ):
     """
     Ask a question and retrieve relevant document chunks.
+    `mode` is vector, lexical or hybrid (default from settings).
+    Optionally scoped to a course, module or lesson; only courses the user is
+    enrolled in or teaches are ever searched.
     """
-    results = await rag.search_similar_documents(db, query)
+    course_ids = await rag.get_accessible_course_ids(db, current_user)
+
+    # The narrowest scope decides which course has to be accessible
+    if lesson_id is not None:
+        scope_course_id = await rag.get_lesson_course_id(db, lesson_id)
+    elif module_id is not None:
+        result = await db.execute(select(Module.course_id).where(Module.id == module_id))
+        scope_course_id = result.scalar_one_or_none()
+    else:
+        scope_course_id = course_id
+    if (lesson_id is not None or module_id is not None) and scope_course_id is None:
+        raise HTTPException(status_code=404, detail="Lesson or module not found")
+    if course_id is not None and scope_course_id != course_id:
+        raise HTTPException(status_code=400, detail="Scope does not belong to the given course")
+
+    if scope_course_id is not None:
+        if course_ids is not None and scope_course_id not in course_ids:
+            raise HTTPException(status_code=403, detail="Not enrolled in this course")
+        course_ids = [scope_course_id]
+
+    results = await rag.search_similar_documents(
+        db, query, mode=mode, course_ids=course_ids, module_id=module_id, lesson_id=lesson_id,
+    )
     return [
         {"content": chunk.content, "lesson_id": chunk.lesson_id} 
         for chunk in results
@@ -0,0 +1,387 @@
+"""
+Resumable video uploads, following the tus 1.0 protocol (https://tus.io/protocols/resumable-upload)
+with the creation, checksum, concatenation, termination and expiration extensions.
+
+1. POST /uploads with Upload-Length and Upload-Metadata (module_id, title, filename and the
+   sha256 of the whole file, values base64 encoded) returns the upload URL in Location.
+2. PATCH the URL with Upload-Offset and a body of application/offset+octet-stream, as many
+   times as needed. After a dropped connection, HEAD returns the offset to resume from.
+3. For parallel transfers, create several uploads with "Upload-Concat: partial", PATCH them
+   concurrently, then POST with "Upload-Concat: final;<url> <url> ..." to join them in order.
+
+When the last byte arrives (or the parts are joined), the file is checked against its sha256;
+only then is the video stored, the lesson created and its processing queued.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+from contextlib import ExitStack
+from email.utils import format_datetime
+from datetime import datetime, timezone
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from starlette.requests import ClientDisconnect
+
+from app.api import deps
+from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.crud import uploads as uploads_crud
+from app.models.course import Module
+from app.models.upload import VideoUpload, UploadStatus
+from app.models.user import User
+from app.schemas.upload import UploadState
+from app.services.disk_cache import file_sha256
+from app.services.uploads import (
+    UploadLocked,
+    UploadTooLarge,
+    append_stream,
+    concatenate_files,
+    locked_for_append,
+    store_content_addressed,
+)
+from app.services.video_pipeline import create_video_lesson
+
+router = APIRouter()
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,checksum,concatenation,termination,expiration"
+CHECKSUM_ALGORITHMS = ("sha1", "sha256", "md5")
+OFFSET_CONTENT_TYPE = "application/offset+octet-stream"
+CHECKSUM_MISMATCH = 460  # tus checksum extension
+
+def _tus_headers(**headers) -> dict:
+    return {"Tus-Resumable": TUS_VERSION, **{name.replace("_", "-"): str(value) for name, value in headers.items()}}
+
+def _check_tus_version(request: Request):
+    version = request.headers.get("Tus-Resumable")
+    if version is not None and version != TUS_VERSION:
+        raise HTTPException(status_code=412, detail="Unsupported tus version", headers={"Tus-Version": TUS_VERSION})
+
+def parse_metadata(header: str | None) -> dict[str, str]:
+    """
+    Upload-Metadata: comma-separated "key base64(value)" pairs; a key alone means an empty value.
+    """
+    metadata = {}
+    for pair in (header or "").split(","):
+        if not pair.strip():
+            continue
+        key, _, value = pair.strip().partition(" ")
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode("utf-8") if value else ""
+        except (binascii.Error, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail=f"Invalid Upload-Metadata value for {key!r}")
+    return metadata
+
+def _int_header(request: Request, name: str) -> int:
+    value = request.headers.get(name)
+    if value is None or not value.isdigit():
+        raise HTTPException(status_code=400, detail=f"Missing or invalid {name} header", headers=_tus_headers())
+    return int(value)
+
+def _upload_headers(request: Request, upload: VideoUpload, offset: int) -> dict:
+    headers = _tus_headers(
+        Upload_Offset=offset,
+        Upload_Length=upload.length,
+        Cache_Control="no-store",
+    )
+    if upload.status != UploadStatus.COMPLETE:
+        headers["Upload-Expires"] = format_datetime(upload.expires_at.astimezone(timezone.utc), usegmt=True)
+    if upload.is_partial:
+        headers["Upload-Concat"] = "partial"
+    elif upload.parts:
+        urls = " ".join(str(request.url_for("get_upload_offset", upload_id=part)) for part in upload.parts)
+        headers["Upload-Concat"] = f"final;{urls}"
+    if upload.lesson_id:
+        headers["Lesson-Id"] = str(upload.lesson_id)
+    if upload.job_id:
+        headers["Job-Id"] = str(upload.job_id)
+    return headers
+
+def _current_offset(upload: VideoUpload) -> int:
+    # The staged file is the truth: it includes bytes of a PATCH whose connection dropped
+    if upload.status == UploadStatus.COMPLETE:
+        return upload.length
+    try:
+        return os.path.getsize(uploads_crud.staging_path(upload.id))
+    except FileNotFoundError:
+        return upload.offset
+
+async def _get_live_upload(db: AsyncSession, upload_id: str, user: User) -> VideoUpload:
+    upload = await uploads_crud.get_upload(db, upload_id, user.id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found", headers=_tus_headers())
+    if upload.status == UploadStatus.FAILED:
+        raise HTTPException(status_code=410, detail=upload.error or "Upload failed", headers=_tus_headers())
+    if upload.status != UploadStatus.COMPLETE and upload.expires_at < datetime.now(timezone.utc):
+        raise HTTPException(status_code=410, detail="Upload expired", headers=_tus_headers())
+    return upload
+
+def _sha256_metadata(metadata: dict[str, str]) -> str:
+    sha256 = metadata.get("sha256", "").lower()
+    if not re.fullmatch(r"[0-9a-f]{64}", sha256):
+        raise HTTPException(status_code=400, detail="Upload-Metadata must include the file's sha256 (hex)", headers=_tus_headers())
+    return sha256
+
+async def _finalize(db: AsyncSession, upload: VideoUpload):
+    """
+    Verify the complete file against the declared sha256, then store it and
+    create the lesson, queueing its processing.
+    """
+    path = uploads_crud.staging_path(upload.id)
+    with timed_stage("video", "verify_checksum"):
+        sha256 = await asyncio.to_thread(file_sha256, path)
+    if sha256 != upload.sha256:
+        os.remove(path)
+        upload.status = UploadStatus.FAILED
+        upload.error = f"Checksum mismatch: expected sha256 {upload.sha256}, received {sha256}"
+        await db.commit()
+        raise HTTPException(status_code=CHECKSUM_MISMATCH, detail=upload.error, headers=_tus_headers())
+
+    video_path, _ = store_content_addressed(path, settings.VIDEO_UPLOAD_DIR, sha256, upload.filename)
+    upload.offset = upload.length
+    upload.status = UploadStatus.COMPLETE
+    # Commits the upload's new status together with the lesson and its job
+    result = await create_video_lesson(db, upload.module_id, upload.title, video_path, sha256)
+    upload.lesson_id = result["lesson_id"]
+    upload.job_id = result["job_id"]
+    await db.commit()
+
+@router.options("")
+def upload_options():
+    """
+    tus discovery: supported version, extensions, size limit and checksum algorithms.
+    """
+    return Response(status_code=204, headers=_tus_headers(
+        Tus_Version=TUS_VERSION,
+        Tus_Extension=TUS_EXTENSIONS,
+        Tus_Max_Size=settings.MAX_VIDEO_UPLOAD_SIZE,
+        Tus_Checksum_Algorithm=",".join(CHECKSUM_ALGORITHMS),
+    ))
+
+@router.post("", status_code=201)
+async def create_upload(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+):
+    """
+    Create a resumable upload (tus creation and concatenation).
+    """
+    _check_tus_version(request)
+    metadata = parse_metadata(request.headers.get("Upload-Metadata"))
+    concat = request.headers.get("Upload-Concat", "")
+    is_partial = concat == "partial"
+    parts: list[VideoUpload] = []
+
+    if concat.startswith("final;"):
+        part_ids = [url.rstrip("/").rsplit("/", 1)[-1] for url in concat[len("final;"):].split()]
+        found = {part.id: part for part in await uploads_crud.get_uploads(db, part_ids, current_user.id)}
+        for part_id in part_ids:
+            part = found.get(part_id)
+            if part is None or not part.is_partial:
+                raise HTTPException(status_code=400, detail=f"Unknown partial upload {part_id}", headers=_tus_headers())
+            # COMPLETE is only set once the last chunk was verified; a full-sized file may still be truncated by its checksum
+            if part.status != UploadStatus.COMPLETE:
+                raise HTTPException(status_code=400, detail=f"Partial upload {part_id} is not complete", headers=_tus_headers())
+            parts.append(part)
+        if not parts:
+            raise HTTPException(status_code=400, detail="No partial uploads to concatenate", headers=_tus_headers())
+        length = sum(part.length for part in parts)
+    elif concat and not is_partial:
+        raise HTTPException(status_code=400, detail="Invalid Upload-Concat header", headers=_tus_headers())
+    else:
+        length = _int_header(request, "Upload-Length")
+
+    if length > settings.MAX_VIDEO_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail=str(UploadTooLarge(settings.MAX_VIDEO_UPLOAD_SIZE)), headers=_tus_headers())
+
+    module_id = title = sha256 = None
+    if not is_partial:
+        # Everything needed to create the lesson is known up front, so a finished upload can go straight to processing
+        if not metadata.get("module_id", "").isdigit() or not metadata.get("title"):
+            raise HTTPException(status_code=400, detail="Upload-Metadata must include module_id and title", headers=_tus_headers())
+        module_id = int(metadata["module_id"])
+        title = metadata["title"]
+        sha256 = _sha256_metadata(metadata)
+        result = await db.execute(select(Module.id).where(Module.id == module_id))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Module not found", headers=_tus_headers())
+
+    # Hold every part's lock until they are joined, so no request writes to them meanwhile
+    part_locks = ExitStack()
+    try:
+        for part in parts:
+            part_locks.enter_context(locked_for_append(uploads_crud.staging_path(part.id)))
+    except UploadLocked:
+        part_locks.close()
+        raise HTTPException(status_code=423, detail="A partial upload is being written by another request", headers=_tus_headers())
+    except FileNotFoundError:
+        part_locks.close()
+        raise HTTPException(status_code=400, detail="A partial upload was already concatenated", headers=_tus_headers())
+
+    with part_locks:
+        upload = uploads_crud.create_upload(
+            db,
+            current_user.id,
+            length,
+            module_id=module_id,
+            title=title,
+            filename=metadata.get("filename"),
+            sha256=sha256,
+            is_partial=is_partial,
+            parts=[part.id for part in parts] or None,
+        )
+        await db.commit()
+
+        if parts:
+            with timed_stage("video", "concatenate"):
+                await asyncio.to_thread(
+                    concatenate_files, [uploads_crud.staging_path(part.id) for part in parts], uploads_crud.staging_path(upload.id),
+                )
+            for part in parts:
+                await db.delete(part)
+            await db.commit()
+    if not is_partial and _current_offset(upload) == length:
+        await _finalize(db, upload)
+
+    location = str(request.url_for("get_upload_offset", upload_id=upload.id))
+    return Response(status_code=201, headers={**_upload_headers(request, upload, _current_offset(upload)), "Location": location})
+
+@router.head("/{upload_id}")
+async def get_upload_offset(
+    upload_id: str,
+    request: Request,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+):
+    """
+    Offset to resume a PATCH from (tus core).
+    """
+    _check_tus_version(request)
+    upload = await _get_live_upload(db, upload_id, current_user)
+    return Response(status_code=200, headers=_upload_headers(request, upload, _current_offset(upload)))
+
+@router.patch("/{upload_id}", status_code=204)
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+):
+    """
+    Append the request body at Upload-Offset (tus core), verifying it against
+    Upload-Checksum if given (tus checksum). The upload is finalized once the
+    last byte has arrived.
+    """
+    _check_tus_version(request)
+    if request.headers.get("Content-Type") != OFFSET_CONTENT_TYPE:
+        raise HTTPException(status_code=415, detail=f"Content-Type must be {OFFSET_CONTENT_TYPE}", headers=_tus_headers())
+    offset = _int_header(request, "Upload-Offset")
+    upload = await _get_live_upload(db, upload_id, current_user)
+    if upload.parts:
+        raise HTTPException(status_code=403, detail="A final upload can't be patched", headers=_tus_headers())
+
+    digest = expected_checksum = None
+    if checksum := request.headers.get("Upload-Checksum"):
+        algorithm, _, encoded = checksum.partition(" ")
+        if algorithm not in CHECKSUM_ALGORITHMS:
+            raise HTTPException(status_code=400, detail=f"Unsupported checksum algorithm {algorithm}", headers=_tus_headers())
+        try:
+            expected_checksum = base64.b64decode(encoded, validate=True)
+        except binascii.Error:
+            raise HTTPException(status_code=400, detail="Invalid Upload-Checksum", headers=_tus_headers())
+        digest = hashlib.new(algorithm)
+
+    if upload.status == UploadStatus.COMPLETE:
+        if offset == upload.length:
+            # A retry of the last PATCH whose response was lost
+            return Response(status_code=204, headers=_upload_headers(request, upload, upload.length))
+        raise HTTPException(status_code=409, detail="Upload already complete", headers=_tus_headers())
+
+    # Don't hold a database connection while the body streams in
+    await db.commit()
+
+    try:
+        with locked_for_append(uploads_crud.staging_path(upload.id)) as f:
+            current = os.fstat(f.fileno()).st_size
+            if offset != current:
+                raise HTTPException(status_code=409, detail=f"Upload-Offset mismatch, current offset is {current}", headers=_tus_headers(Upload_Offset=current))
+            f.seek(offset)
+            disconnected = False
+            with timed_stage("video", "receive"):
+                try:
+                    await append_stream(f, request.stream(), upload.length - offset, digest)
+                except ClientDisconnect:
+                    # Keep what arrived; the client resumes from HEAD's offset
+                    disconnected = True
+                except UploadTooLarge:
+                    raise HTTPException(status_code=413, detail="Body exceeds Upload-Length", headers=_tus_headers())
+            if digest is not None and (disconnected or digest.digest() != expected_checksum):
+                # A checksummed chunk is all or nothing
+                f.truncate(offset)
+                f.seek(offset)
+                if not disconnected:
+                    raise HTTPException(status_code=CHECKSUM_MISMATCH, detail="Upload-Checksum mismatch", headers=_tus_headers(Upload_Offset=offset))
+            new_offset = f.tell()
+
+            upload.offset = new_offset
+            if new_offset == upload.length:
+                if upload.is_partial:
+                    upload.status = UploadStatus.COMPLETE
+                    await db.commit()
+                else:
+                    # Still under the lock, so a concurrent retry can't finalize twice
+                    await _finalize(db, upload)
+            else:
+                await db.commit()
+    except UploadLocked:
+        raise HTTPException(status_code=423, detail="Upload is being written by another request", headers=_tus_headers())
+
+    return Response(status_code=204, headers=_upload_headers(request, upload, new_offset))
+
+@router.delete("/{upload_id}", status_code=204)
+async def terminate_upload(
+    upload_id: str,
+    request: Request,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+):
+    """
+    Abandon an upload and free its staged bytes (tus termination).
+    """
+    _check_tus_version(request)
+    upload = await uploads_crud.get_upload(db, upload_id, current_user.id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found", headers=_tus_headers())
+    await uploads_crud.delete_upload(db, upload)
+    await db.commit()
+    return Response(status_code=204, headers=_tus_headers())
+
+@router.get("/{upload_id}", response_model=UploadState)
+async def get_upload_state(
+    upload_id: str,
+    db: Annotated[AsyncSession, Depends(deps.get_db)],
+    current_user: Annotated[User, Depends(deps.get_current_active_user)],
+):
+    """
+    Upload progress and, once complete, the lesson and processing job it created.
+    """
+    upload = await uploads_crud.get_upload(db, upload_id, current_user.id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return UploadState(
+        id=upload.id,
+        status=upload.status,
+        offset=_current_offset(upload),
+        length=upload.length,
+        is_partial=upload.is_partial,
+        lesson_id=upload.lesson_id,
+        job_id=upload.job_id,
+        error=upload.error,
+        expires_at=upload.expires_at,
+    )
@@ -20,6 +20,147 @@ class Settings(BaseSettings):
     
     GOOGLE_API_KEY: str = "CHANGE_THIS_GOOGLE_API_KEY"
 
+    # Embedding provider: "gemini", "hashing" (offline, deterministic; benchmarks/CI) or "local" (sentence-transformers)
+    EMBEDDING_PROVIDER: str = "gemini"
+    EMBEDDING_LOCAL_MODEL: str = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+    EMBEDDING_LOCAL_DEVICE: Optional[str] = None
+
+    # Embedding pipeline: chunks per provider request and requests in flight
+    EMBEDDING_BATCH_SIZE: int = 100
+    EMBEDDING_CONCURRENCY: int = 4
+
+    # PDF extraction: documents with at least PDF_PARALLEL_MIN_PAGES pages are
+    # parsed in a process pool, PDF_PAGES_PER_TASK pages per task (PDF_WORKERS=0 means one per CPU)
+    PDF_PARALLEL_MIN_PAGES: int = 64
+    PDF_PAGES_PER_TASK: int = 16
+    PDF_WORKERS: int = 0
+
+    # ANN index on document_chunks.embedding: "hnsw", "ivfflat" or "none"
+    VECTOR_INDEX_TYPE: str = "hnsw"
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 64
+    HNSW_EF_SEARCH: int = 40
+    IVFFLAT_LISTS: int = 100
+    IVFFLAT_PROBES: int = 10
+
+    # Compact vector storage: "vector" (float32) or "halfvec" (float16), plus an optional
+    # binary-quantized Hamming index for a coarse pass that is re-ranked on the stored vectors
+    EMBEDDING_STORAGE: str = "vector"
+    EMBEDDING_BINARY_INDEX: bool = False
+    BINARY_RERANK_FACTOR: int = 4  # Coarse candidates per requested result
+
+    # Retrieval: default /rag/ask mode, full-text config and reciprocal rank fusion tuning
+    RAG_SEARCH_MODE: str = "hybrid"
+    TEXT_SEARCH_CONFIG: str = "simple"  # Lessons mix Uzbek and English, so no language-specific stemming
+    HYBRID_CANDIDATES: int = 50
+    RRF_K: int = 60
+
+    # Scoped retrieval: courses with at least COURSE_INDEX_MIN_CHUNKS chunks get their own partial
+    # ANN index (app.scripts.create_vector_index --per-course). HNSW_ITERATIVE_SCAN ("off",
+    # "relaxed_order" or "strict_order"; ignored before pgvector 0.8) keeps filtered scans from running dry.
+    # Course sets with at most EXACT_SEARCH_MAX_CHUNKS chunks (e.g. a student's enrollments) are scanned exactly
+    COURSE_INDEX_MIN_CHUNKS: int = 5_000
+    HNSW_ITERATIVE_SCAN: str = "relaxed_order"
+    EXACT_SEARCH_MAX_CHUNKS: int = 20_000
+
+    # Query embedding cache: in-process LRU by default, Redis (shared by all workers) when a URL is set
+    QUERY_EMBEDDING_CACHE_SIZE: int = 10_000
+    QUERY_EMBEDDING_CACHE_TTL: int = 60 * 60 * 24  # 1 day
+    QUERY_EMBEDDING_CACHE_URL: Optional[str] = None
+
+    # Video uploads are stored content-addressed (by SHA-256) under VIDEO_UPLOAD_DIR
+    VIDEO_UPLOAD_DIR: str = "uploads/videos"
+    MAX_VIDEO_UPLOAD_SIZE: int = 4 * 1024 ** 3  # 4 GiB
+    # Resumable (tus) uploads are staged here until complete; must be on the same filesystem as VIDEO_UPLOAD_DIR
+    UPLOAD_STAGING_DIR: str = "uploads/incoming"
+    UPLOAD_EXPIRATION: int = 60 * 60 * 24  # Unfinished uploads are purged after a day
+
+    # Lesson video delivery: byte-range responses, optionally handed to nginx (X-Accel-Redirect to an
+    # internal location aliasing VIDEO_UPLOAD_DIR), and optional HLS packaging in the worker
+    VIDEO_ACCEL_REDIRECT_PREFIX: Optional[str] = None  # e.g. "/protected-videos/"
+    HLS_ENABLED: bool = False
+    HLS_DIR: str = "uploads/hls"
+    HLS_RENDITIONS: list[tuple[int, int, int]] = [(360, 800, 96), (720, 2500, 128)]  # (height, video kbps, audio kbps)
+    HLS_SEGMENT_SECONDS: int = 6
+    HLS_TIMEOUT: int = 2 * 60 * 60  # seconds; may exceed JOB_LEASE_TIMEOUT, the worker renews the lease while it runs
+
+    # YouTube playlist import (a worker job): transcripts and titles are fetched PLAYLIST_FETCH_CONCURRENCY
+    # at a time and written back in batches. YOUTUBE_FETCHER "local" is an offline stand-in for tests
+    YOUTUBE_FETCHER: str = "youtube"
+    PLAYLIST_FETCH_CONCURRENCY: int = 8
+    PLAYLIST_FETCH_TIMEOUT: float = 60  # seconds per video
+    PLAYLIST_WRITE_BATCH_SIZE: int = 25
+    # First view of a YouTube lesson without a transcript: requests share one background fetch (per API process) and wait
+    # up to LESSON_WARMUP_WAIT for it; a lesson whose fetch found nothing isn't retried for LESSON_WARMUP_RETRY_AFTER
+    LESSON_WARMUP_WAIT: float = 10.0  # seconds
+    LESSON_WARMUP_RETRY_AFTER: int = 10 * 60
+    LESSON_PREWARM_WINDOW: int = 60 * 60 * 24 * 7  # Imports re-checked by app.scripts.prewarm_lessons
+    # Serialized lesson context payloads kept in each API process, in front of the lesson_contexts table
+    LESSON_CONTEXT_CACHE_SIZE: int = 512
+    LESSON_CONTEXT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Catalogue listings (courses, modules, lessons) are cursor-paginated
+    CATALOGUE_PAGE_SIZE: int = 20
+    CATALOGUE_MAX_PAGE_SIZE: int = 100
+
+    # Audio extraction for transcription: "ffmpeg" (direct, no video decode) or "moviepy" (legacy MP3 path).
+    # AUDIO_CODEC is "opus" (mono 16 kHz), "mp3" or "copy" (original AAC stream, no re-encode)
+    AUDIO_EXTRACTION_MODE: str = "ffmpeg"
+    AUDIO_CODEC: str = "opus"
+    AUDIO_EXTRACTION_TIMEOUT: int = 30 * 60  # seconds
+    AUDIO_EXTRACTION_WORKERS: int = 2  # moviepy process pool size
+    FFMPEG_BINARY: Optional[str] = None  # Defaults to ffmpeg on PATH, then the imageio-ffmpeg build
+
+    # Shared AI client (app.services.ai_client): all model API calls go through its concurrency limits,
+    # per-operation token buckets (requests per minute, matched to the API quota), retries and circuit breaker
+    AI_BACKEND: str = "gemini"  # "fake" for offline tests
+    AI_MAX_CONCURRENCY: int = 16
+    AI_OPERATION_CONCURRENCY: dict[str, int] = {"upload_file": 4, "generate_content": 8, "embed_content": 8}
+    AI_RATE_LIMITS: dict[str, float] = {"upload_file": 60, "generate_content": 1000, "embed_content": 1500}
+    AI_TIMEOUT: float = 300  # seconds per request, enforced by the SDK
+    AI_MAX_RETRIES: int = 5  # The only retries of a failed API request inside a job attempt
+    AI_RETRY_BASE_DELAY: float = 1.0  # seconds, doubled per retry (full jitter)
+    AI_RETRY_MAX_DELAY: float = 60.0
+    AI_BREAKER_THRESHOLD: int = 5  # consecutive failures before failing fast
+    AI_BREAKER_COOLDOWN: float = 30.0  # seconds before a trial call is let through
+
+    # Lecture transcription: audio longer than TRANSCRIPTION_SEGMENT_SECONDS is cut near silences into
+    # overlapping segments that are transcribed in parallel ("stub" model works offline)
+    TRANSCRIPTION_MODEL: str = "gemini"
+    TRANSCRIPTION_SEGMENT_SECONDS: int = 10 * 60
+    TRANSCRIPTION_SEGMENT_OVERLAP: float = 3.0  # seconds of audio shared with the previous segment
+    TRANSCRIPTION_SILENCE_SEARCH: int = 60  # how far from the ideal cut point to look for a silence
+    TRANSCRIPTION_CONCURRENCY: int = 4
+
+    # Insights cache: transcription results keyed by audio content hash plus model/prompt version,
+    # and Gemini file handles, reused instead of uploading the same audio again
+    INSIGHTS_CACHE_DIR: Optional[str] = "cache/insights"  # None disables the cache
+    INSIGHTS_CACHE_TTL: int = 60 * 60 * 24 * 30  # 30 days
+    INSIGHTS_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+    GEMINI_FILE_TTL: int = 60 * 60 * 47  # Uploaded files expire after 48 hours
+
+    # Transcript store: compressed transcripts with segment timestamps, keyed by YouTube video id or uploaded
+    # video hash and read before fetching or transcribing again. "zstd" needs the optional zstandard package
+    # and falls back to gzip without it
+    TRANSCRIPT_STORE_DIR: Optional[str] = "cache/transcripts"  # None disables the store
+    TRANSCRIPT_STORE_TTL: int = 60 * 60 * 24 * 365  # 1 year
+    TRANSCRIPT_STORE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    TRANSCRIPT_STORE_COMPRESSION: str = "zstd"
+
+    # Background jobs (python -m app.worker): failed attempts are retried with exponential
+    # backoff, and running jobs whose worker stops heartbeating for JOB_LEASE_TIMEOUT are reclaimed
+    WORKER_CONCURRENCY: int = 4
+    WORKER_METRICS_PORT: Optional[int] = 9101  # Prometheus metrics of the worker process; None disables
+    WORKER_POLL_INTERVAL: float = 2.0  # seconds
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE_DELAY: int = 30  # seconds, doubled per attempt
+    JOB_RETRY_MAX_DELAY: int = 60 * 60
+    JOB_LEASE_TIMEOUT: int = 30 * 60  # Renewed every third of it while a job runs
+    # Per-stage limits inside one worker process
+    WORKER_EXTRACT_CONCURRENCY: int = 2
+    WORKER_AI_CONCURRENCY: int = 4
+    WORKER_INDEX_CONCURRENCY: int = 2
+    WORKER_HLS_CONCURRENCY: int = 1
+
     @computed_field
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> PostgresDsn:
@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Pipeline stages run from milliseconds (a DB write) to tens of minutes (transcribing a lecture)
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+STAGE_SECONDS = Histogram(
+    "sstudy_pipeline_stage_seconds",
+    "Time spent in each stage of video processing and RAG ingestion",
+    ["pipeline", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+STAGE_FAILURES = Counter(
+    "sstudy_pipeline_stage_failures_total",
+    "Pipeline stages that raised",
+    ["pipeline", "stage"],
+)
+REQUEST_SECONDS = Histogram(
+    "sstudy_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+
+@contextmanager
+def timed_stage(pipeline: str, stage: str):
+    """
+    Record how long the block takes as one `stage` of `pipeline`, and count it
+    as failed if it raises. Works in sync and async code alike.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_FAILURES.labels(pipeline, stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(pipeline, stage).observe(time.perf_counter() - started)
+
+class RequestMetricsMiddleware:
+    """
+    Plain ASGI middleware (no per-request task or body buffering) observing
+    request latency per route template, so /lessons/1 and /lessons/2 share a series.
+    """
+    def __init__(self, app):
+        self.app = app
+        self._routes: dict | None = None
+
+    def _route_path(self, scope) -> str:
+        # The router stores the matched endpoint in the scope; map it back to its path template
+        if self._routes is None:
+            self._routes = {route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.labels(scope["method"], self._route_path(scope), str(status)).observe(time.perf_counter() - started)
+
+class ServiceStatsCollector:
+    """
+    Exports the counters the AI client and the caches keep anyway, read at
+    scrape time so the hot path pays nothing extra.
+    """
+    def describe(self):
+        # Without it, registering calls collect() at import time, while the services may be half imported
+        return []
+
+    def collect(self):
+        # Only report services this process has actually loaded
+        ai_module = sys.modules.get("app.services.ai_client")
+        if ai_module is not None:
+            stats = ai_module.ai_client.stats()
+            for name, help_text in (
+                ("calls", "AI API requests made"),
+                ("failures", "AI API requests that failed"),
+                ("retries", "AI API requests retried"),
+                ("rejected", "AI API calls rejected by an open circuit breaker"),
+            ):
+                family = CounterMetricFamily(f"sstudy_ai_{name}", help_text, labels=["operation"])
+                for operation, values in stats.items():
+                    family.add_metric([operation], values[name])
+                yield family
+            throttled = CounterMetricFamily("sstudy_ai_throttled_seconds", "Time AI calls waited for the rate limiter", labels=["operation"])
+            circuit = GaugeMetricFamily("sstudy_ai_circuit_open", "1 while the operation's circuit breaker rejects calls", labels=["operation"])
+            for operation, values in stats.items():
+                throttled.add_metric([operation], values["throttled_s"])
+                circuit.add_metric([operation], 1 if values["circuit"] == "open" else 0)
+            yield throttled
+            yield circuit
+
+        caches = {}
+        embeddings_module = sys.modules.get("app.services.embedding_cache")
+        if embeddings_module is not None:
+            caches["query_embedding"] = embeddings_module.query_embedding_cache.stats()
+        transcription_module = sys.modules.get("app.services.transcription")
+        if transcription_module is not None:
+            for name, stats in transcription_module.insights_cache_stats().items():
+                if stats is not None:
+                    caches[f"insights_{name}"] = stats
+        for name in ("hits", "misses"):
+            family = CounterMetricFamily(f"sstudy_cache_{name}", f"Cache {name}", labels=["cache"])
+            for cache, stats in caches.items():
+                family.add_metric([cache], stats[name])
+            yield family
+
+REGISTRY.register(ServiceStatsCollector())
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Metrics in the Prometheus text format. With PROMETHEUS_MULTIPROC_DIR set
+    (several uvicorn workers), the histograms of every process are merged.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,128 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, Sequence
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import selectinload, load_only
+from app.models.course import Course, Module, Lesson, Language, CourseCategory, DifficultyLevel, LESSON_LIST_COLUMNS
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(*key: int) -> str:
+    """
+    Opaque page cursor: the sort key of the last row returned, base64url encoded.
+    """
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> tuple[int, ...]:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if not isinstance(key, list) or len(key) != size or not all(type(value) is int for value in key):
+        raise InvalidCursor("Invalid cursor")
+    return tuple(key)
+
+def _page(rows: Sequence[Any], limit: int, sort_key: Callable[[Any], tuple]) -> tuple[list, str | None]:
+    # One row more than a page was fetched to know whether there is a next one
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*sort_key(rows[-1]))
+
+def _load_lessons(difficulty: DifficultyLevel | None, modules=None):
+    # Nested lessons get the same difficulty filter, and only their list columns
+    lessons = Module.lessons.and_(Lesson.difficulty == difficulty) if difficulty else Module.lessons
+    loader = modules.selectinload(lessons) if modules is not None else selectinload(lessons)
+    return loader.load_only(*LESSON_LIST_COLUMNS)
+
+def _has_lessons(difficulty: DifficultyLevel, module_id=None, course_id=None):
+    stmt = select(Lesson.id).where(Lesson.difficulty == difficulty)
+    if module_id is not None:
+        stmt = stmt.where(Lesson.module_id == module_id)
+    if course_id is not None:
+        stmt = stmt.join(Module, Module.id == Lesson.module_id).where(Module.course_id == course_id)
+    return stmt.exists()
+
+async def list_courses(
+    db: AsyncSession,
+    limit: int,
+    cursor: str | None = None,
+    language: Language | None = None,
+    category: CourseCategory | None = None,
+    difficulty: DifficultyLevel | None = None,
+    include_modules: bool = False,
+    include_lessons: bool = False,
+) -> tuple[list[Course], str | None]:
+    """
+    A page of courses by id, with their modules (and the modules' lessons)
+    loaded in one extra query per level instead of one per course.
+    `difficulty` keeps the courses having a lesson of that level.
+    Returns the courses and the cursor of the next page, if any.
+    """
+    stmt = select(Course).order_by(Course.id).limit(limit + 1)
+    if cursor:
+        (after_id,) = decode_cursor(cursor, 1)
+        stmt = stmt.where(Course.id > after_id)
+    if language:
+        stmt = stmt.where(Course.language == language)
+    if category:
+        stmt = stmt.where(Course.category == category)
+    if difficulty:
+        stmt = stmt.where(_has_lessons(difficulty, course_id=Course.id))
+    if include_modules or include_lessons:
+        modules = selectinload(Course.modules)
+        stmt = stmt.options(_load_lessons(difficulty, modules) if include_lessons else modules)
+    result = await db.execute(stmt)
+    return _page(result.scalars(), limit, lambda course: (course.id,))
+
+async def list_modules(
+    db: AsyncSession,
+    course_id: int,
+    limit: int,
+    cursor: str | None = None,
+    difficulty: DifficultyLevel | None = None,
+    include_lessons: bool = False,
+) -> tuple[list[Module], str | None]:
+    """
+    A page of a course's modules in ("order", id) order, optionally with their lessons.
+    `difficulty` keeps the modules having a lesson of that level.
+    """
+    stmt = select(Module).where(Module.course_id == course_id).order_by(Module.order, Module.id).limit(limit + 1)
+    if cursor:
+        stmt = stmt.where(tuple_(Module.order, Module.id) > tuple_(*decode_cursor(cursor, 2)))
+    if difficulty:
+        stmt = stmt.where(_has_lessons(difficulty, module_id=Module.id))
+    if include_lessons:
+        stmt = stmt.options(_load_lessons(difficulty))
+    result = await db.execute(stmt)
+    return _page(result.scalars(), limit, lambda module: (module.order, module.id))
+
+async def list_lessons(
+    db: AsyncSession,
+    course_id: int,
+    module_id: int,
+    limit: int,
+    cursor: str | None = None,
+    difficulty: DifficultyLevel | None = None,
+) -> tuple[list[Lesson], str | None]:
+    """
+    A page of a module's lessons in ("order", id) order, list columns only.
+    """
+    stmt = (
+        select(Lesson)
+        .join(Module, Module.id == Lesson.module_id)
+        .where(Lesson.module_id == module_id, Module.course_id == course_id)
+        .options(load_only(*LESSON_LIST_COLUMNS))
+        .order_by(Lesson.order, Lesson.id)
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(tuple_(Lesson.order, Lesson.id) > tuple_(*decode_cursor(cursor, 2)))
+    if difficulty:
+        stmt = stmt.where(Lesson.difficulty == difficulty)
+    result = await db.execute(stmt)
+    return _page(result.scalars(), limit, lambda lesson: (lesson.order, lesson.id))
@@ -0,0 +1,133 @@
+import random
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, and_, or_
+from app.core.config import settings
+from app.models.job import ProcessingJob, JobStatus, JobType
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def retry_delay(attempts: int) -> float:
+    """
+    Seconds to wait before the next attempt: exponential backoff from
+    JOB_RETRY_BASE_DELAY, capped at JOB_RETRY_MAX_DELAY, with jitter so jobs
+    that failed together (e.g. an API outage) don't all retry together.
+    """
+    delay = min(settings.JOB_RETRY_MAX_DELAY, settings.JOB_RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+def enqueue_job(db: AsyncSession, job_type: JobType, lesson_id: int | None = None, payload: dict | None = None) -> ProcessingJob:
+    """
+    Add a queued job to the session. The caller commits, so the job becomes
+    visible to workers together with whatever it refers to.
+    """
+    job = ProcessingJob(type=job_type, lesson_id=lesson_id, payload=payload or {}, status=JobStatus.QUEUED)
+    db.add(job)
+    return job
+
+async def claim_jobs(db: AsyncSession, worker_id: str, limit: int) -> list[ProcessingJob]:
+    """
+    Lease up to `limit` due jobs for this worker. FOR UPDATE SKIP LOCKED lets
+    any number of workers poll the same table without handing out a job twice.
+    Running jobs whose lease expired (their worker died) are picked up again.
+    """
+    stale = _now() - timedelta(seconds=settings.JOB_LEASE_TIMEOUT)
+
+    # Expired leases with no attempts left are given up on rather than retried forever
+    await db.execute(
+        update(ProcessingJob)
+        .where(
+            ProcessingJob.status == JobStatus.RUNNING,
+            ProcessingJob.locked_at < stale,
+            ProcessingJob.attempts >= ProcessingJob.max_attempts,
+        )
+        .values(status=JobStatus.FAILED, last_error="Worker lease expired", finished_at=_now(), locked_by=None)
+    )
+
+    result = await db.execute(
+        select(ProcessingJob)
+        .where(or_(
+            and_(ProcessingJob.status == JobStatus.QUEUED, ProcessingJob.next_run_at <= _now()),
+            and_(ProcessingJob.status == JobStatus.RUNNING, ProcessingJob.locked_at < stale),
+        ))
+        .order_by(ProcessingJob.next_run_at, ProcessingJob.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    jobs = list(result.scalars())
+    for job in jobs:
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.stage = None
+        job.locked_by = worker_id
+        job.locked_at = _now()
+    await db.commit()
+    return jobs
+
+async def set_job_stage(db: AsyncSession, job_id: int, stage: str):
+    """
+    Record the stage a running job has reached; doubles as the lease heartbeat.
+    """
+    await db.execute(
+        update(ProcessingJob).where(ProcessingJob.id == job_id).values(stage=stage, locked_at=_now())
+    )
+    await db.commit()
+
+async def renew_job_lease(db: AsyncSession, job_id: int, worker_id: str) -> bool:
+    """
+    Heartbeat of a running job. Returns False if the job is no longer leased
+    to this worker (it was reclaimed after the lease expired, or finished).
+    """
+    result = await db.execute(
+        update(ProcessingJob)
+        .where(ProcessingJob.id == job_id, ProcessingJob.status == JobStatus.RUNNING, ProcessingJob.locked_by == worker_id)
+        .values(locked_at=_now())
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+async def set_job_progress(db: AsyncSession, job_id: int, progress: dict):
+    """
+    Record how far a running job has got; also renews the lease.
+    """
+    await db.execute(
+        update(ProcessingJob).where(ProcessingJob.id == job_id).values(progress=progress, locked_at=_now())
+    )
+    await db.commit()
+
+async def mark_job_succeeded(db: AsyncSession, job_id: int):
+    await db.execute(
+        update(ProcessingJob)
+        .where(ProcessingJob.id == job_id)
+        .values(status=JobStatus.SUCCEEDED, stage=None, last_error=None, finished_at=_now(), locked_by=None, locked_at=None)
+    )
+    await db.commit()
+
+async def mark_job_failed(db: AsyncSession, job_id: int, error: str) -> JobStatus:
+    """
+    Re-queue the job with backoff, or fail it for good once it is out of attempts.
+    """
+    job = await db.get(ProcessingJob, job_id)
+    job.last_error = error
+    job.locked_by = None
+    job.locked_at = None
+    if job.attempts >= job.max_attempts:
+        job.status = JobStatus.FAILED
+        job.finished_at = _now()
+    else:
+        job.status = JobStatus.QUEUED
+        job.next_run_at = _now() + timedelta(seconds=retry_delay(job.attempts))
+    await db.commit()
+    return job.status
+
+async def get_job(db: AsyncSession, job_id: int, job_type: JobType | None = None) -> ProcessingJob | None:
+    job = await db.get(ProcessingJob, job_id)
+    return job if job and (job_type is None or job.type == job_type) else None
+
+async def get_latest_job(db: AsyncSession, lesson_id: int, job_type: JobType | None = None) -> ProcessingJob | None:
+    stmt = select(ProcessingJob).where(ProcessingJob.lesson_id == lesson_id)
+    if job_type is not None:
+        stmt = stmt.where(ProcessingJob.type == job_type)
+    result = await db.execute(stmt.order_by(ProcessingJob.id.desc()).limit(1))
+    return result.scalar_one_or_none()
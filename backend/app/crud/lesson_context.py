@@ -0,0 +1,36 @@
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.course import Lesson, LessonContext
+
+async def invalidate_lesson_contexts(db: AsyncSession, lesson_ids: list[int]):
+    """
+    Bump the context version of lessons whose title, content or AI content
+    changed, so their stored payloads and ETags stop matching. The caller commits,
+    together with the change itself.
+    """
+    if lesson_ids:
+        await db.execute(
+            update(Lesson).where(Lesson.id.in_(lesson_ids)).values(context_version=Lesson.context_version + 1)
+        )
+
+async def get_context_version(db: AsyncSession, lesson_id: int) -> int | None:
+    # Only the integer column is read, not the (large) rest of the lesson row
+    return await db.scalar(select(Lesson.context_version).where(Lesson.id == lesson_id))
+
+async def get_context_payload(db: AsyncSession, lesson_id: int, etag: str) -> bytes | None:
+    return await db.scalar(
+        select(LessonContext.payload).where(LessonContext.lesson_id == lesson_id, LessonContext.etag == etag)
+    )
+
+async def save_context_payload(db: AsyncSession, lesson_id: int, etag: str, payload: bytes):
+    """
+    Store the payload for this version of the lesson, replacing any older one. The caller commits.
+    """
+    stmt = insert(LessonContext).values(lesson_id=lesson_id, etag=etag, payload=payload)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[LessonContext.lesson_id],
+            set_={"etag": stmt.excluded.etag, "payload": stmt.excluded.payload},
+        )
+    )
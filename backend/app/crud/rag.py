@@ -1,36 +1,435 @@
+import hashlib
+from contextlib import nullcontext
+from typing import AsyncIterable, AsyncIterator, Iterable
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.models.rag import DocumentChunk
-from app.models.course import Lesson
-from app.services.embeddings import get_embedding, get_query_embedding
+from sqlalchemy.dialects.postgresql import REGCONFIG, insert as pg_insert
+from sqlalchemy import select, insert, update, delete, func, literal, cast, or_, and_
+from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.models.rag import DocumentChunk, LessonDocument, SearchMode
+from app.models.course import Course, Module, Lesson, Enrollment
+from app.models.user import User, UserRole
+from app.db.vector_index import set_vector_search_params, binary_quantized, embedding_column_type
+from app.services.embeddings import embed_documents, get_cached_query_embedding, get_embedding_provider
 from app.services.chunking import chunk_text
 
-async def add_lesson_documents(db: AsyncSession, lesson_id: int, content: str):
+def content_hash(text: str) -> str:
+    """
+    SHA-256 of the UTF-8 text, hex encoded. Matches
+    encode(sha256(convert_to(content, 'UTF8')), 'hex') on the Postgres side.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+async def get_reusable_embeddings(db: AsyncSession, hashes: list[str], model_name: str) -> dict[str, list[float]]:
+    """
+    Look up vectors already stored for identical chunk text, in any lesson,
+    produced by the same embedding model.
+    """
+    if not hashes:
+        return {}
+    stmt = (
+        select(DocumentChunk.content_hash, DocumentChunk.embedding)
+        .where(DocumentChunk.content_hash.in_(hashes))
+        .where(DocumentChunk.embedding_model == model_name)
+        .distinct(DocumentChunk.content_hash)
+    )
+    result = await db.execute(stmt)
+    return {row.content_hash: row.embedding for row in result}
+
+async def get_lesson_course_id(db: AsyncSession, lesson_id: int) -> int | None:
+    result = await db.execute(
+        select(Module.course_id).join(Lesson, Lesson.module_id == Module.id).where(Lesson.id == lesson_id)
+    )
+    return result.scalar_one_or_none()
+
+async def index_lesson_chunks(
+    db: AsyncSession,
+    lesson_id: int,
+    chunks: list[str],
+    document_id: int | None = None,
+    course_id: int | None = None,
+) -> dict:
+    """
+    Embed chunks in batches and write them with a single bulk insert.
+    Chunks whose text is already indexed anywhere reuse the stored vector.
+    The caller is responsible for committing.
+    """
+    if not chunks:
+        return {"embedded": 0, "reused": 0}
+    if course_id is None:
+        course_id = await get_lesson_course_id(db, lesson_id)
+
+    model_name = get_embedding_provider().model_name
+    hashes = [content_hash(chunk) for chunk in chunks]
+    with timed_stage("ingest", "embedding_lookup"):
+        embeddings = await get_reusable_embeddings(db, list(set(hashes)), model_name)
+    reused = len(embeddings)
+
+    to_embed = {h: chunk for h, chunk in zip(hashes, chunks) if h not in embeddings}
+    if to_embed:
+        with timed_stage("ingest", "embedding"):
+            vectors = await embed_documents(list(to_embed.values()))
+        embeddings.update(zip(to_embed.keys(), vectors))
+
+    with timed_stage("ingest", "db_write"):
+        await db.execute(
+            insert(DocumentChunk),
+            [
+                {
+                    "lesson_id": lesson_id,
+                    "course_id": course_id,
+                    "document_id": document_id,
+                    "content": chunk,
+                    "content_hash": h,
+                    "embedding": embeddings[h],
+                    "embedding_model": model_name,
+                }
+                for h, chunk in zip(hashes, chunks)
+            ],
+        )
+    return {"embedded": len(to_embed), "reused": reused}
+
+async def _batched(chunks: Iterable[str] | AsyncIterable[str], size: int) -> AsyncIterator[list[str]]:
+    batch = []
+    if isinstance(chunks, AsyncIterable):
+        async for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    else:
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+async def _lock_lesson_document(db: AsyncSession, lesson_id: int, source: str) -> LessonDocument | None:
+    result = await db.execute(
+        select(LessonDocument)
+        .where(LessonDocument.lesson_id == lesson_id, LessonDocument.source == source)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+async def sync_lesson_document(
+    db: AsyncSession,
+    lesson_id: int,
+    source: str,
+    content: str | Iterable[str] | AsyncIterable[str],
+    doc_hash: str | None = None,
+) -> dict:
+    """
+    Incrementally (re)index one source document of a lesson.
+
+    `content` is either the full text or a stream of chunks (e.g. from a PDF
+    still being parsed); for a stream, `doc_hash` must identify the source
+    (e.g. the SHA-256 of the uploaded file).
+
+    - If the document hash is unchanged, nothing is done.
+    - Otherwise only new or changed chunks are embedded, chunks that no longer
+      appear are deleted, and unchanged chunks are kept as they are.
+    - Chunks of the lesson indexed before documents were tracked (no
+      document_id) are adopted by the first document synced that contains
+      their text and deleted otherwise, since their source is unknown.
+    Chunks are embedded and written batch by batch as they arrive.
+    The document row stays locked until the caller commits, so concurrent
+    syncs of the same document run one after the other.
+    The caller is responsible for committing.
+    """
+    streamed = not isinstance(content, str)
+    if not streamed:
+        doc_hash = doc_hash or content_hash(content)
+        with timed_stage("ingest", "chunking"):
+            content = chunk_text(content)
+    elif doc_hash is None:
+        raise ValueError("doc_hash is required when content is a chunk stream")
+
+    document = await _lock_lesson_document(db, lesson_id, source)
+    if document is None:
+        # A concurrent first sync of the same source may insert it first: then this waits for
+        # that transaction and locks its row instead
+        await db.execute(
+            pg_insert(LessonDocument)
+            .values(lesson_id=lesson_id, source=source, content_hash="")
+            .on_conflict_do_nothing(constraint="uq_lesson_documents_lesson_source")
+        )
+        document = await _lock_lesson_document(db, lesson_id, source)
+
+    if document.content_hash == doc_hash:
+        return {"unchanged": True, "chunks": document.chunk_count, "embedded": 0, "reused": 0, "deleted": 0}
+
+    result = await db.execute(
+        select(DocumentChunk.id, DocumentChunk.content_hash, DocumentChunk.document_id)
+        .where(or_(
+            DocumentChunk.document_id == document.id,
+            and_(DocumentChunk.lesson_id == lesson_id, DocumentChunk.document_id.is_(None)),
+        ))
+        # The document's own chunk wins over a legacy one with the same text
+        .order_by(DocumentChunk.document_id.nulls_last())
+    )
+    existing: dict[str, int] = {}
+    legacy_ids: set[int] = set()
+    duplicate_ids = []
+    for row in result:
+        if row.content_hash in existing:
+            duplicate_ids.append(row.id)
+            continue
+        existing[row.content_hash] = row.id
+        if row.document_id is None:
+            legacy_ids.add(row.id)
+    course_id = await get_lesson_course_id(db, lesson_id)
+
+    seen: set[str] = set()
+    stats = {"embedded": 0, "reused": 0}
+    # Enough chunks per batch to keep every embedding request slot busy
+    batch_size = settings.EMBEDDING_BATCH_SIZE * settings.EMBEDDING_CONCURRENCY
+    batches = _batched(content, batch_size)
+    while True:
+        # For a stream, waiting for the next batch is the parsing and chunking upstream
+        with timed_stage("ingest", "chunking") if streamed else nullcontext():
+            batch = await anext(batches, None)
+        if batch is None:
+            break
+        new_chunks = []
+        for chunk in batch:
+            h = content_hash(chunk)
+            if h in seen:
+                continue
+            seen.add(h)
+            if h not in existing:
+                new_chunks.append(chunk)
+        batch_stats = await index_lesson_chunks(
+            db, lesson_id, new_chunks, document_id=document.id, course_id=course_id,
+        )
+        stats["embedded"] += batch_stats["embedded"]
+        stats["reused"] += batch_stats["reused"]
+
+    stale_ids = [chunk_id for h, chunk_id in existing.items() if h not in seen] + duplicate_ids
+    adopted_ids = [chunk_id for h, chunk_id in existing.items() if h in seen and chunk_id in legacy_ids]
+    with timed_stage("ingest", "db_write"):
+        if stale_ids:
+            await db.execute(delete(DocumentChunk).where(DocumentChunk.id.in_(stale_ids)))
+        if adopted_ids:
+            await db.execute(
+                update(DocumentChunk).where(DocumentChunk.id.in_(adopted_ids)).values(document_id=document.id)
+            )
+
+    document.content_hash = doc_hash
+    document.chunk_count = len(seen)
+    return {"unchanged": False, "chunks": len(seen), "deleted": len(stale_ids), **stats}
+
+async def add_lesson_documents(
+    db: AsyncSession,
+    lesson_id: int,
+    content: str | Iterable[str] | AsyncIterable[str],
+    source: str = "material",
+    doc_hash: str | None = None,
+) -> dict:
     """
     Chunk lesson content, generate embeddings, and save to DB.
+    Re-uploading the same source only re-embeds what changed.
+    """
+    stats = await sync_lesson_document(db, lesson_id, source, content, doc_hash)
+    with timed_stage("ingest", "commit"):
+        await db.commit()
+    return stats
+
+async def get_accessible_course_ids(db: AsyncSession, user: User) -> list[int] | None:
+    """
+    Courses whose material the user may search: the ones they are enrolled in
+    or teach. None means no restriction (admins).
+    """
+    if user.role == UserRole.ADMIN:
+        return None
+    result = await db.execute(
+        select(Enrollment.course_id).where(Enrollment.student_id == user.id)
+        .union(select(Course.id).where(Course.teacher_id == user.id))
+    )
+    return list(result.scalars())
+
+def _scope_filters(
+    course_ids: list[int] | None = None,
+    module_id: int | None = None,
+    lesson_id: int | None = None,
+) -> list:
+    filters = []
+    if course_ids is not None:
+        if len(course_ids) == 1:
+            # Rendered inline rather than bound, so the planner can match the course's partial index
+            filters.append(DocumentChunk.course_id == literal(course_ids[0], literal_execute=True))
+        else:
+            filters.append(DocumentChunk.course_id.in_(course_ids))
+    if module_id is not None:
+        filters.append(DocumentChunk.lesson_id.in_(select(Lesson.id).where(Lesson.module_id == module_id)))
+    if lesson_id is not None:
+        filters.append(DocumentChunk.lesson_id == lesson_id)
+    return filters
+
+async def _count_up_to(db: AsyncSession, filters: list, limit: int) -> int:
+    # Stops counting past `limit`, so a large scope costs no more than a small one
+    matching = select(DocumentChunk.id).where(*filters).limit(limit + 1).subquery()
+    result = await db.execute(select(func.count()).select_from(matching))
+    return result.scalar_one()
+
+def _nearest(query_embedding: list[float], limit: int, filters: list = (), exact: bool = False):
+    """
+    Subquery of (id, distance) for the `limit` nearest chunks by cosine distance.
+
+    With the binary index enabled, a coarse pass takes BINARY_RERANK_FACTOR x
+    `limit` candidates by Hamming distance on the binary-quantized vectors,
+    which are then re-ranked exactly on the stored embeddings.
+
+    `exact` is for narrow scopes (a lesson or module): the matching rows are
+    collected first and scanned exhaustively, instead of walking the ANN index
+    and discarding almost everything it returns.
+    """
+    if exact:
+        scoped = (
+            select(DocumentChunk.id, DocumentChunk.embedding)
+            .where(*filters)
+            .cte("scoped_chunks")
+            .prefix_with("MATERIALIZED")
+        )
+        distance = scoped.c.embedding.cosine_distance(query_embedding)
+        return select(scoped.c.id, distance.label("distance")).order_by(distance).limit(limit).subquery()
+
+    if not settings.EMBEDDING_BINARY_INDEX:
+        # pgvector's cosine distance operator is <=>
+        # We want similarity, so we order by distance ascending (closest first)
+        distance = DocumentChunk.embedding.cosine_distance(query_embedding)
+        return (
+            select(DocumentChunk.id, distance.label("distance"))
+            .where(*filters)
+            .order_by(distance)
+            .limit(limit)
+            .subquery()
+        )
+
+    query_bits = binary_quantized(cast(query_embedding, embedding_column_type()))
+    coarse = (
+        select(DocumentChunk.id, DocumentChunk.embedding)
+        .where(*filters)
+        .order_by(binary_quantized(DocumentChunk.embedding).hamming_distance(query_bits))
+        .limit(limit * settings.BINARY_RERANK_FACTOR)
+        .subquery()
+    )
+    distance = coarse.c.embedding.cosine_distance(query_embedding)
+    return select(coarse.c.id, distance.label("distance")).order_by(distance).limit(limit).subquery()
+
+def _vector_candidates(query_embedding: list[float], limit: int, filters: list = (), exact: bool = False):
+    nearest = _nearest(query_embedding, limit, filters, exact)
+    return select(
+        nearest.c.id,
+        func.row_number().over(order_by=nearest.c.distance).label("rank"),
+    )
+
+def _lexical_candidates(query: str, limit: int, filters: list = ()):
+    ts_query = func.websearch_to_tsquery(literal(settings.TEXT_SEARCH_CONFIG).cast(REGCONFIG), query)
+    ts_rank = func.ts_rank_cd(DocumentChunk.content_tsv, ts_query)
+    matches = (
+        select(DocumentChunk.id, ts_rank.label("ts_rank"))
+        .where(DocumentChunk.content_tsv.op("@@")(ts_query), *filters)
+        .order_by(ts_rank.desc())
+        .limit(limit)
+        .subquery()
+    )
+    return select(
+        matches.c.id,
+        func.row_number().over(order_by=matches.c.ts_rank.desc()).label("rank"),
+    )
+
+async def search_similar_documents(
+    db: AsyncSession,
+    query: str,
+    limit: int = 5,
+    mode: SearchMode | None = None,
+    course_ids: list[int] | None = None,
+    module_id: int | None = None,
+    lesson_id: int | None = None,
+    ef_search: int | None = None,
+    probes: int | None = None,
+):
+    """
+    Search for document chunks relevant to the query.
+
+    - vector: cosine similarity over the ANN index, against chunks embedded by the current provider's model.
+    - lexical: full-text match over the GIN index (no embedding request needed).
+    - hybrid: both candidate lists in one query, merged with reciprocal rank fusion.
+    Results can be restricted to `course_ids` (None means every course), a module or a lesson.
+    Scopes with at most EXACT_SEARCH_MAX_CHUNKS chunks are searched exactly, larger filtered
+    ones over the ANN index with iterative scans (HNSW_ITERATIVE_SCAN) where pgvector has them.
+    ef_search (HNSW) / probes (IVFFlat) trade recall for latency on this query only.
     """
-    chunks = chunk_text(content)
-    for chunk in chunks:
-        embedding = get_embedding(chunk)
-        db_chunk = DocumentChunk(
-            lesson_id=lesson_id,
-            content=chunk,
-            embedding=embedding
-        )
-        db.add(db_chunk)
-    await db.commit()
-
-async def search_similar_documents(db: AsyncSession, query: str, limit: int = 5):
-    """
-    Search for documents similar to the query using cosine similarity.
-    """
-    query_embedding = get_query_embedding(query)
-    
-    # pgvector's cosine distance operator is <=>
-    # We want similarity, so we order by distance ascending (closest first)
-    stmt = select(DocumentChunk).order_by(
-        DocumentChunk.embedding.cosine_distance(query_embedding)
-    ).limit(limit)
-    
+    mode = SearchMode(mode or settings.RAG_SEARCH_MODE)
+    candidates = max(settings.HYBRID_CANDIDATES, limit)
+    if course_ids is not None and not course_ids:
+        return []
+    filters = _scope_filters(course_ids, module_id, lesson_id)
+    exact = module_id is not None or lesson_id is not None
+
+    if mode == SearchMode.LEXICAL:
+        lexical = _lexical_candidates(query, limit, filters).cte("lexical_hits")
+        stmt = (
+            select(DocumentChunk)
+            .join(lexical, lexical.c.id == DocumentChunk.id)
+            .order_by(lexical.c.rank)
+        )
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    query_embedding = await get_cached_query_embedding(query)
+    # Only vectors from the model that embedded the query are comparable with it (and this
+    # matches the per-course partial indexes, hence inline). Lexical hits don't depend on it
+    vector_filters = [*filters, DocumentChunk.embedding_model == literal(get_embedding_provider().model_name, literal_execute=True)]
+    if course_ids is not None and not exact:
+        # A few small courses (typical for a student) are cheaper to scan exactly than to post-filter
+        # the global graph, which can come back short. Large single courses use their partial index
+        exact = await _count_up_to(db, vector_filters, settings.EXACT_SEARCH_MAX_CHUNKS) <= settings.EXACT_SEARCH_MAX_CHUNKS
+    if settings.EMBEDDING_BINARY_INDEX and not exact:
+        # HNSW returns at most ef_search rows, so the coarse pass needs room for all its candidates
+        coarse = (limit if mode == SearchMode.VECTOR else candidates) * settings.BINARY_RERANK_FACTOR
+        ef_search = max(ef_search or settings.HNSW_EF_SEARCH, coarse)
+    await set_vector_search_params(
+        db,
+        ef_search=ef_search,
+        probes=probes,
+        # Keep scanning the index until enough rows pass the filter
+        iterative_scan=settings.HNSW_ITERATIVE_SCAN if not exact else None,
+    )
+
+    if mode == SearchMode.VECTOR:
+        nearest = _nearest(query_embedding, limit, vector_filters, exact)
+        stmt = (
+            select(DocumentChunk)
+            .join(nearest, nearest.c.id == DocumentChunk.id)
+            .order_by(nearest.c.distance)
+        )
+        result = await db.execute(stmt)
+        return result.scalars().all()
+
+    # Reciprocal rank fusion: score = sum over lists of 1 / (k + rank)
+    vector = _vector_candidates(query_embedding, candidates, vector_filters, exact).cte("vector_hits")
+    lexical = _lexical_candidates(query, candidates, filters).cte("lexical_hits")
+    fused = (
+        select(
+            func.coalesce(vector.c.id, lexical.c.id).label("id"),
+            (
+                func.coalesce(1.0 / (settings.RRF_K + vector.c.rank), 0.0)
+                + func.coalesce(1.0 / (settings.RRF_K + lexical.c.rank), 0.0)
+            ).label("score"),
+        )
+        .select_from(vector.join(lexical, vector.c.id == lexical.c.id, full=True))
+        .cte("fused")
+    )
+    stmt = (
+        select(DocumentChunk)
+        .join(fused, fused.c.id == DocumentChunk.id)
+        .order_by(fused.c.score.desc(), DocumentChunk.id)
+        .limit(limit)
+    )
     result = await db.execute(stmt)
     return result.scalars().all()
@@ -0,0 +1,80 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, or_
+from app.core.config import settings
+from app.models.upload import VideoUpload, UploadStatus
+
+def staging_path(upload_id: str) -> str:
+    return os.path.join(settings.UPLOAD_STAGING_DIR, upload_id)
+
+def create_upload(
+    db: AsyncSession,
+    user_id: int,
+    length: int,
+    module_id: int | None = None,
+    title: str | None = None,
+    filename: str | None = None,
+    sha256: str | None = None,
+    is_partial: bool = False,
+    parts: list[str] | None = None,
+) -> VideoUpload:
+    """
+    Register an upload and create its empty staging file. The caller commits.
+    """
+    upload = VideoUpload(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        module_id=module_id,
+        title=title,
+        filename=filename,
+        length=length,
+        offset=0,
+        sha256=sha256,
+        is_partial=is_partial,
+        parts=parts,
+        status=UploadStatus.UPLOADING,
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=settings.UPLOAD_EXPIRATION),
+    )
+    db.add(upload)
+    os.makedirs(settings.UPLOAD_STAGING_DIR, exist_ok=True)
+    open(staging_path(upload.id), "wb").close()
+    return upload
+
+async def get_upload(db: AsyncSession, upload_id: str, user_id: int) -> VideoUpload | None:
+    result = await db.execute(select(VideoUpload).where(VideoUpload.id == upload_id, VideoUpload.user_id == user_id))
+    return result.scalar_one_or_none()
+
+async def get_uploads(db: AsyncSession, upload_ids: list[str], user_id: int) -> list[VideoUpload]:
+    result = await db.execute(select(VideoUpload).where(VideoUpload.id.in_(upload_ids), VideoUpload.user_id == user_id))
+    return list(result.scalars())
+
+async def delete_upload(db: AsyncSession, upload: VideoUpload):
+    """
+    Remove an upload and its staged bytes. The caller commits.
+    """
+    if os.path.exists(staging_path(upload.id)):
+        os.remove(staging_path(upload.id))
+    await db.delete(upload)
+
+async def purge_expired_uploads(db: AsyncSession) -> int:
+    """
+    Delete unfinished uploads past their expiry, with their staged bytes,
+    including parts never concatenated. Finished uploads keep their row
+    (the video itself has moved to storage).
+    """
+    result = await db.execute(
+        select(VideoUpload.id).where(
+            or_(VideoUpload.status != UploadStatus.COMPLETE, VideoUpload.is_partial),
+            VideoUpload.expires_at < datetime.now(timezone.utc),
+        )
+    )
+    upload_ids = list(result.scalars())
+    for upload_id in upload_ids:
+        if os.path.exists(staging_path(upload_id)):
+            os.remove(staging_path(upload_id))
+    if upload_ids:
+        await db.execute(delete(VideoUpload).where(VideoUpload.id.in_(upload_ids)))
+    await db.commit()
+    return len(upload_ids)
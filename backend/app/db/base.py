@@ -1,4 +1,6 @@
 from app.db.base_class import Base
 from app.models.user import User
-from app.models.course import Course, Module, Lesson, Assignment, Enrollment
-from app.models.rag import DocumentChunk
+from app.models.course import Course, Module, Lesson, LessonContext, Assignment, Enrollment
+from app.models.rag import DocumentChunk, LessonDocument
+from app.models.job import ProcessingJob
+from app.models.upload import VideoUpload
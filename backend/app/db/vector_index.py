@@ -0,0 +1,242 @@
+from sqlalchemy import Index, cast, func, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from pgvector.sqlalchemy import Vector, HALFVEC, BIT
+from app.core.config import settings
+
+VECTOR_INDEX_NAME = "ix_document_chunks_embedding"
+BINARY_INDEX_NAME = "ix_document_chunks_embedding_bq"
+COURSE_INDEX_PREFIX = "ix_document_chunks_embedding_course_"
+VECTOR_INDEX_TYPES = ("hnsw", "ivfflat", "none")
+EMBEDDING_STORAGE_TYPES = ("vector", "halfvec")
+DIMENSIONS = 768 # Gemini Embedding 001 dimension
+
+def embedding_column_type(storage: str | None = None):
+    """
+    Column type for embeddings: float32 `vector` or float16 `halfvec`
+    (half the size on disk and in the index, with negligible recall loss).
+    """
+    storage = storage or settings.EMBEDDING_STORAGE
+    if storage not in EMBEDDING_STORAGE_TYPES:
+        raise ValueError(f"Unknown embedding storage: {storage}")
+    return HALFVEC(DIMENSIONS) if storage == "halfvec" else Vector(DIMENSIONS)
+
+def course_index_name(course_id: int) -> str:
+    return f"{COURSE_INDEX_PREFIX}{int(course_id)}"
+
+def vector_ops(storage: str | None = None) -> str:
+    return f"{storage or settings.EMBEDDING_STORAGE}_cosine_ops"
+
+def binary_quantized(expression):
+    """
+    binary_quantize(expression)::bit(768) -- one bit per dimension (the sign).
+    Queries must use exactly this expression to hit the Hamming index.
+    """
+    return cast(func.binary_quantize(expression), BIT(DIMENSIONS))
+
+def vector_index_params(index_type: str, **overrides) -> dict:
+    """
+    Build-time parameters for the given index type, taken from settings
+    unless overridden (m / ef_construction for HNSW, lists for IVFFlat).
+    """
+    if index_type == "hnsw":
+        params = {"m": settings.HNSW_M, "ef_construction": settings.HNSW_EF_CONSTRUCTION}
+    elif index_type == "ivfflat":
+        params = {"lists": settings.IVFFLAT_LISTS}
+    else:
+        return {}
+    params.update({key: value for key, value in overrides.items() if key in params and value is not None})
+    return params
+
+def build_vector_index(column: str = "embedding", index_type: str | None = None) -> Index | None:
+    """
+    SQLAlchemy Index for a pgvector column using cosine distance, so that
+    `Base.metadata.create_all` creates the ANN index along with the table.
+    """
+    index_type = index_type or settings.VECTOR_INDEX_TYPE
+    if index_type == "none":
+        return None
+    return Index(
+        VECTOR_INDEX_NAME,
+        column,
+        postgresql_using=index_type,
+        postgresql_with=vector_index_params(index_type),
+        postgresql_ops={column: vector_ops()},
+    )
+
+def build_binary_index(column) -> Index | None:
+    """
+    HNSW Hamming-distance index over the binary-quantized embedding, used for
+    the coarse candidate pass when settings.EMBEDDING_BINARY_INDEX is on.
+    """
+    if not settings.EMBEDDING_BINARY_INDEX:
+        return None
+    return Index(
+        BINARY_INDEX_NAME,
+        binary_quantized(column).label("embedding_bq"),
+        postgresql_using="hnsw",
+        postgresql_with=vector_index_params("hnsw"),
+        postgresql_ops={"embedding_bq": "bit_hamming_ops"},
+    )
+
+def vector_index_ddl(
+    index_type: str,
+    table: str = "document_chunks",
+    column: str = "embedding",
+    name: str = VECTOR_INDEX_NAME,
+    concurrently: bool = False,
+    storage: str | None = None,
+    where: str | None = None,
+    **overrides,
+) -> str:
+    """
+    CREATE INDEX statement for an HNSW or IVFFlat index on a vector column,
+    optionally partial (`where` is the raw predicate).
+    """
+    if index_type not in ("hnsw", "ivfflat"):
+        raise ValueError(f"Unknown vector index type: {index_type}")
+    params = vector_index_params(index_type, **overrides)
+    with_clause = ", ".join(f"{key} = {int(value)}" for key, value in params.items())
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}{name} "
+        f"ON {table} USING {index_type} ({column} {vector_ops(storage)}) WITH ({with_clause})"
+        + (f" WHERE {where}" if where else "")
+    )
+
+def binary_index_ddl(
+    table: str = "document_chunks",
+    column: str = "embedding",
+    name: str = BINARY_INDEX_NAME,
+    concurrently: bool = False,
+    **overrides,
+) -> str:
+    """
+    CREATE INDEX statement for the HNSW Hamming index on binary_quantize(column).
+    """
+    params = vector_index_params("hnsw", **overrides)
+    with_clause = ", ".join(f"{key} = {int(value)}" for key, value in params.items())
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}{name} "
+        f"ON {table} USING hnsw ((binary_quantize({column})::bit({DIMENSIONS})) bit_hamming_ops) "
+        f"WITH ({with_clause})"
+    )
+
+async def create_vector_index(
+    conn: AsyncConnection,
+    index_type: str | None = None,
+    table: str = "document_chunks",
+    column: str = "embedding",
+    name: str = VECTOR_INDEX_NAME,
+    storage: str | None = None,
+    **overrides,
+):
+    """
+    (Re)build the ANN index on a vector column. Any existing index with the
+    same name is dropped first, so this can be used to switch index type or
+    tune build parameters. Passing index_type="none" only drops the index.
+    """
+    index_type = index_type or settings.VECTOR_INDEX_TYPE
+    if index_type not in VECTOR_INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type: {index_type}")
+
+    await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    if index_type != "none":
+        await conn.execute(text(vector_index_ddl(index_type, table, column, name, storage=storage, **overrides)))
+
+async def create_binary_index(conn: AsyncConnection, enabled: bool = True, **overrides):
+    """
+    (Re)build or drop the binary-quantized Hamming index on document_chunks.embedding.
+    """
+    await conn.execute(text(f"DROP INDEX IF EXISTS {BINARY_INDEX_NAME}"))
+    if enabled:
+        await conn.execute(text(binary_index_ddl(**overrides)))
+
+async def create_course_vector_indexes(
+    conn: AsyncConnection,
+    model_name: str,
+    index_type: str | None = None,
+    min_chunks: int | None = None,
+    rebuild: bool = False,
+    **overrides,
+) -> list[int]:
+    """
+    Partial ANN indexes (WHERE course_id = N AND embedding_model = model_name)
+    for every course with at least `min_chunks` chunks embedded by `model_name`
+    (the current provider's), so course-scoped searches walk a graph that only
+    holds that course's comparable vectors instead of post-filtering the global
+    one. Indexes of courses that fell below the threshold, or built for another
+    model, are dropped or rebuilt. Returns the indexed course ids.
+    """
+    index_type = index_type or settings.VECTOR_INDEX_TYPE
+    min_chunks = settings.COURSE_INDEX_MIN_CHUNKS if min_chunks is None else min_chunks
+    model_literal = "'" + model_name.replace("'", "''") + "'"
+
+    result = await conn.execute(
+        text(
+            "SELECT course_id FROM document_chunks WHERE course_id IS NOT NULL AND embedding_model = :model_name "
+            "GROUP BY course_id HAVING count(*) >= :min_chunks ORDER BY course_id"
+        ),
+        {"min_chunks": min_chunks, "model_name": model_name},
+    )
+    course_ids = list(result.scalars()) if index_type != "none" else []
+    result = await conn.execute(
+        text("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'document_chunks' AND indexname LIKE :prefix"),
+        {"prefix": f"{COURSE_INDEX_PREFIX}%"},
+    )
+    existing = dict(result.all())
+
+    wanted = {course_index_name(course_id): course_id for course_id in course_ids}
+    for name in existing.keys() - wanted.keys():
+        await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    for name, course_id in wanted.items():
+        # Indexes predating the model predicate, or built for another model, don't match current queries
+        if name in existing and model_literal in existing[name] and not rebuild:
+            continue
+        await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        await conn.execute(text(vector_index_ddl(
+            index_type, name=name, where=f"course_id = {int(course_id)} AND embedding_model = {model_literal}", **overrides,
+        )))
+    return course_ids
+
+_iterative_scan_supported: bool | None = None
+
+async def supports_iterative_scan(db: AsyncSession | AsyncConnection) -> bool:
+    """
+    Whether the installed pgvector (>= 0.8) has iterative index scans. Checked once per process.
+    """
+    global _iterative_scan_supported
+    if _iterative_scan_supported is None:
+        result = await db.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'"))
+        version = result.scalar()
+        try:
+            _iterative_scan_supported = version is not None and tuple(int(part) for part in version.split(".")[:2]) >= (0, 8)
+        except ValueError:
+            _iterative_scan_supported = False
+        if not _iterative_scan_supported and settings.HNSW_ITERATIVE_SCAN != "off":
+            print(f"pgvector {version} has no iterative scan; large filtered searches may return fewer results")
+    return _iterative_scan_supported
+
+async def set_vector_search_params(
+    db: AsyncSession | AsyncConnection,
+    ef_search: int | None = None,
+    probes: int | None = None,
+    iterative_scan: str | None = None,
+):
+    """
+    Set the ANN search parameters for the current transaction only
+    (hnsw.ef_search for HNSW, ivfflat.probes for IVFFlat, and for filtered
+    searches on pgvector >= 0.8 the iterative scan mode).
+    """
+    await db.execute(
+        text("SELECT set_config('hnsw.ef_search', :ef_search, true), set_config('ivfflat.probes', :probes, true)"),
+        {
+            "ef_search": str(ef_search or settings.HNSW_EF_SEARCH),
+            "probes": str(probes or settings.IVFFLAT_PROBES),
+        },
+    )
+    if iterative_scan and iterative_scan != "off" and await supports_iterative_scan(db):
+        # Older pgvector rejects the unknown setting, so it is only sent when enabled and supported.
+        # IVFFlat only supports relaxed ordering
+        await db.execute(
+            text("SELECT set_config('hnsw.iterative_scan', :mode, true), set_config('ivfflat.iterative_scan', 'relaxed_order', true)"),
+            {"mode": iterative_scan},
+        )
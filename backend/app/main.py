@@ -1,6 +1,7 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.metrics import RequestMetricsMiddleware, render_metrics
 from app.api.api import api_router
 
 app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
@@ -13,14 +14,28 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Read by browser tus clients to resume uploads
+        expose_headers=["Location", "Tus-Resumable", "Tus-Version", "Tus-Extension", "Tus-Max-Size",
+                        "Upload-Offset", "Upload-Length", "Upload-Expires", "Upload-Concat", "Lesson-Id", "Job-Id"],
     )
 
+# Outermost, so the latency includes every other middleware
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.get("/")
 def root():
     return {"message": "Welcome to S-STUDY API"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus scrape endpoint. The worker serves its own on WORKER_METRICS_PORT.
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # Wrapper to be used by uvicorn
 # if __name__ == "__main__":
 #     import uvicorn
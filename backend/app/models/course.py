@@ -1,5 +1,7 @@
+from typing import Any
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, Text, Enum as SQLAEnum
+from sqlalchemy import String, Integer, ForeignKey, Text, LargeBinary, Index, Enum as SQLAEnum
+from sqlalchemy.dialects.postgresql import JSONB
 import enum
 from app.db.base_class import Base
 
@@ -27,6 +29,11 @@ class CourseCategory(str, enum.Enum):
 
 class Course(Base):
     __tablename__ = "courses"
+    # Catalogue filters, paginated by id
+    __table_args__ = (
+        Index("ix_courses_language_id", "language", "id"),
+        Index("ix_courses_category_id", "category", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String, index=True)
@@ -36,11 +43,13 @@ class Course(Base):
     teacher_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
 
     teacher = relationship("User", back_populates="courses_teaching")
-    modules = relationship("Module", back_populates="course", cascade="all, delete-orphan")
+    modules = relationship("Module", back_populates="course", cascade="all, delete-orphan", order_by="[Module.order, Module.id]")
     enrollments = relationship("Enrollment", back_populates="course")
 
 class Module(Base):
     __tablename__ = "modules"
+    # Modules of a course in order (catalogue pages and selectinload)
+    __table_args__ = (Index("ix_modules_course_id_order", "course_id", "order", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     course_id: Mapped[int] = mapped_column(ForeignKey("courses.id"))
@@ -48,7 +57,7 @@ class Module(Base):
     order: Mapped[int] = mapped_column(Integer)
 
     course = relationship("Course", back_populates="modules")
-    lessons = relationship("Lesson", back_populates="module", cascade="all, delete-orphan")
+    lessons = relationship("Lesson", back_populates="module", cascade="all, delete-orphan", order_by="[Lesson.order, Lesson.id]")
 
 class DifficultyLevel(str, enum.Enum):
     BEGINNER = "beginner"
@@ -61,6 +70,8 @@ class VideoSourceType(str, enum.Enum):
 
 class Lesson(Base):
     __tablename__ = "lessons"
+    # Lessons of a module in order (catalogue pages and selectinload)
+    __table_args__ = (Index("ix_lessons_module_id_order", "module_id", "order", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     module_id: Mapped[int] = mapped_column(ForeignKey("modules.id"))
@@ -68,21 +79,38 @@ class Lesson(Base):
     content: Mapped[str] = mapped_column(Text) # Markdown or HTML
     video_source_type: Mapped[VideoSourceType] = mapped_column(SQLAEnum(VideoSourceType), default=VideoSourceType.LOCAL)
     video_url: Mapped[str] = mapped_column(String, nullable=True)
+    video_sha256: Mapped[str] = mapped_column(String(64), nullable=True, index=True) # Uploaded file hash, to reuse processing of identical videos
     order: Mapped[int] = mapped_column(Integer)
     
-    # AI Generated Content
-    transcript: Mapped[str] = mapped_column(Text, nullable=True)
-    # Storing JSON as Text for simplicity in this stack, or use JSONB if using specific PG types
-    key_takeaways: Mapped[str] = mapped_column(Text, nullable=True) 
-    chapters: Mapped[str] = mapped_column(Text, nullable=True)
-    vocabulary: Mapped[str] = mapped_column(Text, nullable=True) # JSON array of {word, translation, context}
-    quiz_questions: Mapped[str] = mapped_column(Text, nullable=True) # JSON array of questions
+    # AI Generated Content: deferred, since it is large and only a lesson's own page needs it.
+    # Load it explicitly (undefer / undefer_group("ai_content")): lazy loads don't work under AsyncSession
+    transcript: Mapped[str] = mapped_column(Text, nullable=True, deferred=True)
+    key_takeaways: Mapped[Any] = mapped_column(JSONB, nullable=True, deferred=True, deferred_group="ai_content") # Summary text (YouTube) or list of takeaways (uploads)
+    chapters: Mapped[list] = mapped_column(JSONB, nullable=True, deferred=True, deferred_group="ai_content") # [{timestamp, title}]
+    vocabulary: Mapped[list] = mapped_column(JSONB, nullable=True, deferred=True, deferred_group="ai_content") # [{word, translation, context}]
+    quiz_questions: Mapped[list] = mapped_column(JSONB, nullable=True, deferred=True, deferred_group="ai_content") # [{question, options, answer}]
     
     difficulty: Mapped[DifficultyLevel] = mapped_column(SQLAEnum(DifficultyLevel), default=DifficultyLevel.INTERMEDIATE)
+    context_version: Mapped[int] = mapped_column(Integer, default=1, server_default="1") # Bumped whenever content served by the context endpoint changes
 
     module = relationship("Module", back_populates="lessons")
     assignments = relationship("Assignment", back_populates="lesson", cascade="all, delete-orphan")
     document_chunks = relationship("DocumentChunk", back_populates="lesson")
+    documents = relationship("LessonDocument", back_populates="lesson", cascade="all, delete-orphan")
+
+# What lesson lists need, for load_only(): everything but the content and AI fields
+LESSON_LIST_COLUMNS = (Lesson.id, Lesson.module_id, Lesson.title, Lesson.order, Lesson.difficulty, Lesson.video_source_type)
+
+class LessonContext(Base):
+    """
+    Pre-serialized GET /courses/lessons/{id}/context response. Valid while
+    its etag matches the lesson's current one (see app.services.lesson_context).
+    """
+    __tablename__ = "lesson_contexts"
+
+    lesson_id: Mapped[int] = mapped_column(ForeignKey("lessons.id", ondelete="CASCADE"), primary_key=True)
+    etag: Mapped[str] = mapped_column(String) # Built from lesson id, context_version and payload format
+    payload: Mapped[bytes] = mapped_column(LargeBinary) # UTF-8 JSON
 
 class Assignment(Base):
     __tablename__ = "assignments"
@@ -0,0 +1,46 @@
+import enum
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, ForeignKey, Text, DateTime, Index, Enum as SQLAEnum, func
+from sqlalchemy.dialects.postgresql import JSONB
+from app.core.config import settings
+from app.db.base_class import Base
+
+class JobType(str, enum.Enum):
+    VIDEO_PROCESSING = "video_processing"
+    HLS_PACKAGING = "hls_packaging"
+    PLAYLIST_IMPORT = "playlist_import"
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class ProcessingJob(Base):
+    """
+    A unit of background work, claimed and run by `python -m app.worker`.
+    Failed attempts are re-queued with exponential backoff until max_attempts.
+    """
+    __tablename__ = "processing_jobs"
+    # Served by the worker's claim query
+    __table_args__ = (Index("ix_processing_jobs_status_next_run_at", "status", "next_run_at"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    type: Mapped[JobType] = mapped_column(SQLAEnum(JobType))
+    lesson_id: Mapped[int] = mapped_column(ForeignKey("lessons.id", ondelete="CASCADE"), nullable=True, index=True)
+    payload: Mapped[dict] = mapped_column(JSONB, default=dict) # Handler arguments, e.g. {"video_path": ...}
+    status: Mapped[JobStatus] = mapped_column(SQLAEnum(JobStatus), default=JobStatus.QUEUED)
+    stage: Mapped[str] = mapped_column(String, nullable=True) # Pipeline stage currently running
+    progress: Mapped[dict] = mapped_column(JSONB, nullable=True) # Reported by the handler, e.g. {"done": 3, "total": 150}
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=settings.JOB_MAX_ATTEMPTS)
+    next_run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    locked_by: Mapped[str] = mapped_column(String, nullable=True) # Worker id holding the lease
+    locked_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True) # Lease heartbeat
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    lesson = relationship("Lesson")
@@ -1,14 +1,65 @@
+import enum
+from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, Text
+from sqlalchemy import String, Integer, ForeignKey, Text, DateTime, UniqueConstraint, Index, Computed, func, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from pgvector.sqlalchemy import Vector
+from app.core.config import settings
 from app.db.base_class import Base
+from app.db.vector_index import build_vector_index, build_binary_index, embedding_column_type
+
+class SearchMode(str, enum.Enum):
+    VECTOR = "vector"
+    LEXICAL = "lexical"
+    HYBRID = "hybrid"
+
+class LessonDocument(Base):
+    """
+    A source document indexed for a lesson (an uploaded file or the video transcript).
+    The content hash lets re-ingestion skip unchanged documents entirely.
+    """
+    __tablename__ = "lesson_documents"
+    __table_args__ = (UniqueConstraint("lesson_id", "source", name="uq_lesson_documents_lesson_source"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    lesson_id: Mapped[int] = mapped_column(ForeignKey("lessons.id", ondelete="CASCADE"), index=True)
+    source: Mapped[str] = mapped_column(String) # Original filename or "transcript"
+    content_hash: Mapped[str] = mapped_column(String(64)) # SHA-256 of the extracted text
+    chunk_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    lesson = relationship("Lesson", back_populates="documents")
+    chunks = relationship("DocumentChunk", back_populates="document", passive_deletes=True)
 
 class DocumentChunk(Base):
     __tablename__ = "document_chunks"
+    # ANN index (HNSW or IVFFlat per settings.VECTOR_INDEX_TYPE); rebuild with app.scripts.create_vector_index.
+    # Large courses also get partial indexes (WHERE course_id = N AND embedding_model = <current model>), created by the same script
+    __table_args__ = tuple(index for index in [
+        build_vector_index("embedding"),
+        Index("ix_document_chunks_content_tsv", "content_tsv", postgresql_using="gin"),
+        # Chunks indexed before documents were tracked, looked up per lesson until a sync adopts them
+        Index("ix_document_chunks_legacy_lesson", "lesson_id", postgresql_where=text("document_id IS NULL")),
+    ] if index is not None)
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     lesson_id: Mapped[int] = mapped_column(ForeignKey("lessons.id"))
+    course_id: Mapped[int] = mapped_column(ForeignKey("courses.id"), nullable=True, index=True) # Denormalized from the lesson's module, for scoped search
+    document_id: Mapped[int] = mapped_column(ForeignKey("lesson_documents.id", ondelete="CASCADE"), nullable=True, index=True)
     content: Mapped[str] = mapped_column(Text)
-    embedding: Mapped[Vector] = mapped_column(Vector(768)) # Gemini Embedding 001 dimension
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True, index=True) # SHA-256 of content, used to reuse vectors
+    # Full-text search vector, maintained by Postgres and served by a GIN index
+    content_tsv: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{settings.TEXT_SEARCH_CONFIG}'::regconfig, content)", persisted=True),
+        deferred=True,
+    )
+    embedding: Mapped[Vector] = mapped_column(embedding_column_type()) # 768-d vector or halfvec per settings.EMBEDDING_STORAGE
+    embedding_model: Mapped[str] = mapped_column(String, nullable=True) # Provider model that produced the vector
     
     lesson = relationship("Lesson", back_populates="document_chunks")
+    course = relationship("Course")
+    document = relationship("LessonDocument", back_populates="chunks")
+
+# Expression index on binary_quantize(embedding); needs the mapped column, so it is declared after the class
+build_binary_index(DocumentChunk.embedding)
@@ -0,0 +1,41 @@
+import enum
+from datetime import datetime
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Boolean, BigInteger, ForeignKey, Text, DateTime, Enum as SQLAEnum, func
+from sqlalchemy.dialects.postgresql import JSONB
+from app.db.base_class import Base
+
+class UploadStatus(str, enum.Enum):
+    UPLOADING = "uploading"
+    COMPLETE = "complete"
+    FAILED = "failed"
+
+class VideoUpload(Base):
+    """
+    A resumable (tus) video upload. The bytes received so far live in
+    UPLOAD_STAGING_DIR/<id>; once all `length` bytes are there and match
+    `sha256`, the video is stored and a lesson is created and queued.
+    Partial uploads are parts of a larger file, uploaded in parallel and
+    concatenated by a final upload listing them in `parts`.
+    """
+    __tablename__ = "video_uploads"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True) # Random, unguessable: it is the upload URL
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    module_id: Mapped[int] = mapped_column(ForeignKey("modules.id", ondelete="CASCADE"), nullable=True) # None for partial uploads
+    title: Mapped[str] = mapped_column(String, nullable=True)
+    filename: Mapped[str] = mapped_column(String, nullable=True)
+    length: Mapped[int] = mapped_column(BigInteger)
+    offset: Mapped[int] = mapped_column(BigInteger, default=0)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=True) # Expected checksum of the whole file
+    is_partial: Mapped[bool] = mapped_column(Boolean, default=False)
+    parts: Mapped[list] = mapped_column(JSONB, nullable=True) # Partial upload ids, for a final (concatenated) upload
+    status: Mapped[UploadStatus] = mapped_column(SQLAEnum(UploadStatus), default=UploadStatus.UPLOADING)
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+    lesson_id: Mapped[int] = mapped_column(ForeignKey("lessons.id", ondelete="SET NULL"), nullable=True)
+    job_id: Mapped[int] = mapped_column(ForeignKey("processing_jobs.id", ondelete="SET NULL"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
+    user = relationship("User")
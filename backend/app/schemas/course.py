@@ -0,0 +1,41 @@
+from pydantic import BaseModel
+from app.models.course import Language, CourseCategory, DifficultyLevel, VideoSourceType
+
+class LessonSummary(BaseModel):
+    id: int
+    module_id: int
+    title: str
+    order: int
+    difficulty: DifficultyLevel
+    video_source_type: VideoSourceType
+
+    class Config:
+        from_attributes = True
+
+class ModuleSummary(BaseModel):
+    id: int
+    course_id: int
+    title: str
+    order: int
+    lessons: list[LessonSummary] | None = None  # Only when requested
+
+class CourseSummary(BaseModel):
+    id: int
+    title: str
+    description: str
+    language: Language
+    category: CourseCategory
+    teacher_id: int
+    modules: list[ModuleSummary] | None = None  # Only when requested
+
+class CoursePage(BaseModel):
+    items: list[CourseSummary]
+    next_cursor: str | None = None
+
+class ModulePage(BaseModel):
+    items: list[ModuleSummary]
+    next_cursor: str | None = None
+
+class LessonPage(BaseModel):
+    items: list[LessonSummary]
+    next_cursor: str | None = None
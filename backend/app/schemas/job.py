@@ -0,0 +1,18 @@
+from datetime import datetime
+from pydantic import BaseModel
+from app.models.job import JobStatus, JobType
+
+class ProcessingStatus(BaseModel):
+    job_id: int
+    lesson_id: int | None = None
+    type: JobType
+    status: JobStatus
+    stage: str | None = None
+    progress: dict | None = None
+    attempts: int
+    max_attempts: int
+    last_error: str | None = None
+    next_run_at: datetime | None = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
@@ -0,0 +1,14 @@
+from datetime import datetime
+from pydantic import BaseModel
+from app.models.upload import UploadStatus
+
+class UploadState(BaseModel):
+    id: str
+    status: UploadStatus
+    offset: int
+    length: int
+    is_partial: bool
+    lesson_id: int | None = None
+    job_id: int | None = None
+    error: str | None = None
+    expires_at: datetime
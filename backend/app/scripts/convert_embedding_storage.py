@@ -0,0 +1,150 @@
+"""
+Convert document_chunks.embedding between vector (float32) and halfvec (float16) storage,
+and optionally build the binary-quantized Hamming index.
+
+The new column is backfilled in batches and its ANN index is built concurrently,
+so the table is only locked briefly for the final swap. The binary index and the
+per-course partial indexes are rebuilt on the new column if they existed before
+(--binary-index / --no-binary-index overrides that for the binary index).
+Run from backend directory: python -m app.scripts.convert_embedding_storage --to halfvec --binary-index
+Then set EMBEDDING_STORAGE (and EMBEDDING_BINARY_INDEX) to match and restart the app.
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import text
+from app.db.session import engine
+from app.db.vector_index import (
+    DIMENSIONS,
+    EMBEDDING_STORAGE_TYPES,
+    VECTOR_INDEX_NAME,
+    BINARY_INDEX_NAME,
+    COURSE_INDEX_PREFIX,
+    vector_index_ddl,
+    binary_index_ddl,
+)
+from app.core.config import settings
+
+NEW_COLUMN = "embedding_converted"
+NEW_INDEX = f"{VECTOR_INDEX_NAME}_converted"
+NEW_SUFFIX = "_converted"
+
+async def course_indexes() -> list[tuple[str, str, str]]:
+    """
+    The per-course partial indexes on the embedding column, as (name, index type, predicate).
+    """
+    async with engine.connect() as conn:
+        result = await conn.execute(text(
+            "SELECT c.relname, am.amname, pg_get_expr(i.indpred, i.indrelid) FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid JOIN pg_am am ON am.oid = c.relam "
+            "WHERE i.indrelid = 'document_chunks'::regclass AND c.relname LIKE :prefix ORDER BY c.relname"
+        ), {"prefix": f"{COURSE_INDEX_PREFIX}%"})
+        return [tuple(row) for row in result]
+
+async def has_binary_index() -> bool:
+    async with engine.connect() as conn:
+        return (await conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": BINARY_INDEX_NAME})).scalar_one()
+
+async def backfill(target: str, batch_size: int):
+    async with engine.begin() as conn:
+        await conn.execute(text(f"ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS {NEW_COLUMN} {target}({DIMENSIONS})"))
+        max_id = (await conn.execute(text("SELECT coalesce(max(id), 0) FROM document_chunks"))).scalar_one()
+
+    # Walk primary-key ranges so each batch is an index range scan, one transaction per batch
+    for start in range(0, max_id, batch_size):
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                f"UPDATE document_chunks SET {NEW_COLUMN} = embedding::{target}({DIMENSIONS}) "
+                f"WHERE id > :start AND id <= :stop AND {NEW_COLUMN} IS NULL"
+            ), {"start": start, "stop": start + batch_size})
+        print(f"  ⏳ {min(start + batch_size, max_id)} / {max_id}")
+
+async def build_index(target: str, index_type: str, maintenance_work_mem: str):
+    if index_type == "none":
+        return
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"SET maintenance_work_mem = '{maintenance_work_mem}'"))
+        await conn.execute(text(f"DROP INDEX IF EXISTS {NEW_INDEX}"))
+        await conn.execute(text(vector_index_ddl(
+            index_type, column=NEW_COLUMN, name=NEW_INDEX, concurrently=True, storage=target,
+        )))
+
+async def build_dependent_indexes(target: str, binary: bool, courses: list[tuple[str, str, str]], maintenance_work_mem: str):
+    # Built on the new column under temporary names, renamed by swap()
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"SET maintenance_work_mem = '{maintenance_work_mem}'"))
+        if binary:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {BINARY_INDEX_NAME}{NEW_SUFFIX}"))
+            await conn.execute(text(binary_index_ddl(
+                column=NEW_COLUMN, name=f"{BINARY_INDEX_NAME}{NEW_SUFFIX}", concurrently=True,
+            )))
+        for name, index_type, predicate in courses:
+            print(f"  ⏳ {name} ({index_type})")
+            await conn.execute(text(f"DROP INDEX IF EXISTS {name}{NEW_SUFFIX}"))
+            await conn.execute(text(vector_index_ddl(
+                index_type, column=NEW_COLUMN, name=f"{name}{NEW_SUFFIX}", concurrently=True, storage=target, where=predicate,
+            )))
+
+async def swap(target: str, renamed: list[str]):
+    async with engine.begin() as conn:
+        await conn.execute(text("LOCK TABLE document_chunks IN ACCESS EXCLUSIVE MODE"))
+        # Rows written by the app since the backfill
+        await conn.execute(text(
+            f"UPDATE document_chunks SET {NEW_COLUMN} = embedding::{target}({DIMENSIONS}) WHERE {NEW_COLUMN} IS NULL"
+        ))
+        # Dropping the old column also drops its ANN and binary indexes
+        await conn.execute(text("ALTER TABLE document_chunks DROP COLUMN embedding"))
+        await conn.execute(text(f"ALTER TABLE document_chunks RENAME COLUMN {NEW_COLUMN} TO embedding"))
+        await conn.execute(text("ALTER TABLE document_chunks ALTER COLUMN embedding SET NOT NULL"))
+        for name in [VECTOR_INDEX_NAME, *renamed]:
+            await conn.execute(text(f"ALTER INDEX IF EXISTS {name}{NEW_SUFFIX} RENAME TO {name}"))
+
+async def build_binary_index(enabled: bool, maintenance_work_mem: str):
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"DROP INDEX IF EXISTS {BINARY_INDEX_NAME}"))
+        if enabled:
+            await conn.execute(text(f"SET maintenance_work_mem = '{maintenance_work_mem}'"))
+            await conn.execute(text(binary_index_ddl(concurrently=True)))
+
+async def main(args):
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        current = (await conn.execute(text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'document_chunks'::regclass AND attname = 'embedding'"
+        ))).scalar_one()
+
+    binary = await has_binary_index() if args.binary_index is None else args.binary_index
+    if current.startswith(args.to):
+        print(f"✅ embedding is already {current}")
+        if args.binary_index is not None:
+            await build_binary_index(args.binary_index, args.maintenance_work_mem)
+    else:
+        print(f"Converting embedding from {current} to {args.to}({DIMENSIONS})")
+        # Dropping the old column drops every index on it: rebuild them on the new one first
+        courses = await course_indexes()
+        await backfill(args.to, args.batch_size)
+        await build_index(args.to, args.index_type, args.maintenance_work_mem)
+        await build_dependent_indexes(args.to, binary, courses, args.maintenance_work_mem)
+        await swap(args.to, ([BINARY_INDEX_NAME] if binary else []) + [name for name, _, _ in courses])
+        print(f"  Rebuilt {'the binary index and ' if binary else ''}{len(courses)} course indexes")
+
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s. Set EMBEDDING_STORAGE={args.to}"
+          f" and EMBEDDING_BINARY_INDEX={str(binary).lower()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--to", choices=EMBEDDING_STORAGE_TYPES, required=True)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--index-type", choices=["hnsw", "ivfflat", "none"], default=settings.VECTOR_INDEX_TYPE)
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--binary-index", action=argparse.BooleanOptionalAction, default=None,
+                        help="Build (or with --no-binary-index, drop) the binary-quantized Hamming index")
+    asyncio.run(main(parser.parse_args()))
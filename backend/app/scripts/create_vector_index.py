@@ -0,0 +1,58 @@
+"""
+(Re)build the ANN index on document_chunks.embedding.
+Run from backend directory: python -m app.scripts.create_vector_index --type hnsw --m 16 --ef-construction 64
+
+With --per-course, instead create the partial per-course indexes for courses with at least
+--min-chunks chunks embedded by the current EMBEDDING_PROVIDER (missing ones, and ones built for
+another model, unless --rebuild); run it periodically as courses grow and after switching providers.
+"""
+import argparse
+import asyncio
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.db.session import engine
+from app.db.vector_index import VECTOR_INDEX_TYPES, create_vector_index, create_course_vector_indexes
+from app.core.config import settings
+from app.services.embeddings import get_embedding_provider
+
+async def main(args):
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        # Index builds are memory hungry; give this session more room than the default
+        await conn.exec_driver_sql(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+        if args.per_course:
+            course_ids = await create_course_vector_indexes(
+                conn,
+                get_embedding_provider().model_name,
+                args.type,
+                min_chunks=args.min_chunks,
+                rebuild=args.rebuild,
+                m=args.m,
+                ef_construction=args.ef_construction,
+                lists=args.lists,
+            )
+            print(f"✅ Per-course {args.type} indexes for {len(course_ids)} courses in {time.perf_counter() - started:.1f}s")
+            return
+        await create_vector_index(
+            conn,
+            args.type,
+            m=args.m,
+            ef_construction=args.ef_construction,
+            lists=args.lists,
+        )
+    print(f"✅ {args.type} index built in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--type", choices=VECTOR_INDEX_TYPES, default=settings.VECTOR_INDEX_TYPE)
+    parser.add_argument("--m", type=int, help="HNSW: max connections per layer")
+    parser.add_argument("--ef-construction", type=int, help="HNSW: candidate list size at build time")
+    parser.add_argument("--lists", type=int, help="IVFFlat: number of lists (~rows/1000, sqrt(rows) above 1M)")
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--per-course", action="store_true", help="Build partial indexes for large courses")
+    parser.add_argument("--min-chunks", type=int, default=settings.COURSE_INDEX_MIN_CHUNKS)
+    parser.add_argument("--rebuild", action="store_true", help="With --per-course, rebuild existing indexes too")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,31 @@
+"""
+Inspect or maintain the insights cache (INSIGHTS_CACHE_DIR): transcription results and
+Gemini file handles. Expired entries and entries over the size limit are evicted on write;
+"prune" does the same on demand (e.g. from cron), "clear" empties the cache.
+Run from backend directory: python -m app.scripts.insights_cache stats
+"""
+import argparse
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.transcription import insights_cache, gemini_file_cache
+
+def main(action: str):
+    caches = {"results": insights_cache, "gemini_files": gemini_file_cache}
+    if insights_cache is None:
+        print("Insights cache is disabled (INSIGHTS_CACHE_DIR is not set)")
+        return
+    for name, cache in caches.items():
+        if action == "prune":
+            print(f"{name}: evicted {cache.evict()} entries")
+        elif action == "clear":
+            cache.clear()
+            print(f"{name}: cleared")
+        usage = cache.disk_usage()
+        print(f"{name}: {usage['entries']} entries, {usage['bytes'] / 2**20:.1f} MB in {cache.directory}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=["stats", "prune", "clear"])
+    main(parser.parse_args().action)
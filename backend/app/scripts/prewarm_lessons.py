@@ -0,0 +1,25 @@
+"""
+Fetch the transcripts still missing from lessons of recently imported playlists (imports that
+finished within LESSON_PREWARM_WINDOW), so their first viewers don't wait for them.
+Meant to run periodically, e.g. hourly from cron.
+Run from backend directory: python -m app.scripts.prewarm_lessons [--hours 24]
+"""
+import argparse
+import asyncio
+import sys
+import os
+from datetime import timedelta
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.core.config import settings
+from app.services.lesson_warmup import prewarm_imported_lessons
+
+async def main(window: timedelta):
+    counts = await prewarm_imported_lessons(window)
+    print(f"Warmed {counts['warmed']} lessons, {counts['missing']} still without a transcript")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=settings.LESSON_PREWARM_WINDOW / 3600, help="Imports finished within this many hours")
+    args = parser.parse_args()
+    asyncio.run(main(timedelta(hours=args.hours)))
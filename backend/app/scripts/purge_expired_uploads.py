@@ -0,0 +1,20 @@
+"""
+Delete resumable uploads that were never finished before their expiry (UPLOAD_EXPIRATION),
+together with their staged bytes. Meant to run periodically, e.g. hourly from cron.
+Run from backend directory: python -m app.scripts.purge_expired_uploads
+"""
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.db.session import AsyncSessionLocal
+from app.crud.uploads import purge_expired_uploads
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        purged = await purge_expired_uploads(db)
+    print(f"Purged {purged} expired uploads")
+
+if __name__ == "__main__":
+    asyncio.run(main())
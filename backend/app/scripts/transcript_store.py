@@ -0,0 +1,95 @@
+"""
+Inspect or maintain the transcript store (TRANSCRIPT_STORE_DIR).
+"warm" fills it in bulk: YouTube lessons get their timed transcripts fetched (unless --no-fetch,
+or when fetching fails: then the transcript saved on the lesson is stored, without timestamps),
+and processed video uploads get the transcript, chapters and key takeaways saved on the lesson.
+"prune" evicts expired entries and entries over the size limit (also done on write), "clear" empties it.
+Run from backend directory: python -m app.scripts.transcript_store warm
+"""
+import argparse
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import select
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.models.course import Lesson, VideoSourceType
+from app.services.transcript_store import transcript_store, youtube_key, video_key
+from app.services.youtube import extract_video_id, fetch_transcript_segments
+
+def _as_list(value) -> list:
+    # YouTube lessons keep their summary as a single text
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+async def warm(fetch: bool) -> dict:
+    counts = {"youtube_fetched": 0, "youtube_from_lessons": 0, "videos": 0, "present": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(settings.PLAYLIST_FETCH_CONCURRENCY)
+
+    async def store_youtube(video_id: str, transcript: str | None):
+        async with semaphore:
+            if fetch:
+                try:
+                    segments = await asyncio.to_thread(fetch_transcript_segments, video_id)
+                    if segments:
+                        text = " ".join(segment["text"] for segment in segments)
+                        await asyncio.to_thread(transcript_store.put, youtube_key(video_id), text, segments)
+                        counts["youtube_fetched"] += 1
+                        return
+                except Exception as e:
+                    print(f"Error fetching transcript for {video_id}: {e}")
+            if transcript:
+                await asyncio.to_thread(transcript_store.put, youtube_key(video_id), transcript)
+                counts["youtube_from_lessons"] += 1
+            else:
+                counts["failed"] += 1
+
+    tasks, seen = [], set()
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(Lesson.video_source_type, Lesson.video_url, Lesson.video_sha256, Lesson.transcript, Lesson.chapters, Lesson.key_takeaways)
+            .where(Lesson.video_url.is_not(None))
+            .execution_options(yield_per=100)
+        )
+        async for source_type, video_url, video_sha256, transcript, chapters, key_takeaways in result:
+            if source_type == VideoSourceType.YOUTUBE:
+                video_id = extract_video_id(video_url)
+                key = video_id and youtube_key(video_id)
+            else:
+                key = video_sha256 and video_key(video_sha256)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            if transcript_store.contains(key):
+                counts["present"] += 1
+            elif source_type == VideoSourceType.YOUTUBE:
+                tasks.append(asyncio.create_task(store_youtube(video_id, transcript)))
+            elif transcript:
+                transcript_store.put(key, transcript, chapters=_as_list(chapters), key_takeaways=_as_list(key_takeaways))
+                counts["videos"] += 1
+    await asyncio.gather(*tasks)
+    return counts
+
+async def main(action: str, fetch: bool):
+    if transcript_store is None:
+        print("Transcript store is disabled (TRANSCRIPT_STORE_DIR is not set)")
+        return
+    if action == "warm":
+        print(f"Warmed: {await warm(fetch)}")
+    elif action == "prune":
+        print(f"Evicted {transcript_store.cache.evict()} entries")
+    elif action == "clear":
+        transcript_store.cache.clear()
+        print("Cleared")
+    usage = transcript_store.cache.disk_usage()
+    print(f"{usage['entries']} entries, {usage['bytes'] / 2**20:.1f} MB in {transcript_store.cache.directory} ({transcript_store.stats()['codec']})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=["stats", "warm", "prune", "clear"])
+    parser.add_argument("--no-fetch", action="store_true", help="warm: only store transcripts already saved on lessons")
+    args = parser.parse_args()
+    asyncio.run(main(args.action, not args.no_fetch))
@@ -0,0 +1,78 @@
+"""
+Bring an existing database up to date with the models.
+Creates missing tables, then applies idempotent column/index upgrades for tables that already exist.
+Run from backend directory: python -m app.scripts.upgrade_schema
+"""
+import asyncio
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import text
+from app.db.session import engine
+from app.db.base import Base
+from app.core.config import settings
+
+UPGRADES = [
+    # Content-hash incremental re-indexing
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS document_id INTEGER REFERENCES lesson_documents(id) ON DELETE CASCADE",
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "UPDATE document_chunks SET content_hash = encode(sha256(convert_to(content, 'UTF8')), 'hex') WHERE content_hash IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_document_id ON document_chunks (document_id)",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_content_hash ON document_chunks (content_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_legacy_lesson ON document_chunks (lesson_id) WHERE document_id IS NULL",
+    # Hybrid lexical + vector retrieval
+    f"ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+    f"GENERATED ALWAYS AS (to_tsvector('{settings.TEXT_SEARCH_CONFIG}'::regconfig, content)) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_content_tsv ON document_chunks USING gin (content_tsv)",
+    # Pluggable embedding providers: vectors are only reused within the same model
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS embedding_model VARCHAR",
+    "UPDATE document_chunks SET embedding_model = 'models/embedding-001' WHERE embedding_model IS NULL",
+    # Course-scoped retrieval: course_id is denormalized from lesson -> module
+    "ALTER TABLE document_chunks ADD COLUMN IF NOT EXISTS course_id INTEGER REFERENCES courses(id)",
+    "UPDATE document_chunks SET course_id = modules.course_id FROM lessons JOIN modules ON modules.id = lessons.module_id "
+    "WHERE lessons.id = document_chunks.lesson_id AND document_chunks.course_id IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_document_chunks_course_id ON document_chunks (course_id)",
+    # Content-addressed video uploads
+    "ALTER TABLE lessons ADD COLUMN IF NOT EXISTS video_sha256 VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_lessons_video_sha256 ON lessons (video_sha256)",
+    # HLS packaging jobs
+    "ALTER TYPE jobtype ADD VALUE IF NOT EXISTS 'HLS_PACKAGING'",
+    # Background playlist import with progress reporting
+    "ALTER TYPE jobtype ADD VALUE IF NOT EXISTS 'PLAYLIST_IMPORT'",
+    "ALTER TABLE processing_jobs ADD COLUMN IF NOT EXISTS progress JSONB",
+    # Precomputed lesson context payloads
+    "ALTER TABLE lessons ADD COLUMN IF NOT EXISTS context_version INTEGER NOT NULL DEFAULT 1",
+    # AI content stored as JSONB. Converted only while still text; plain-text values (YouTube summaries) become JSON strings
+    *(
+        f"""
+        DO $$ BEGIN
+            IF (SELECT data_type FROM information_schema.columns WHERE table_name = 'lessons' AND column_name = '{column}') = 'text' THEN
+                ALTER TABLE lessons ALTER COLUMN {column} TYPE JSONB USING CASE
+                    WHEN {column} IS NULL OR btrim({column}) = '' THEN NULL
+                    WHEN {column} ~ '^[[:space:]]*[[{{"]' THEN {column}::jsonb
+                    ELSE to_jsonb({column})
+                END;
+            END IF;
+        END $$
+        """
+        for column in ("key_takeaways", "chapters", "vocabulary", "quiz_questions")
+    ),
+    # Catalogue listings: keyset pagination on ("order", id) and course filters
+    'CREATE INDEX IF NOT EXISTS ix_modules_course_id_order ON modules (course_id, "order", id)',
+    'CREATE INDEX IF NOT EXISTS ix_lessons_module_id_order ON lessons (module_id, "order", id)',
+    "CREATE INDEX IF NOT EXISTS ix_courses_language_id ON courses (language, id)",
+    "CREATE INDEX IF NOT EXISTS ix_courses_category_id ON courses (category, id)",
+]
+
+async def upgrade():
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        await conn.run_sync(Base.metadata.create_all)
+        for statement in UPGRADES:
+            print(f"  ⏳ {' '.join(statement.split())[:100]}")
+            await conn.execute(text(statement))
+    print("✅ Schema is up to date")
+
+if __name__ == "__main__":
+    asyncio.run(upgrade())
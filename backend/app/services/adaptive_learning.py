@@ -1,6 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.models.course import Lesson, DifficultyLevel, Module
+from sqlalchemy.orm import load_only
+from app.models.course import Lesson, DifficultyLevel, Module, LESSON_LIST_COLUMNS
 
 async def generate_adaptive_path(db: AsyncSession, current_module_id: int, score: float):
     """
@@ -25,6 +26,7 @@ async def generate_adaptive_path(db: AsyncSession, current_module_id: int, score
         # 1. Beginner lessons in current module
         stmt = (
             select(Lesson)
+            .options(load_only(*LESSON_LIST_COLUMNS))
             .where(Lesson.module_id == current_module_id)
             .where(Lesson.difficulty == DifficultyLevel.BEGINNER)
             .order_by(Lesson.order)
@@ -37,6 +39,7 @@ async def generate_adaptive_path(db: AsyncSession, current_module_id: int, score
         if not remedial_lessons:
             stmt = (
                 select(Lesson)
+                .options(load_only(*LESSON_LIST_COLUMNS))
                 .where(Lesson.module_id == current_module_id)
                 .order_by(Lesson.order)
             )
@@ -61,6 +64,7 @@ async def generate_adaptive_path(db: AsyncSession, current_module_id: int, score
             # Recommend lessons from next module
             stmt = (
                 select(Lesson)
+                .options(load_only(*LESSON_LIST_COLUMNS))
                 .where(Lesson.module_id == next_module.id)
                 .order_by(Lesson.order)
             )
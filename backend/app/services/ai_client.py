@@ -0,0 +1,323 @@
+import asyncio
+import hashlib
+import random
+import time
+from collections import deque
+from types import SimpleNamespace
+from app.core.config import settings
+
+# HTTP statuses worth retrying: timeouts, rate limiting and server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """
+    Raised without calling the API while an operation's circuit breaker is open.
+    """
+
+def error_status(error: BaseException) -> int | None:
+    """
+    HTTP status of an API error: google.api_core exceptions carry it as `code`,
+    httpx-style errors as `status_code` or on their response.
+    """
+    for candidate in (error, getattr(error, "response", None)):
+        for attr in ("code", "status_code"):
+            value = getattr(candidate, attr, None)
+            if isinstance(value, int):
+                return int(value)
+    return None
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    return error_status(error) in RETRYABLE_STATUS
+
+class TokenBucket:
+    """
+    Allows `rate_per_minute` requests per minute on average, with bursts of up
+    to `burst`. Waiters are served in arrival order.
+    """
+    def __init__(self, rate_per_minute: float, burst: int | None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or max(1, int(self.rate)))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """
+        Take one token, sleeping until one is available. Returns the time
+        waited, including time queued behind earlier waiters.
+        """
+        started = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+        return time.monotonic() - started
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive retryable failures and rejects calls
+    for `cooldown` seconds; then lets a single trial call through (half-open),
+    which closes the circuit on success or re-opens it on failure.
+    """
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        self.trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+class OperationMetrics:
+    def __init__(self, window: int = 1000):
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.throttled_seconds = 0.0
+        self.latency_total = 0.0
+        self.latencies = deque(maxlen=window)  # Recent successful call latencies, for percentiles
+
+    def snapshot(self) -> dict:
+        recent = sorted(self.latencies)
+        percentile = lambda q: round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 1) if recent else None
+        return {
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "error_rate": round(self.failures / self.calls, 4) if self.calls else 0.0,
+            "throttled_s": round(self.throttled_seconds, 2),
+            "latency_avg_ms": round(self.latency_total / self.successes * 1000, 1) if self.successes else None,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p99_ms": percentile(0.99),
+        }
+
+class GeminiBackend:
+    """
+    The google-generativeai SDK. Its calls are blocking, so the client runs them in worker threads.
+    Requests time out inside the SDK, which ends the thread with them, and the SDK's own
+    retries are off: AIClient is the only layer that retries.
+    """
+    def __init__(self):
+        import google.generativeai as genai
+
+        genai.configure(api_key=settings.GOOGLE_API_KEY)
+        self._genai = genai
+        self._request_options = {"timeout": settings.AI_TIMEOUT, "retry": None}
+
+    def upload_file(self, path: str):
+        return self._genai.upload_file(path=path)
+
+    def get_file(self, name: str):
+        return self._genai.get_file(name)
+
+    def generate_content(self, model_name: str, contents) -> str:
+        return self._genai.GenerativeModel(model_name).generate_content(contents, request_options=self._request_options).text
+
+    def embed_content(self, model_name: str, content, task_type: str, title: str | None = None):
+        kwargs = {"title": title} if title else {}
+        return self._genai.embed_content(
+            model=model_name, content=content, task_type=task_type, request_options=self._request_options, **kwargs,
+        )["embedding"]
+
+class FakeAPIError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"Fake API error {code}")
+        self.code = code
+
+class FakeBackend:
+    """
+    Local stand-in for the Gemini API in tests and benchmarks: deterministic
+    responses after `latency` seconds, failing with HTTP `error_status` at
+    `error_rate`. Every call is recorded in `requests`.
+    """
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, error_status: int = 503, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests: list[tuple[str, object]] = []
+        self.files: dict[str, SimpleNamespace] = {}
+        self._random = random.Random(seed)
+
+    def _serve(self, operation: str, request):
+        self.requests.append((operation, request))
+        time.sleep(self.latency)
+        if self._random.random() < self.error_rate:
+            raise FakeAPIError(self.error_status)
+
+    def upload_file(self, path: str):
+        self._serve("upload_file", path)
+        with open(path, "rb") as f:
+            file = SimpleNamespace(name=f"files/{hashlib.sha256(f.read()).hexdigest()[:16]}", path=path)
+        self.files[file.name] = file
+        return file
+
+    def get_file(self, name: str):
+        self._serve("get_file", name)
+        if name not in self.files:
+            raise FakeAPIError(404)
+        return self.files[name]
+
+    def generate_content(self, model_name: str, contents) -> str:
+        self._serve("generate_content", contents)
+        return '{"transcript": "", "chapters": [], "key_takeaways": []}'
+
+    def embed_content(self, model_name: str, content, task_type: str, title: str | None = None):
+        from app.services.embeddings import HashingEmbeddingProvider
+
+        self._serve("embed_content", content)
+        provider = HashingEmbeddingProvider()
+        return provider.embed_documents(content) if isinstance(content, list) else provider.embed_query(content)
+
+AI_BACKENDS = {
+    "gemini": GeminiBackend,
+    "fake": FakeBackend,
+}
+
+class AIClient:
+    """
+    Single async entry point for model API calls.
+
+    Every call waits for a slot of its operation, a token from the
+    operation's rate limiter (requests per minute, matched to the quota) and
+    a global slot, then runs in a worker thread until the backend's own
+    request timeout (AI_TIMEOUT), so the thread, and the slot it holds, never
+    outlive the request. Timeouts, 429
+    and 5xx are retried with full-jitter exponential backoff; other errors
+    propagate at once. Repeated retryable failures open the operation's circuit breaker
+    so callers fail fast while the API is down.
+    """
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._global = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._buckets: dict[str, TokenBucket | None] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self.metrics: dict[str, OperationMetrics] = {}
+
+    @property
+    def backend(self):
+        # Created on first use so importing this module never needs credentials
+        if self._backend is None:
+            try:
+                self._backend = AI_BACKENDS[settings.AI_BACKEND]()
+            except KeyError:
+                raise ValueError(f"Unknown AI backend: {settings.AI_BACKEND}")
+        return self._backend
+
+    def _operation(self, operation: str):
+        if operation not in self.metrics:
+            limit = settings.AI_OPERATION_CONCURRENCY.get(operation, settings.AI_MAX_CONCURRENCY)
+            rate = settings.AI_RATE_LIMITS.get(operation)
+            self._semaphores[operation] = asyncio.Semaphore(limit)
+            self._buckets[operation] = TokenBucket(rate) if rate else None
+            self._breakers[operation] = CircuitBreaker(settings.AI_BREAKER_THRESHOLD, settings.AI_BREAKER_COOLDOWN)
+            self.metrics[operation] = OperationMetrics()
+        return self._semaphores[operation], self._buckets[operation], self._breakers[operation], self.metrics[operation]
+
+    async def call(self, operation: str, fn, *args, **kwargs):
+        """
+        Run the blocking `fn(*args, **kwargs)` as one `operation` request.
+        """
+        semaphore, bucket, breaker, metrics = self._operation(operation)
+        attempts = settings.AI_MAX_RETRIES + 1
+        for attempt in range(1, attempts + 1):
+            if not breaker.allow():
+                metrics.rejected += 1
+                raise CircuitOpenError(f"{operation}: circuit open after {breaker.failures} consecutive failures")
+            # Let through as the half-open trial: it must end in a success, a failure or a release
+            trial = breaker.state != "closed"
+            metrics.calls += 1
+            try:
+                async with semaphore:
+                    if bucket:
+                        metrics.throttled_seconds += await bucket.acquire()
+                    # Taken last, so calls held back by their own operation's limits don't block the others
+                    async with self._global:
+                        started = time.perf_counter()
+                        result = await asyncio.to_thread(fn, *args, **kwargs)
+            except Exception as e:
+                metrics.failures += 1
+                if not is_retryable(e):
+                    # The request itself is wrong; the API is fine
+                    if trial:
+                        breaker.release_trial()
+                    raise
+                breaker.record_failure()
+                if attempt == attempts:
+                    raise
+                metrics.retries += 1
+                delay = random.uniform(0, min(settings.AI_RETRY_MAX_DELAY, settings.AI_RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+                print(f"AI {operation} failed ({error_status(e) or type(e).__name__}), retry {attempt}/{attempts - 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled (a caller's timeout, a lost lease, shutdown): says nothing about the API
+                if trial:
+                    breaker.release_trial()
+                raise
+            else:
+                elapsed = time.perf_counter() - started
+                breaker.record_success()
+                metrics.successes += 1
+                metrics.latency_total += elapsed
+                metrics.latencies.append(elapsed)
+                return result
+
+    async def upload_file(self, path: str):
+        return await self.call("upload_file", self.backend.upload_file, path)
+
+    async def get_file(self, name: str):
+        return await self.call("get_file", self.backend.get_file, name)
+
+    async def generate_content(self, model_name: str, contents) -> str:
+        return await self.call("generate_content", self.backend.generate_content, model_name, contents)
+
+    async def embed_content(self, model_name: str, content, task_type: str, title: str | None = None):
+        return await self.call("embed_content", self.backend.embed_content, model_name, content, task_type, title)
+
+    def stats(self) -> dict:
+        return {
+            operation: {**metrics.snapshot(), "circuit": self._breakers[operation].state}
+            for operation, metrics in self.metrics.items()
+        }
+
+ai_client = AIClient()
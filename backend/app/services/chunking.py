@@ -1,25 +1,157 @@
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterable, Iterator
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import pypdf
-import io
+from app.core.config import settings
 
-def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> list[str]:
-    """
-    Split text into chunks using RecursiveCharacterTextSplitter.
-    """
-    text_splitter = RecursiveCharacterTextSplitter(
+_process_pool: ProcessPoolExecutor | None = None
+
+def _text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
         is_separator_regex=False,
     )
-    return text_splitter.split_text(text)
+
+def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> list[str]:
+    """
+    Split text into chunks using RecursiveCharacterTextSplitter.
+    """
+    return _text_splitter(chunk_size, chunk_overlap).split_text(text)
+
+def iter_chunks(pieces: Iterable[str], chunk_size: int = 1000, chunk_overlap: int = 200) -> Iterator[str]:
+    """
+    Generator version of chunk_text for text that arrives in pieces (e.g. pages).
+
+    Text is buffered until a few chunks' worth is available, split, and all but
+    the last chunk are yielded. The last chunk is carried over so a split near
+    the buffer boundary is redone together with the text that follows.
+    """
+    splitter = _text_splitter(chunk_size, chunk_overlap)
+    flush_at = chunk_size * 8
+    buffer: list[str] = []
+    size = 0
+
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size < flush_at:
+            continue
+
+        text = "".join(buffer)
+        chunks = splitter.split_text(text)
+        if not chunks:
+            buffer, size = [], 0
+            continue
+        yield from chunks[:-1]
+        # Splitting strips surrounding whitespace; keep the break so words don't merge
+        carry = chunks[-1] + ("\n" if text[-1:].isspace() else "")
+        buffer, size = [carry], len(carry)
+
+    if buffer:
+        yield from splitter.split_text("".join(buffer))
 
 def extract_text_from_pdf(file_content: bytes) -> str:
     """
     Extract text from a PDF file.
     """
     pdf_reader = pypdf.PdfReader(io.BytesIO(file_content))
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text() + "\n"
-    return text
+    return "".join(page.extract_text() + "\n" for page in pdf_reader.pages)
+
+def _extract_page_range(path: str, start: int, stop: int) -> list[str]:
+    """
+    Extract pages [start, stop) of a PDF. Runs in a worker process, so it
+    opens the file itself instead of receiving the document.
+    """
+    pdf_reader = pypdf.PdfReader(path)
+    return [pdf_reader.pages[i].extract_text() + "\n" for i in range(start, stop)]
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.PDF_WORKERS or os.cpu_count())
+    return _process_pool
+
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    """
+    Yield the text of each page of a PDF file, in order.
+
+    Small documents are parsed page by page in the calling thread. Large ones
+    are split into page ranges that are extracted in a process pool; only a
+    bounded number of ranges are in flight so memory stays flat.
+    """
+    pdf_reader = pypdf.PdfReader(path)
+    page_count = len(pdf_reader.pages)
+
+    if page_count < settings.PDF_PARALLEL_MIN_PAGES:
+        for page in pdf_reader.pages:
+            yield page.extract_text() + "\n"
+        return
+
+    pool = _get_process_pool()
+    step = settings.PDF_PAGES_PER_TASK
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    max_in_flight = (settings.PDF_WORKERS or os.cpu_count() or 1) * 2
+
+    pending = []
+    try:
+        for start, stop in ranges:
+            pending.append(pool.submit(_extract_page_range, path, start, stop))
+            if len(pending) >= max_in_flight:
+                yield from pending.pop(0).result()
+        while pending:
+            yield from pending.pop(0).result()
+    finally:
+        # Closed early (a failed embedding batch, a cancelled request): don't leave page ranges queued in the shared pool
+        for future in pending:
+            future.cancel()
+
+def iter_pdf_chunks(path: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> Iterator[str]:
+    """
+    Stream chunks of a PDF file as its pages are parsed.
+    """
+    return iter_chunks(iter_pdf_pages(path), chunk_size, chunk_overlap)
+
+async def iterate_in_thread(iterable: Iterable, max_buffered: int = 64) -> AsyncIterator:
+    """
+    Drive a blocking iterator in a worker thread and hand its items to the
+    event loop through a bounded queue, so the producer keeps working while
+    the consumer awaits (e.g. on embedding requests) without running ahead
+    more than `max_buffered` items.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered)
+    done = object()
+    cancelled = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if cancelled.is_set():
+                    return
+                asyncio.run_coroutine_threadsafe(queue.put((item, None)), loop).result()
+        except BaseException as e:
+            asyncio.run_coroutine_threadsafe(queue.put((done, e)), loop).result()
+        else:
+            asyncio.run_coroutine_threadsafe(queue.put((done, None)), loop).result()
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                break
+            yield item
+    finally:
+        cancelled.set()
+        # Unblock a producer waiting on a full queue
+        while not queue.empty():
+            queue.get_nowait()
+        await producer
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Optional
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class DiskCache:
+    """
+    Persistent key -> bytes cache in a directory, shared by every process on
+    the host and kept across restarts.
+
+    Entries expire `ttl` seconds after they were written. When the directory
+    grows past `max_bytes`, the least recently read entries are evicted down
+    to 90% of it. Writes go to a temp file that is renamed into place, so
+    concurrent readers never see a partial entry. Cache errors are logged and
+    treated as misses: the cache must never fail the work it speeds up.
+    """
+    def __init__(self, directory: str, ttl: float, max_bytes: int):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size: int | None = None  # Bytes on disk, scanned on first write
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime + self.ttl < time.time():
+                self._remove(path, stat.st_size)
+                raise FileNotFoundError(path)
+            with open(path, "rb") as f:
+                value = f.read()
+            # The access time records the last read, for LRU eviction; the write time stays in mtime
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except OSError as e:
+            print(f"Cache read failed ({self.directory}): {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Cache write failed ({self.directory}): {e}")
+            return
+        if self._size is None:
+            self._size = sum(size for _, _, size in self._entries())
+        else:
+            self._size += len(value) - previous
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def contains(self, key: str) -> bool:
+        # Unlike get(), neither counts as a hit or miss nor refreshes the entry's LRU position
+        try:
+            return os.stat(self._path(key)).st_mtime + self.ttl >= time.time()
+        except OSError:
+            return False
+
+    def delete(self, key: str):
+        path = self._path(key)
+        if os.path.exists(path):
+            self._remove(path, os.path.getsize(path))
+
+    def get_json(self, key: str):
+        value = self.get(key)
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError as e:
+            # JSONDecodeError and UnicodeDecodeError: a corrupt entry is a miss, and is dropped
+            print(f"Unreadable cache entry ({self.directory}): {e}")
+            self.delete(key)
+            return None
+
+    def set_json(self, key: str, value):
+        self.set(key, json.dumps(value).encode("utf-8"))
+
+    def _remove(self, path: str, size: int):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        if self._size is not None:
+            self._size -= size
+
+    def _entries(self) -> list[tuple[str, os.stat_result, int]]:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat, stat.st_size))
+        return entries
+
+    def evict(self) -> int:
+        """
+        Remove expired entries, then the least recently read ones until the
+        cache is at 90% of `max_bytes`. Returns the number of entries removed.
+        """
+        now = time.time()
+        entries = self._entries()
+        self._size = sum(size for _, _, size in entries)
+        removed = 0
+        for path, stat, size in sorted(entries, key=lambda entry: entry[1].st_atime):
+            if os.path.basename(path).startswith(".tmp-"):
+                # Another process may still be writing it; only leftovers of crashed writers go
+                if stat.st_mtime + 3600 < now:
+                    self._remove(path, size)
+                continue
+            expired = stat.st_mtime + self.ttl < now
+            if not expired and self._size <= self.max_bytes * 0.9:
+                continue
+            self._remove(path, size)
+            removed += 1
+        self.evictions += removed
+        return removed
+
+    def clear(self):
+        for path, _, size in self._entries():
+            self._remove(path, size)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "bytes": self._size,
+        }
+
+    def disk_usage(self) -> dict:
+        entries = self._entries()
+        return {"entries": len(entries), "bytes": sum(size for _, _, size in entries)}
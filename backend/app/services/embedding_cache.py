@@ -0,0 +1,118 @@
+import hashlib
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Optional
+from app.core.config import settings
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a query so trivially different spellings share a cache entry:
+    Unicode NFKC, case-folded, whitespace collapsed.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+def cache_key(text: str, model: str) -> str:
+    digest = hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+    return f"qemb:{model}:{digest}"
+
+class InMemoryCacheBackend:
+    """
+    Bounded LRU with a per-entry TTL, local to this process.
+    """
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[list[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: list[float]):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def clear(self):
+        self._entries.clear()
+
+class RedisCacheBackend:
+    """
+    Shared backend so every uvicorn worker sees the same hits.
+    Vectors are stored as packed float32 with a Redis-side TTL.
+    """
+    def __init__(self, url: str, ttl: int):
+        import redis.asyncio as redis
+
+        self.ttl = ttl
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[list[float]]:
+        raw = await self._client.get(key)
+        if raw is None:
+            return None
+        return array("f", raw).tolist()
+
+    async def set(self, key: str, value: list[float]):
+        await self._client.set(key, array("f", value).tobytes(), ex=self.ttl)
+
+    async def clear(self):
+        async for key in self._client.scan_iter(match="qemb:*"):
+            await self._client.delete(key)
+
+class QueryEmbeddingCache:
+    """
+    Cache of query embeddings keyed on normalized query text plus model name,
+    with hit/miss counters.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, text: str, model: str) -> Optional[list[float]]:
+        try:
+            value = await self.backend.get(cache_key(text, model))
+        except Exception as e:
+            # A shared cache outage must not take /rag/ask down with it
+            print(f"Query embedding cache read failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, text: str, model: str, value: list[float]):
+        try:
+            await self.backend.set(cache_key(text, model), value)
+        except Exception as e:
+            print(f"Query embedding cache write failed: {e}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+def create_query_embedding_cache() -> QueryEmbeddingCache:
+    if settings.QUERY_EMBEDDING_CACHE_URL:
+        backend = RedisCacheBackend(settings.QUERY_EMBEDDING_CACHE_URL, settings.QUERY_EMBEDDING_CACHE_TTL)
+    else:
+        backend = InMemoryCacheBackend(settings.QUERY_EMBEDDING_CACHE_SIZE, settings.QUERY_EMBEDDING_CACHE_TTL)
+    return QueryEmbeddingCache(backend)
+
+query_embedding_cache = create_query_embedding_cache()
@@ -1,27 +1,215 @@
-import google.generativeai as genai
+import asyncio
+import math
+import re
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter
+from functools import lru_cache
 from app.core.config import settings
+from app.services.embedding_cache import query_embedding_cache
+from app.services.ai_client import ai_client
 
-genai.configure(api_key=settings.GOOGLE_API_KEY)
+EMBEDDING_DIMENSIONS = 768 # Must match DocumentChunk.embedding
+
+class EmbeddingProvider(ABC):
+    """
+    Interface for embedding backends. The async variants used by the helpers
+    below run the synchronous methods in a worker thread unless a provider
+    has a native async path.
+    """
+    model_name: str = ""
+    dimensions: int = EMBEDDING_DIMENSIONS
+
+    @abstractmethod
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        ...
+
+    @abstractmethod
+    def embed_query(self, text: str) -> list[float]:
+        ...
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await asyncio.to_thread(self.embed_query, text)
+
+class GeminiEmbeddingProvider(EmbeddingProvider):
+    """
+    Gemini Embedding 001 through the google-generativeai SDK.
+    """
+    def __init__(self, model_name: str = "models/embedding-001"):
+        import google.generativeai as genai
+
+        genai.configure(api_key=settings.GOOGLE_API_KEY)
+        self._genai = genai
+        self.model_name = model_name
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        result = self._genai.embed_content(
+            model=self.model_name,
+            content=texts,
+            task_type="retrieval_document",
+            title="S-STUDY Content"
+        )
+        return result['embedding']
+
+    def embed_query(self, text: str) -> list[float]:
+        result = self._genai.embed_content(
+            model=self.model_name,
+            content=text,
+            task_type="retrieval_query"
+        )
+        return result['embedding']
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        # Through the shared AI client: rate limited, retried, circuit broken
+        return await ai_client.embed_content(self.model_name, texts, "retrieval_document", title="S-STUDY Content")
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await ai_client.embed_content(self.model_name, text, "retrieval_query")
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic offline embeddings for benchmarks and CI: word unigrams and
+    character n-grams are hashed (CRC32, stable across processes) into signed
+    buckets with sublinear term frequency, and the vector is L2-normalized.
+    No network, no model download, and texts sharing words or spellings land
+    close together.
+    """
+    model_name = "hashing-ngram-768"
+
+    def __init__(self, ngram_sizes: tuple[int, ...] = (3, 4, 5)):
+        self.ngram_sizes = ngram_sizes
+
+    def _features(self, text: str):
+        words = re.findall(r"\w+", text.casefold())
+        for word in words:
+            yield f"w:{word}"
+            padded = f"<{word}>"
+            for n in self.ngram_sizes:
+                for i in range(len(padded) - n + 1):
+                    yield padded[i:i + n]
+
+    def _embed(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        # Sublinear term frequency so n-grams shared by every word don't drown out the rest
+        for feature, count in Counter(self._features(text)).items():
+            h = zlib.crc32(feature.encode("utf-8"))
+            weight = 1.0 + math.log(count)
+            vector[h % self.dimensions] += weight if h & 0x80000000 else -weight
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            # Empty text: any fixed unit vector keeps cosine distance defined
+            vector[0] = 1.0
+            return vector
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+class SentenceTransformerEmbeddingProvider(EmbeddingProvider):
+    """
+    Local model for on-prem deployments (requires the optional
+    sentence-transformers package). The configured model must produce
+    768-dimensional vectors.
+    """
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self._model = SentenceTransformer(model_name, device=settings.EMBEDDING_LOCAL_DEVICE)
+        dimensions = self._model.get_sentence_embedding_dimension()
+        if dimensions != EMBEDDING_DIMENSIONS:
+            raise ValueError(f"{model_name} produces {dimensions}-d vectors, expected {EMBEDDING_DIMENSIONS}")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._model.encode(texts, normalize_embeddings=True).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._model.encode([text], normalize_embeddings=True)[0].tolist()
+
+EMBEDDING_PROVIDERS = {
+    "gemini": lambda: GeminiEmbeddingProvider(),
+    "hashing": lambda: HashingEmbeddingProvider(),
+    "local": lambda: SentenceTransformerEmbeddingProvider(settings.EMBEDDING_LOCAL_MODEL),
+}
+
+@lru_cache
+def get_embedding_provider() -> EmbeddingProvider:
+    """
+    The embedding provider selected by settings.EMBEDDING_PROVIDER, created on first use.
+    """
+    try:
+        factory = EMBEDDING_PROVIDERS[settings.EMBEDDING_PROVIDER]
+    except KeyError:
+        raise ValueError(f"Unknown embedding provider: {settings.EMBEDDING_PROVIDER}")
+    return factory()
 
 def get_embedding(text: str) -> list[float]:
     """
-    Generate embedding for the given text using Gemini Embedding 001.
+    Generate embedding for the given text.
     """
-    result = genai.embed_content(
-        model="models/embedding-001",
-        content=text,
-        task_type="retrieval_document",
-        title="S-STUDY Content"
-    )
-    return result['embedding']
+    return get_embedding_provider().embed_documents([text])[0]
+
+def get_embeddings(texts: list[str]) -> list[list[float]]:
+    """
+    Generate embeddings for a batch of texts with a single provider request.
+    """
+    return get_embedding_provider().embed_documents(texts)
 
 def get_query_embedding(text: str) -> list[float]:
     """
     Generate embedding for a search query.
     """
-    result = genai.embed_content(
-        model="models/embedding-001",
-        content=text,
-        task_type="retrieval_query"
+    return get_embedding_provider().embed_query(text)
+
+async def get_cached_query_embedding(text: str) -> list[float]:
+    """
+    Query embedding through the shared query cache; on a miss the provider
+    is called without blocking the event loop.
+    """
+    model_name = get_embedding_provider().model_name
+    embedding = await query_embedding_cache.get(text, model_name)
+    if embedding is None:
+        embedding = await get_embedding_provider().aembed_query(text)
+        await query_embedding_cache.set(text, model_name, embedding)
+    return embedding
+
+async def embed_documents(
+    texts: list[str],
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+) -> list[list[float]]:
+    """
+    Embed document chunks in batches.
+
+    Each batch is one provider request, made without blocking the event loop.
+    At most `concurrency` batches are in flight at once.
+    Embeddings are returned in the same order as `texts`.
+    """
+    if not texts:
+        return []
+
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    semaphore = asyncio.Semaphore(concurrency or settings.EMBEDDING_CONCURRENCY)
+    provider = get_embedding_provider()
+
+    async def embed_batch(batch: list[str]) -> list[list[float]]:
+        async with semaphore:
+            return await provider.aembed_documents(batch)
+
+    started = time.perf_counter()
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"Embedded {len(texts)} chunks in {len(batches)} batches "
+        f"in {elapsed:.2f}s ({len(texts) / max(elapsed, 1e-9):.1f} chunks/sec)"
     )
-    return result['embedding']
+    return [embedding for batch in results for embedding in batch]
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import re
+import shutil
+from app.core.config import settings
+from app.services.video_processing import get_ffmpeg_binary
+
+MASTER_PLAYLIST = "master.m3u8"
+
+def hls_directory(video_sha256: str) -> str:
+    # Content-addressed like the uploads, so identical videos are packaged once
+    return os.path.join(settings.HLS_DIR, video_sha256[:2], video_sha256)
+
+def find_hls_package(video_sha256: str | None) -> str | None:
+    """
+    Directory with the HLS renditions of a video, if it has been packaged.
+    """
+    if not video_sha256:
+        return None
+    directory = hls_directory(video_sha256)
+    return directory if os.path.exists(os.path.join(directory, MASTER_PLAYLIST)) else None
+
+async def probe_video(video_path: str) -> tuple[int | None, bool]:
+    """
+    (height of the first video stream, whether there is an audio stream),
+    read from ffmpeg's description of the input.
+    """
+    process = await asyncio.create_subprocess_exec(
+        get_ffmpeg_binary(), "-nostdin", "-hide_banner", "-i", video_path,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        # Exits with an error because no output is given; the input description is all we need
+        _, stderr = await process.communicate()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    output = stderr.decode(errors="replace")
+    match = re.search(r"Stream #\S+.*?: Video: .*?, (\d{2,5})x(\d{2,5})", output)
+    return (int(match[2]) if match else None), bool(re.search(r"Stream #\S+.*?: Audio: ", output))
+
+def hls_ffmpeg_args(
+    video_path: str,
+    output_dir: str,
+    renditions: list[tuple[int, int, int]],
+    has_audio: bool,
+    segment_seconds: int,
+) -> list[str]:
+    """
+    One ffmpeg pass that decodes the video once and encodes every rendition
+    (height, video kbps, audio kbps) into VOD HLS with a master playlist.
+    Keyframes are forced on segment boundaries so renditions switch cleanly.
+    """
+    split = "".join(f"[v{i}]" for i in range(len(renditions)))
+    scales = ";".join(f"[v{i}]scale=-2:{height}[v{i}out]" for i, (height, _, _) in enumerate(renditions))
+    args = [
+        get_ffmpeg_binary(), "-nostdin", "-hide_banner", "-loglevel", "error", "-y", "-i", video_path,
+        "-filter_complex", f"[0:v:0]split={len(renditions)}{split};{scales}",
+    ]
+    stream_map = []
+    for i, (_, video_kbps, audio_kbps) in enumerate(renditions):
+        args += [
+            "-map", f"[v{i}out]", f"-c:v:{i}", "libx264", f"-b:v:{i}", f"{video_kbps}k",
+            f"-maxrate:v:{i}", f"{video_kbps * 107 // 100}k", f"-bufsize:v:{i}", f"{video_kbps * 3 // 2}k",
+        ]
+        if has_audio:
+            args += ["-map", "0:a:0", f"-c:a:{i}", "aac", f"-b:a:{i}", f"{audio_kbps}k", f"-ac:a:{i}", "2"]
+        stream_map.append(f"v:{i},a:{i}" if has_audio else f"v:{i}")
+    args += [
+        "-preset", "veryfast", "-sc_threshold", "0",
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})",
+        "-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+        "-hls_flags", "independent_segments",
+        "-hls_segment_filename", os.path.join(output_dir, "v%v", "segment_%05d.ts"),
+        "-master_pl_name", MASTER_PLAYLIST,
+        "-var_stream_map", " ".join(stream_map),
+        os.path.join(output_dir, "v%v", "index.m3u8"),
+    ]
+    return args
+
+async def package_hls(video_path: str, video_sha256: str) -> str:
+    """
+    Package a video into HLS renditions (HLS_RENDITIONS no taller than the
+    source, at least the smallest one) under hls_directory(). Written to a
+    temporary directory that is renamed into place, so players never see a
+    half-written package. Returns the package directory.
+    """
+    directory = hls_directory(video_sha256)
+    if find_hls_package(video_sha256):
+        return directory
+
+    height, has_audio = await probe_video(video_path)
+    renditions = sorted(settings.HLS_RENDITIONS)
+    if height:
+        renditions = [rendition for rendition in renditions if rendition[0] <= height] or renditions[:1]
+
+    temp_dir = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *hls_ffmpeg_args(video_path, temp_dir, renditions, has_audio, settings.HLS_SEGMENT_SECONDS),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), settings.HLS_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"HLS packaging timed out after {settings.HLS_TIMEOUT}s")
+        finally:
+            if process.returncode is None:
+                # Timed out, or cancelled (worker shutdown, lost lease): don't leave ffmpeg writing
+                process.kill()
+                await process.wait()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace').strip()[-500:]}")
+
+        if find_hls_package(video_sha256):
+            # Packaged concurrently by another worker
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(temp_dir, directory)
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    return directory
@@ -0,0 +1,80 @@
+import json
+from collections import OrderedDict
+from app.core.config import settings
+from app.models.course import Lesson
+
+# Bump when the shape of the payload changes, so every stored payload is rebuilt
+LESSON_CONTEXT_FORMAT = 2
+
+def context_etag(lesson_id: int, context_version: int) -> str:
+    return f'"lesson-{lesson_id}-v{context_version}-f{LESSON_CONTEXT_FORMAT}"'
+
+def build_lesson_context(lesson: Lesson) -> dict:
+    """
+    Needs the lesson's deferred columns loaded (undefer(Lesson.transcript), undefer_group("ai_content")).
+    """
+    summary = lesson.key_takeaways
+    return {
+        "title": lesson.title,
+        "content": lesson.content,
+        "video_url": lesson.video_url,
+        "transcript": lesson.transcript,
+        # Uploads have a list of takeaways, YouTube lessons a summary text
+        "summary": "\n".join(summary) if isinstance(summary, list) else summary,
+        "chapters": lesson.chapters or [],
+        "vocabulary": lesson.vocabulary or [],
+        "quiz": lesson.quiz_questions or []
+    }
+
+def serialize_context(context: dict) -> bytes:
+    return json.dumps(context, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class PayloadCache:
+    """
+    In-process LRU of serialized payloads by lesson id, bounded by entry count
+    and total bytes. An entry is only returned for the ETag it was stored
+    with, so a payload outdated by another process is never served.
+    """
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[int, tuple[str, bytes]] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, lesson_id: int, etag: str) -> bytes | None:
+        entry = self.entries.get(lesson_id)
+        if entry is None or entry[0] != etag:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(lesson_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, lesson_id: int, etag: str, payload: bytes):
+        self.discard(lesson_id)
+        if len(payload) > self.max_bytes:
+            return
+        self.entries[lesson_id] = (etag, payload)
+        self.bytes += len(payload)
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def discard(self, lesson_id: int):
+        entry = self.entries.pop(lesson_id, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+context_cache = PayloadCache(settings.LESSON_CONTEXT_CACHE_SIZE, settings.LESSON_CONTEXT_CACHE_MAX_BYTES)
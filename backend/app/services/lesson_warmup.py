@@ -0,0 +1,143 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.crud.lesson_context import invalidate_lesson_contexts
+from app.db.session import AsyncSessionLocal
+from app.models.course import Lesson, VideoSourceType
+from app.models.job import ProcessingJob, JobType, JobStatus
+from app.services.playlist_importer import get_video_fetcher
+from app.services.youtube import generate_lesson_content
+
+# Lesson id -> the warm-up in flight for it, shared by every request that needs it. Per process:
+# each API worker process fetches a lesson at most once at a time, and the conditional write
+# below keeps concurrent fetches from different processes from storing it twice
+_inflight: dict[int, asyncio.Task] = {}
+# Lesson id -> monotonic time until which a missing transcript isn't fetched again
+_unavailable: dict[int, float] = {}
+
+async def warm_lesson(lesson_id: int, db_session_maker=AsyncSessionLocal) -> bool:
+    """
+    Fetch the transcript of a YouTube lesson that has none yet and store it
+    with its generated content. Returns whether the lesson has a transcript now.
+    The write only applies if no one else stored a transcript meanwhile.
+    """
+    async with db_session_maker() as db:
+        result = await db.execute(
+            select(Lesson.video_source_type, Lesson.video_url, Lesson.transcript.is_not(None)).where(Lesson.id == lesson_id)
+        )
+        row = result.one_or_none()
+    if row is None:
+        return False
+    source_type, video_url, has_transcript = row
+    if has_transcript:
+        return True
+    if source_type != VideoSourceType.YOUTUBE or not video_url:
+        return False
+
+    # Only the transcript: the title was settled by the import
+    with timed_stage("lesson", "warmup_fetch"):
+        transcript = await asyncio.wait_for(get_video_fetcher().fetch_transcript(video_url), settings.PLAYLIST_FETCH_TIMEOUT)
+    if not transcript:
+        return False
+
+    async with db_session_maker() as db:
+        result = await db.execute(
+            update(Lesson)
+            .where(Lesson.id == lesson_id, Lesson.transcript.is_(None))
+            .values(**generate_lesson_content(transcript))
+        )
+        if result.rowcount:
+            await invalidate_lesson_contexts(db, [lesson_id])
+        await db.commit()
+    return True
+
+def warm_lesson_once(lesson_id: int, db_session_maker=AsyncSessionLocal) -> asyncio.Task | None:
+    """
+    Single-flight warm_lesson(): concurrent callers in this process get the
+    same task, so a class opening a new lesson together causes one fetch per
+    API process, not one per student.
+    Returns None while the lesson is known to have no transcript
+    (for LESSON_WARMUP_RETRY_AFTER seconds after a fetch came back empty or failed).
+    """
+    task = _inflight.get(lesson_id)
+    if task is not None:
+        return task
+    if _unavailable.get(lesson_id, 0) > time.monotonic():
+        return None
+
+    task = asyncio.create_task(warm_lesson(lesson_id, db_session_maker))
+    _inflight[lesson_id] = task
+
+    def done(task: asyncio.Task):
+        _inflight.pop(lesson_id, None)
+        error = None if task.cancelled() else task.exception()
+        if error is not None:
+            print(f"Error warming up lesson {lesson_id}: {error!r}")
+        if task.cancelled() or error is not None or not task.result():
+            _unavailable[lesson_id] = time.monotonic() + settings.LESSON_WARMUP_RETRY_AFTER
+            # Expired entries are dropped as new ones come in, so the map stays small
+            now = time.monotonic()
+            for expired in [key for key, until in _unavailable.items() if until <= now]:
+                del _unavailable[expired]
+        else:
+            _unavailable.pop(lesson_id, None)
+
+    task.add_done_callback(done)
+    return task
+
+async def wait_for_warm_lesson(lesson_id: int, timeout: float) -> bool | None:
+    """
+    Start (or join) the warm-up of a lesson and wait up to `timeout` seconds.
+    True when the transcript is stored, False when there is none to fetch,
+    None when it is still running; it then carries on in the background.
+    """
+    task = warm_lesson_once(lesson_id)
+    if task is None:
+        return False
+    try:
+        # shield: a timed-out or disconnected request doesn't cancel the warm-up others wait on
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        return None
+    except Exception:
+        return False
+
+async def prewarm_imported_lessons(since: timedelta, db_session_maker=AsyncSessionLocal) -> dict:
+    """
+    Warm up the lessons still missing a transcript in courses whose playlist
+    import finished within `since` (e.g. captions published after the import),
+    PLAYLIST_FETCH_CONCURRENCY at a time. Returns counts of warmed and still missing lessons.
+    """
+    async with db_session_maker() as db:
+        cutoff = datetime.now(timezone.utc) - since
+        modules = select(ProcessingJob.payload["module_id"].as_integer()).where(
+            ProcessingJob.type == JobType.PLAYLIST_IMPORT,
+            ProcessingJob.status == JobStatus.SUCCEEDED,
+            ProcessingJob.finished_at >= cutoff,
+        )
+        result = await db.execute(
+            select(Lesson.id)
+            .where(
+                Lesson.module_id.in_(modules),
+                Lesson.video_source_type == VideoSourceType.YOUTUBE,
+                Lesson.transcript.is_(None),
+            )
+            .order_by(Lesson.id)
+        )
+        lesson_ids = list(result.scalars())
+
+    semaphore = asyncio.Semaphore(settings.PLAYLIST_FETCH_CONCURRENCY)
+
+    async def warm(lesson_id: int) -> bool:
+        async with semaphore:
+            try:
+                return await warm_lesson(lesson_id, db_session_maker)
+            except Exception as e:
+                print(f"Error warming up lesson {lesson_id}: {e!r}")
+                return False
+
+    warmed = sum(await asyncio.gather(*(warm(lesson_id) for lesson_id in lesson_ids)))
+    return {"warmed": warmed, "missing": len(lesson_ids) - warmed}
@@ -1,25 +1,114 @@
+import asyncio
+import hashlib
 import re
-import json
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from typing import List, Optional
-from sqlalchemy.orm import Session
+import httpx
+from sqlalchemy import insert, select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.crud import jobs as jobs_crud
+from app.crud.lesson_context import invalidate_lesson_contexts
 from app.models.course import Course, Module, Lesson, VideoSourceType, Language, CourseCategory
-from app.services.youtube import get_transcript, generate_summary, generate_smart_chapters
+from app.models.job import JobType
+from app.services.youtube import extract_video_id, get_transcript, generate_lesson_content
 
 # Note: In a real production environment, we would use the google-api-python-client
 # to fetch playlist items. For this implementation, we simulate the fetching
 # since an API key is not provided.
 
+class VideoFetcher(ABC):
+    """
+    Interface for fetching what an imported lesson needs from its video:
+    {"title": ... or None, "transcript": ... or None}, or only the transcript.
+    A video without a transcript gives None; failures worth retrying
+    (network, YouTube errors) raise.
+    """
+    @abstractmethod
+    async def fetch(self, video_url: str) -> dict:
+        ...
+
+    @abstractmethod
+    async def fetch_transcript(self, video_url: str) -> Optional[str]:
+        ...
+
+class YouTubeVideoFetcher(VideoFetcher):
+    """
+    Transcript from youtube-transcript-api (blocking, so run in a thread) and
+    title from the public oEmbed endpoint, which needs no API key. Only the
+    transcript decides whether the fetch failed: a missing title is tolerated.
+    """
+    OEMBED_URL = "https://www.youtube.com/oembed"
+
+    async def fetch(self, video_url: str) -> dict:
+        transcript, title = await asyncio.gather(self.fetch_transcript(video_url), self.fetch_title(video_url))
+        return {"title": title, "transcript": transcript}
+
+    async def fetch_transcript(self, video_url: str) -> Optional[str]:
+        return await asyncio.to_thread(get_transcript, video_url)
+
+    async def fetch_title(self, video_url: str) -> Optional[str]:
+        try:
+            async with httpx.AsyncClient(timeout=settings.PLAYLIST_FETCH_TIMEOUT) as client:
+                response = await client.get(self.OEMBED_URL, params={"url": video_url, "format": "json"})
+                response.raise_for_status()
+                return response.json().get("title")
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Error fetching title for {video_url}: {e}")
+            return None
+
+class LocalVideoFetcher(VideoFetcher):
+    """
+    Offline stand-in for tests and benchmarks: a deterministic title and
+    transcript derived from the video id, after `latency` seconds. Videos
+    whose URL contains "missing" have no transcript.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def fetch(self, video_url: str) -> dict:
+        return {"title": f"Local video {self._video_id(video_url)}", "transcript": await self.fetch_transcript(video_url)}
+
+    async def fetch_transcript(self, video_url: str) -> Optional[str]:
+        await asyncio.sleep(self.latency)
+        if "missing" in video_url:
+            return None
+        video_id = self._video_id(video_url)
+        return " ".join(f"Sentence {i + 1} of local video {video_id}." for i in range(20))
+
+    def _video_id(self, video_url: str) -> str:
+        return extract_video_id(video_url) or hashlib.sha256(video_url.encode()).hexdigest()[:11]
+
+VIDEO_FETCHERS = {
+    "youtube": lambda: YouTubeVideoFetcher(),
+    "local": lambda: LocalVideoFetcher(),
+}
+
+@lru_cache
+def get_video_fetcher() -> VideoFetcher:
+    try:
+        factory = VIDEO_FETCHERS[settings.YOUTUBE_FETCHER]
+    except KeyError:
+        raise ValueError(f"Unknown YouTube fetcher: {settings.YOUTUBE_FETCHER}")
+    return factory()
+
 async def import_youtube_playlist(
-    db: Session,
+    db: AsyncSession,
     playlist_url: str,
     title: str,
     description: str,
     language: Language,
     teacher_id: int,
     video_urls: List[str] # Provided for simulation or fetched via API
-) -> Course:
+) -> dict:
     """
-    Imports a YouTube playlist as a Course in the system.
+    Imports a YouTube playlist as a Course in the system: the course, its
+    module and one lesson per video are inserted at once, and a
+    PLAYLIST_IMPORT job fetches transcripts and titles in the background.
+    Commits. Returns {"course_id", "job_id", "status", "lessons"}.
     """
     # 1. Create the Course
     course = Course(
@@ -30,7 +119,7 @@ async def import_youtube_playlist(
         teacher_id=teacher_id
     )
     db.add(course)
-    db.flush() # Get course ID
+    await db.flush() # Get course ID
 
     # 2. Create a default module for the playlist
     module = Module(
@@ -39,25 +128,123 @@ async def import_youtube_playlist(
         order=1
     )
     db.add(module)
-    db.flush()
-
-    # 3. Process videos
-    for index, url in enumerate(video_urls):
-        lesson_title = f"Dars {index + 1}"
-        
-        lesson = Lesson(
-            module_id=module.id,
-            title=lesson_title,
-            content=f"Video dars: {lesson_title}",
-            video_source_type=VideoSourceType.YOUTUBE,
-            video_url=url,
-            order=index + 1
+    await db.flush()
+
+    # 3. One multi-row INSERT for all videos
+    if video_urls:
+        await db.execute(insert(Lesson), [
+            {
+                "module_id": module.id,
+                "title": f"Dars {index + 1}",
+                "content": f"Video dars: Dars {index + 1}",
+                "video_source_type": VideoSourceType.YOUTUBE,
+                "video_url": url,
+                "order": index + 1,
+            }
+            for index, url in enumerate(video_urls)
+        ])
+
+    # 4. Transcripts and titles are fetched by `python -m app.worker`
+    job = jobs_crud.enqueue_job(
+        db,
+        JobType.PLAYLIST_IMPORT,
+        payload={"course_id": course.id, "module_id": module.id, "playlist_id": extract_playlist_id(playlist_url)},
+    )
+    await db.commit()
+    return {"course_id": course.id, "job_id": job.id, "status": job.status, "lessons": len(video_urls)}
+
+@asynccontextmanager
+async def untracked_stage(name: str):
+    yield
+
+async def _fetch_video(fetcher: VideoFetcher, semaphore: asyncio.Semaphore, lesson_id: int, video_url: str) -> tuple[int, dict | None]:
+    # (lesson id, fetched fields), or None in place of the fields if fetching failed
+    async with semaphore:
+        try:
+            with timed_stage("playlist", "fetch_video"):
+                return lesson_id, await asyncio.wait_for(fetcher.fetch(video_url), settings.PLAYLIST_FETCH_TIMEOUT)
+        except Exception as e:
+            print(f"Error fetching {video_url}: {e!r}")
+            return lesson_id, None
+
+def _lesson_values(lesson_id: int, fetched: dict) -> dict:
+    values = {"id": lesson_id}
+    if fetched.get("title"):
+        values["title"] = fetched["title"]
+    if fetched.get("transcript"):
+        values.update(generate_lesson_content(fetched["transcript"]))
+    return values
+
+async def _write_lessons(db: AsyncSession, rows: list[dict]):
+    # ORM bulk UPDATE by primary key, one executemany per set of columns
+    by_columns: dict[tuple, list[dict]] = {}
+    for row in rows:
+        by_columns.setdefault(tuple(sorted(row)), []).append(row)
+    with timed_stage("playlist", "db_write"):
+        for group in by_columns.values():
+            await db.execute(update(Lesson), group)
+        await invalidate_lesson_contexts(db, [row["id"] for row in rows])
+
+async def import_playlist_videos(job_id: int, module_id: int, db_session_maker, stage=untracked_stage) -> dict:
+    """
+    Fetch transcripts and titles for the imported lessons of a module that
+    have no transcript yet, PLAYLIST_FETCH_CONCURRENCY at a time, writing them
+    back every PLAYLIST_WRITE_BATCH_SIZE videos and reporting progress on the
+    job. A retried job only fetches what is still missing.
+    Videos without an available transcript keep their placeholder content
+    (`without_transcript`); fetches that failed count as `errors`, and if every
+    fetch failed (e.g. the network is down), raises so the job is retried.
+    Returns the final progress.
+    """
+    async with db_session_maker() as db:
+        total = await db.scalar(select(func.count()).select_from(Lesson).where(Lesson.module_id == module_id))
+        result = await db.execute(
+            select(Lesson.id, Lesson.video_url)
+            .where(
+                Lesson.module_id == module_id,
+                Lesson.video_source_type == VideoSourceType.YOUTUBE,
+                Lesson.video_url.is_not(None),
+                Lesson.transcript.is_(None),
+            )
+            .order_by(Lesson.order)
         )
-        db.add(lesson)
-    
-    db.commit()
-    db.refresh(course)
-    return course
+        pending = result.all()
+        progress = {"total": total, "done": total - len(pending), "without_transcript": 0, "errors": 0}
+        await jobs_crud.set_job_progress(db, job_id, progress)
+
+    fetcher = get_video_fetcher()
+    semaphore = asyncio.Semaphore(settings.PLAYLIST_FETCH_CONCURRENCY)
+    async with stage("fetch_videos"):
+        tasks = [asyncio.create_task(_fetch_video(fetcher, semaphore, lesson_id, url)) for lesson_id, url in pending]
+        try:
+            batch = []
+            for completed in asyncio.as_completed(tasks):
+                lesson_id, fetched = await completed
+                progress["done"] += 1
+                if fetched is None:
+                    progress["errors"] += 1
+                else:
+                    if not fetched.get("transcript"):
+                        progress["without_transcript"] += 1
+                    if len(values := _lesson_values(lesson_id, fetched)) > 1:
+                        batch.append(values)
+                if len(batch) >= settings.PLAYLIST_WRITE_BATCH_SIZE:
+                    async with db_session_maker() as db:
+                        await _write_lessons(db, batch)
+                        await jobs_crud.set_job_progress(db, job_id, progress)
+                    batch = []
+            # The last partial batch, and the final progress
+            async with db_session_maker() as db:
+                if batch:
+                    await _write_lessons(db, batch)
+                await jobs_crud.set_job_progress(db, job_id, progress)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    if pending and progress["errors"] == len(pending):
+        raise RuntimeError(f"Fetching failed for all {len(pending)} videos")
+    return progress
 
 def extract_playlist_id(url: str) -> Optional[str]:
     """
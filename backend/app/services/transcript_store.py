@@ -0,0 +1,100 @@
+import gzip
+import json
+import zlib
+from typing import Optional
+from app.core.config import settings
+from app.services.disk_cache import DiskCache
+
+try:
+    import zstandard
+except ImportError:  # Optional: entries are gzip-compressed without it
+    zstandard = None
+
+# What a truncated or corrupt entry raises on decoding: ValueError (bad JSON or encoding),
+# EOFError (truncated gzip), OSError (bad gzip header), zlib.error (bad gzip data), zstandard.ZstdError
+DECODE_ERRORS = (ValueError, OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+GZIP_MAGIC = b"\x1f\x8b"
+
+def compress(data: bytes, codec: str, level: int | None = None) -> bytes:
+    if codec == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=level or 10).compress(data)
+    return gzip.compress(data, compresslevel=level or 6)
+
+def decompress(data: bytes) -> bytes:
+    # The codec is recognized by its magic number, so entries stay readable when the setting changes
+    if data.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError("zstd-compressed entry, but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if data.startswith(GZIP_MAGIC):
+        return gzip.decompress(data)
+    raise ValueError("Unknown transcript encoding")
+
+def youtube_key(video_id: str) -> str:
+    return f"youtube:{video_id}"
+
+def video_key(video_sha256: str) -> str:
+    return f"video:{video_sha256}"
+
+class TranscriptStore:
+    """
+    Compressed transcripts on disk, keyed by what they were made from (a
+    YouTube video id, or the SHA-256 of an uploaded video), so clearing a
+    lesson's transcript or using the same video in another course doesn't
+    go back to the network.
+
+    An entry is {"transcript", "segments": [{"start", "end", "text"}, ...]}
+    plus whatever else was derived with it (e.g. chapters). Bounded by
+    `max_bytes`, least recently read first (see DiskCache).
+    """
+    def __init__(self, directory: str, ttl: float, max_bytes: int, codec: str = "zstd", level: int | None = None):
+        self.cache = DiskCache(directory, ttl, max_bytes)
+        self.codec = codec
+        self.level = level
+        self.bytes_in = 0  # Uncompressed and compressed sizes written, for the ratio in stats()
+        self.bytes_out = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        data = self.cache.get(key)
+        if data is None:
+            return None
+        try:
+            entry = json.loads(decompress(data))
+            if not isinstance(entry, dict) or not isinstance(entry.get("transcript"), str):
+                raise ValueError("Not a transcript entry")
+            return entry
+        except DECODE_ERRORS as e:
+            print(f"Unreadable transcript store entry {key}: {e}")
+            self.cache.delete(key)
+            return None
+
+    def put(self, key: str, transcript: str, segments: list[dict] | None = None, **extra):
+        raw = json.dumps({"transcript": transcript, "segments": segments or [], **extra}, ensure_ascii=False).encode("utf-8")
+        data = compress(raw, self.codec, self.level)
+        self.bytes_in += len(raw)
+        self.bytes_out += len(data)
+        self.cache.set(key, data)
+
+    def contains(self, key: str) -> bool:
+        return self.cache.contains(key)
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "codec": "zstd" if self.codec == "zstd" and zstandard is not None else "gzip",
+            "compression_ratio": self.bytes_in / self.bytes_out if self.bytes_out else None,
+        }
+
+def create_transcript_store() -> TranscriptStore | None:
+    if not settings.TRANSCRIPT_STORE_DIR:
+        return None
+    return TranscriptStore(
+        settings.TRANSCRIPT_STORE_DIR,
+        settings.TRANSCRIPT_STORE_TTL,
+        settings.TRANSCRIPT_STORE_MAX_BYTES,
+        settings.TRANSCRIPT_STORE_COMPRESSION,
+    )
+
+transcript_store = create_transcript_store()
@@ -0,0 +1,422 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.services.video_processing import get_ffmpeg_binary
+from app.services.ai_client import ai_client
+from app.services.disk_cache import DiskCache, file_sha256
+
+SILENCE_NOISE = "-35dB"  # Quieter than this counts as silence
+SILENCE_MIN_DURATION = 0.4  # seconds
+
+def create_insights_caches() -> tuple[DiskCache | None, DiskCache | None]:
+    """
+    (results, Gemini file handles), or (None, None) when INSIGHTS_CACHE_DIR is unset.
+    Results are whole lectures and single segments, keyed by audio hash and model version.
+    """
+    if not settings.INSIGHTS_CACHE_DIR:
+        return None, None
+    return (
+        DiskCache(os.path.join(settings.INSIGHTS_CACHE_DIR, "results"), settings.INSIGHTS_CACHE_TTL, settings.INSIGHTS_CACHE_MAX_BYTES),
+        DiskCache(os.path.join(settings.INSIGHTS_CACHE_DIR, "gemini_files"), settings.GEMINI_FILE_TTL, 16 * 1024 * 1024),
+    )
+
+insights_cache, gemini_file_cache = create_insights_caches()
+
+def insights_cache_stats() -> dict:
+    return {
+        "results": insights_cache.stats() if insights_cache else None,
+        "gemini_files": gemini_file_cache.stats() if gemini_file_cache else None,
+    }
+
+def parse_timestamp(value: str | int | float) -> float:
+    """
+    "MM:SS" / "HH:MM:SS" (or plain seconds) to seconds.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    seconds = 0.0
+    for part in str(value).strip().split(":"):
+        seconds = seconds * 60 + float(part or 0)
+    return seconds
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+def parse_model_json(text: str):
+    # Clean up potential markdown formatting ```json ... ```
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return json.loads(text)
+
+async def _run_ffmpeg(args: list[str], timeout: float | None = None) -> str:
+    """
+    Run ffmpeg and return its stderr (where it reports durations and filter output).
+    """
+    process = await asyncio.create_subprocess_exec(
+        get_ffmpeg_binary(), "-nostdin", "-hide_banner", *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"ffmpeg timed out after {timeout}s")
+    finally:
+        if process.returncode is None:
+            # Timed out, or cancelled along with the transcription
+            process.kill()
+            await process.wait()
+    output = stderr.decode(errors="replace")
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {process.returncode}: {output.strip()[-500:]}")
+    return output
+
+async def probe_silences(audio_path: str) -> tuple[float, list[tuple[float, float]]]:
+    """
+    Duration of the audio and its silent stretches as (start, end) pairs,
+    from one decoding pass through ffmpeg's silencedetect filter.
+    """
+    output = await _run_ffmpeg(
+        ["-i", audio_path, "-af", f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_MIN_DURATION}", "-f", "null", "-"],
+        timeout=settings.AUDIO_EXTRACTION_TIMEOUT,
+    )
+    match = re.search(r"Duration: (\d+):(\d+):([\d.]+)", output)
+    duration = int(match[1]) * 3600 + int(match[2]) * 60 + float(match[3]) if match else 0.0
+    # The last "time=" progress report is the decoded length, for inputs without a Duration header
+    times = re.findall(r"time=(\d+):(\d+):([\d.]+)", output)
+    if times:
+        h, m, s = times[-1]
+        duration = max(duration, int(h) * 3600 + int(m) * 60 + float(s))
+
+    starts = [float(value) for value in re.findall(r"silence_start: (-?[\d.]+)", output)]
+    ends = [float(value) for value in re.findall(r"silence_end: ([\d.]+)", output)]
+    silences = [(max(start, 0.0), end) for start, end in zip(starts, ends)]
+    if len(starts) > len(ends):
+        # Silence running to the end of the file
+        silences.append((starts[-1], duration))
+    return duration, silences
+
+def plan_segments(
+    duration: float,
+    silences: list[tuple[float, float]],
+    target: float,
+    search: float,
+) -> list[tuple[float, float]]:
+    """
+    Split [0, duration] into (start, end) ranges of about `target` seconds.
+    Each cut goes in the middle of the silence closest to the ideal cut point
+    within `search` seconds, so sentences are rarely split; without one, the
+    cut is made at the ideal point and the overlap covers the broken words.
+    """
+    cuts = [0.0]
+    # Stop once the remainder fits in one segment, so there's no tiny tail segment
+    while duration - cuts[-1] > target * 1.25:
+        ideal = cuts[-1] + target
+        candidates = [
+            (start + end) / 2 for start, end in silences
+            if abs((start + end) / 2 - ideal) <= search and (start + end) / 2 > cuts[-1] + target / 2
+        ]
+        cuts.append(min(candidates, key=lambda cut: abs(cut - ideal)) if candidates else ideal)
+    cuts.append(duration)
+    return list(zip(cuts, cuts[1:]))
+
+async def cut_segment(audio_path: str, start: float, end: float, output_path: str):
+    # Re-encoded rather than stream-copied so cuts are sample-accurate; bit-exact so equal cuts hash equal
+    await _run_ffmpeg(
+        ["-loglevel", "error", "-y", "-ss", f"{start:.3f}", "-i", audio_path, "-t", f"{end - start:.3f}",
+         "-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "24k", "-application", "voip",
+         "-compression_level", "0", "-serial_offset", "1", "-fflags", "+bitexact", "-flags:a", "+bitexact", output_path],
+        timeout=settings.AUDIO_EXTRACTION_TIMEOUT,
+    )
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"\W+", "", word.casefold())
+
+def overlap_length(previous: list[str], following: list[str], max_words: int = 60, min_words: int = 3) -> int:
+    """
+    Number of leading words of `following` that repeat the end of `previous`
+    (the audio both segments share), compared case- and punctuation-insensitively.
+    """
+    previous = [_normalize_word(word) for word in previous[-max_words:]]
+    following = [_normalize_word(word) for word in following[:max_words]]
+    for size in range(min(len(previous), len(following)), min_words - 1, -1):
+        if previous[-size:] == following[:size]:
+            return size
+    return 0
+
+def _drop_words(text: str, count: int) -> str:
+    # Remove the first `count` words but keep the rest of the formatting intact
+    match = re.match(r"\s*(?:\S+\s*){%d}" % count, text)
+    return text[match.end():] if count and match else text
+
+class TranscriptionModel(ABC):
+    """
+    Interface for transcription backends: one call per audio segment, plus a
+    text-only summary of the stitched transcript.
+    """
+    model_name: str = ""
+
+    @property
+    def cache_version(self) -> str:
+        """
+        Part of every cache key: changes whenever the output for the same audio may change.
+        """
+        return self.model_name
+
+    @abstractmethod
+    async def transcribe_segment(self, audio_path: str) -> dict:
+        """
+        {"transcript": str, "chapters": [{"timestamp": "MM:SS", "title": str}]},
+        with timestamps relative to the start of the segment.
+        """
+
+    @abstractmethod
+    async def summarize(self, transcript: str) -> list[str]:
+        """
+        Key takeaways of the stitched transcript.
+        """
+
+class GeminiTranscriptionModel(TranscriptionModel):
+    SEGMENT_PROMPT = """
+    Listen to this audio lecture excerpt carefully.
+    1. Generate a verbatim TRANSCRIPT of the audio.
+    2. Create AUTO-CHAPTERS (list of objects with 'timestamp' and 'title'), timestamps from the start of this excerpt.
+
+    Return the result in the following JSON format ONLY:
+    {
+        "transcript": "Full text here...",
+        "chapters": [
+            {"timestamp": "00:00", "title": "Introduction"},
+            {"timestamp": "05:30", "title": "Topic A"}
+        ]
+    }
+    """
+    SUMMARY_PROMPT = """
+    Extract KEY TAKEAWAYS (list of 3-5 main points) from this lecture transcript.
+    Return a JSON array of strings ONLY.
+
+    Transcript:
+    """
+
+    def __init__(self, model_name: str = "models/gemini-1.5-flash"):
+        self.model_name = model_name
+
+    @property
+    def cache_version(self) -> str:
+        prompts = hashlib.sha256((self.SEGMENT_PROMPT + self.SUMMARY_PROMPT).encode("utf-8")).hexdigest()
+        return f"{self.model_name}:{prompts[:12]}"
+
+    async def _upload(self, audio_path: str):
+        """
+        Upload the audio, or reuse the file of an earlier upload of the same
+        content (a retried segment, a re-processed lecture) while Gemini still keeps it.
+        """
+        if gemini_file_cache is None:
+            with timed_stage("video", "gemini_upload"):
+                return await ai_client.upload_file(audio_path)
+        digest = await asyncio.to_thread(file_sha256, audio_path)
+        name = gemini_file_cache.get_json(digest)
+        if name:
+            try:
+                return await ai_client.get_file(name)
+            except Exception as e:
+                print(f"Cached Gemini file {name} is not available, uploading again: {e}")
+                gemini_file_cache.delete(digest)
+        with timed_stage("video", "gemini_upload"):
+            audio_file = await ai_client.upload_file(audio_path)
+        gemini_file_cache.set_json(digest, audio_file.name)
+        return audio_file
+
+    async def transcribe_segment(self, audio_path: str) -> dict:
+        audio_file = await self._upload(audio_path)
+        with timed_stage("video", "generate"):
+            text = await ai_client.generate_content(self.model_name, [self.SEGMENT_PROMPT, audio_file])
+        with timed_stage("video", "parse"):
+            return parse_model_json(text)
+
+    async def summarize(self, transcript: str) -> list[str]:
+        with timed_stage("video", "summarize"):
+            text = await ai_client.generate_content(self.model_name, self.SUMMARY_PROMPT + transcript)
+        with timed_stage("video", "parse"):
+            return parse_model_json(text)
+
+class StubTranscriptionModel(TranscriptionModel):
+    """
+    Offline stand-in for tests and benchmarks: "transcribes" a segment as one
+    numbered sentence per SENTENCE_SECONDS of audio, with a chapter per
+    minute. `fail_times` makes the first calls for each segment raise, to
+    exercise resuming a failed lecture from its saved segments.
+    """
+    model_name = "stub"
+    SENTENCE_SECONDS = 5
+
+    def __init__(self, fail_times: int = 0, latency: float = 0.0):
+        self.fail_times = fail_times
+        self.latency = latency
+        self.calls: dict[str, int] = {}
+
+    async def transcribe_segment(self, audio_path: str) -> dict:
+        self.calls[audio_path] = self.calls.get(audio_path, 0) + 1
+        await asyncio.sleep(self.latency)
+        if self.calls[audio_path] <= self.fail_times:
+            raise RuntimeError(f"Stub failure for {os.path.basename(audio_path)}")
+        duration, _ = await probe_silences(audio_path)
+        sentences = [f"Sentence at {format_timestamp(t)} of this segment." for t in range(0, int(duration), self.SENTENCE_SECONDS)]
+        chapters = [{"timestamp": format_timestamp(t), "title": f"Part {t // 60 + 1}"} for t in range(0, int(duration), 60)]
+        return {"transcript": " ".join(sentences), "chapters": chapters}
+
+    async def summarize(self, transcript: str) -> list[str]:
+        return [sentence.strip() + "." for sentence in transcript.split(".")[:3] if sentence.strip()]
+
+TRANSCRIPTION_MODELS = {
+    "gemini": lambda: GeminiTranscriptionModel(),
+    "stub": lambda: StubTranscriptionModel(),
+}
+
+@lru_cache
+def get_transcription_model() -> TranscriptionModel:
+    try:
+        factory = TRANSCRIPTION_MODELS[settings.TRANSCRIPTION_MODEL]
+    except KeyError:
+        raise ValueError(f"Unknown transcription model: {settings.TRANSCRIPTION_MODEL}")
+    return factory()
+
+async def _transcribe_segment_cached(model: TranscriptionModel, segment_path: str) -> dict:
+    key = None
+    if insights_cache is not None:
+        key = f"segment:{await asyncio.to_thread(file_sha256, segment_path)}:{model.cache_version}"
+        cached = insights_cache.get_json(key)
+        if cached is not None:
+            return cached
+    result = await model.transcribe_segment(segment_path)
+    if key:
+        insights_cache.set_json(key, result)
+    return result
+
+def stitch_segments(results: list[dict]) -> tuple[str, list[dict], list[dict]]:
+    """
+    Join segment transcripts in order, dropping the words repeated in each
+    overlap, and shift chapter timestamps by the segment offsets.
+    Returns (transcript, chapters, segments).
+    """
+    words: list[str] = []
+    texts, chapters, segments = [], [], []
+    for result in results:
+        text = result["transcript"].strip()
+        if words and result["offset"] < result["start"]:
+            text = _drop_words(text, overlap_length(words, text.split()))
+        words.extend(text.split())
+        texts.append(text)
+        segments.append({"start": round(result["start"], 2), "end": round(result["end"], 2), "text": text})
+
+        for chapter in result.get("chapters", []):
+            at = result["offset"] + parse_timestamp(chapter.get("timestamp", 0))
+            # Chapters found in the overlap belong to the previous segment
+            if at < result["start"] - 1:
+                continue
+            chapters.append({"timestamp": format_timestamp(at), "title": chapter.get("title", "")})
+    return "\n\n".join(text for text in texts if text), chapters, segments
+
+async def transcribe_lecture(
+    audio_path: str,
+    work_dir: str | None = None,
+    model: TranscriptionModel | None = None,
+) -> dict:
+    """
+    Transcribe lecture audio of any length.
+
+    Audio longer than TRANSCRIPTION_SEGMENT_SECONDS is cut near silences into
+    segments that start TRANSCRIPTION_SEGMENT_OVERLAP seconds early. Up to
+    TRANSCRIPTION_CONCURRENCY segments are transcribed at once. API errors are
+    retried by the AI client only; a segment that still fails fails the call,
+    after the other segments finish. Finished segments are saved in `work_dir`,
+    so when the whole call is retried (e.g. by the job worker) only the
+    missing segments are sent again.
+
+    With the insights cache enabled, audio already transcribed by the same
+    model version (whole, or segment by segment) isn't sent at all.
+
+    Returns {"transcript", "key_takeaways", "chapters", "segments"}, with
+    chapter and segment times relative to the whole recording.
+    """
+    model = model or get_transcription_model()
+    overlap = settings.TRANSCRIPTION_SEGMENT_OVERLAP
+    cache_key = None
+    if insights_cache is not None:
+        audio_sha256 = await asyncio.to_thread(file_sha256, audio_path)
+        # Segmentation settings change the stitched output too
+        segmentation = f"{settings.TRANSCRIPTION_SEGMENT_SECONDS}:{overlap}:{settings.TRANSCRIPTION_SILENCE_SEARCH}"
+        cache_key = f"lecture:{audio_sha256}:{model.cache_version}:{segmentation}"
+        cached = insights_cache.get_json(cache_key)
+        if cached is not None:
+            return cached
+
+    own_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="transcription_")
+    os.makedirs(work_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(settings.TRANSCRIPTION_CONCURRENCY)
+
+    try:
+        with timed_stage("video", "silence_probe"):
+            duration, silences = await probe_silences(audio_path)
+        ranges = plan_segments(duration, silences, settings.TRANSCRIPTION_SEGMENT_SECONDS, settings.TRANSCRIPTION_SILENCE_SEARCH)
+
+        async def transcribe(index: int, start: float, end: float) -> dict:
+            result_path = os.path.join(work_dir, f"segment-{index:04d}-{start:.2f}-{end:.2f}.json")
+            if os.path.exists(result_path):
+                with open(result_path) as f:
+                    return json.load(f)
+
+            offset = max(0.0, start - overlap) if index else 0.0
+            async with semaphore:
+                if len(ranges) == 1:
+                    segment_path = audio_path
+                else:
+                    segment_path = os.path.join(work_dir, f"segment-{index:04d}.ogg")
+                    with timed_stage("video", "cut_segment"):
+                        await cut_segment(audio_path, offset, end, segment_path)
+                try:
+                    result = await _transcribe_segment_cached(model, segment_path)
+                finally:
+                    if segment_path != audio_path and os.path.exists(segment_path):
+                        os.remove(segment_path)
+
+            result = {"offset": offset, "start": start, "end": end, **result}
+            with open(result_path, "w") as f:
+                json.dump(result, f)
+            return result
+
+        outcomes = await asyncio.gather(
+            *(transcribe(index, start, end) for index, (start, end) in enumerate(ranges)),
+            return_exceptions=True,
+        )
+        # Every segment has had its chance (and the successful ones are saved) before giving up
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if errors:
+            raise errors[0]
+
+        transcript, chapters, segments = stitch_segments(outcomes)
+        key_takeaways = await model.summarize(transcript) if transcript else []
+        insights = {"transcript": transcript, "key_takeaways": key_takeaways, "chapters": chapters, "segments": segments}
+        if cache_key:
+            insights_cache.set_json(cache_key, insights)
+        return insights
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,178 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import AsyncIterable, BinaryIO
+from fastapi import UploadFile
+
+UPLOAD_READ_SIZE = 1024 * 1024  # 1 MiB
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+class UploadLocked(Exception):
+    """
+    Another request is already writing to this upload.
+    """
+
+async def spool_upload_to_temp(
+    file: UploadFile,
+    suffix: str = "",
+    dir: str | None = None,
+    max_bytes: int | None = None,
+) -> tuple[str, str]:
+    """
+    Copy an upload to a named temporary file in fixed-size pieces, hashing it
+    on the way. Disk writes run in a worker thread. Returns (path, sha256);
+    the caller removes the file when done.
+    Raises UploadTooLarge (and removes the partial file) once more than
+    `max_bytes` have been read.
+    """
+    if max_bytes is not None and file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while piece := await file.read(UPLOAD_READ_SIZE):
+                size += len(piece)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(piece)
+                await asyncio.to_thread(out.write, piece)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+def safe_extension(filename: str | None) -> str:
+    """
+    File extension from a client-supplied name, reduced to something safe to put in a path.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,10}", ext) else ""
+
+def content_addressed_path(directory: str, sha256: str, ext: str = "") -> str:
+    # Two-character fan-out keeps directories small
+    return os.path.join(directory, sha256[:2], f"{sha256}{ext}")
+
+def find_content_addressed(directory: str, sha256: str) -> str | None:
+    """
+    Existing stored file with this hash, whatever extension it was saved with.
+    Only "<sha256>" plus at most one safe_extension() suffix counts: files derived
+    from the video next to it (e.g. "<sha256>.mp4.<lesson>.ogg" audio or a
+    "<sha256>.mp4.<lesson>.segments" work directory) are not the video.
+    """
+    pattern = re.compile(re.escape(sha256) + r"(\.[a-z0-9]{1,10})?")
+    fan_out = os.path.dirname(content_addressed_path(directory, sha256))
+    try:
+        names = sorted(os.listdir(fan_out))
+    except FileNotFoundError:
+        return None
+    for name in names:
+        path = os.path.join(fan_out, name)
+        if pattern.fullmatch(name) and os.path.isfile(path):
+            return path
+    return None
+
+async def save_upload_content_addressed(
+    file: UploadFile,
+    directory: str,
+    max_bytes: int | None = None,
+) -> tuple[str, str, bool]:
+    """
+    Stream an upload into `directory`, stored under its SHA-256, so identical
+    uploads share one file and different uploads never overwrite each other.
+    Returns (path, sha256, already_stored).
+    """
+    os.makedirs(directory, exist_ok=True)
+    # Spool next to the final location so the move is an atomic rename
+    temp_path, sha256 = await spool_upload_to_temp(file, suffix=".part", dir=directory, max_bytes=max_bytes)
+
+    path, already_stored = store_content_addressed(temp_path, directory, sha256, file.filename)
+    return path, sha256, already_stored
+
+def store_content_addressed(temp_path: str, directory: str, sha256: str, filename: str | None = None) -> tuple[str, bool]:
+    """
+    Move a complete file with the given hash into content-addressed storage,
+    or drop it if identical content is already stored. `temp_path` must be on
+    the same filesystem, so the move is an atomic rename.
+    Returns (path, already_stored).
+    """
+    existing = find_content_addressed(directory, sha256)
+    if existing:
+        os.remove(temp_path)
+        return existing, True
+
+    path = content_addressed_path(directory, sha256, safe_extension(filename))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temp_path, path)
+    return path, False
+
+@contextmanager
+def locked_for_append(path: str):
+    """
+    Open a resumable upload's staging file for writing, holding an exclusive
+    lock so two requests (e.g. a client retry racing the original) can't
+    write to it at once. Raises UploadLocked instead of waiting.
+    """
+    with open(path, "r+b") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadLocked(path)
+        yield f
+
+async def append_stream(
+    f: BinaryIO,
+    body: AsyncIterable[bytes],
+    max_bytes: int,
+    digest=None,
+) -> int:
+    """
+    Write a request body stream at the current position of `f`, in pieces of
+    UPLOAD_READ_SIZE written from a worker thread, feeding `digest` on the
+    way. Bytes received before the stream broke off are kept (written and
+    flushed), so the client can resume from the new end of the file.
+    Raises UploadTooLarge, without writing the excess, after `max_bytes`.
+    Returns the number of bytes written.
+    """
+    written = 0
+    buffer = bytearray()
+    try:
+        async for piece in body:
+            if written + len(buffer) + len(piece) > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            buffer += piece
+            if digest is not None:
+                digest.update(piece)
+            if len(buffer) >= UPLOAD_READ_SIZE:
+                await asyncio.to_thread(f.write, buffer)
+                written += len(buffer)
+                buffer = bytearray()
+    finally:
+        if buffer:
+            await asyncio.to_thread(f.write, buffer)
+            written += len(buffer)
+        await asyncio.to_thread(f.flush)
+    return written
+
+def concatenate_files(paths: list[str], output_path: str):
+    """
+    Join files in order into `output_path`, consuming them: the first one is
+    renamed rather than copied, the rest are appended and removed.
+    """
+    os.replace(paths[0], output_path)
+    with open(output_path, "ab") as out:
+        for path in paths[1:]:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, out, 16 * UPLOAD_READ_SIZE)
+            os.remove(path)
@@ -0,0 +1,156 @@
+import asyncio
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from starlette.requests import Request
+from starlette.responses import Response
+
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".m4v": "video/mp4",
+    ".mov": "video/quicktime",
+    ".webm": "video/webm",
+    ".mkv": "video/x-matroska",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    (first, last) byte positions, inclusive, of a single "bytes=" range,
+    clipped to the file. None for anything to ignore (another unit, several
+    ranges, a malformed header), meaning the whole file is sent.
+    Raises RangeNotSatisfiable if the range starts past the end.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, separator, last = spec.strip().partition("-")
+    if not separator:
+        return None
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+    If-None-Match comparison (weak: W/ prefixes are ignored).
+    """
+    if header.strip() == "*":
+        return True
+    strip = lambda tag: tag.strip().removeprefix("W/")
+    return strip(etag) in (strip(tag) for tag in header.split(","))
+
+def _if_range_allows(header: str | None, etag: str, mtime: float) -> bool:
+    # If-Range takes a strong ETag or the exact Last-Modified date; anything else means "send it all"
+    if header is None:
+        return True
+    header = header.strip()
+    if header.startswith(('"', "W/")):
+        return not header.startswith("W/") and header == etag
+    try:
+        return int(parsedate_to_datetime(header).timestamp()) == int(mtime)
+    except (TypeError, ValueError):
+        return False
+
+class FileRangeResponse(Response):
+    """
+    Serve a file with Range, If-Range and If-None-Match support, so players can seek.
+
+    The body is transferred, in order of preference:
+    - by the reverse proxy, when `accel_redirect` is set (nginx X-Accel-Redirect:
+      nginx then does sendfile and Range itself, and the app sends no bytes);
+    - through the ASGI zero-copy extension (sendfile) when the server offers it;
+    - otherwise streamed in STREAM_CHUNK_SIZE pieces read with pread in a worker
+      thread, so only one piece per response is in memory.
+    """
+    def __init__(
+        self,
+        path: str,
+        request: Request,
+        etag: str | None = None,
+        media_type: str | None = None,
+        cache_control: str = "private, max-age=3600",
+        accel_redirect: str | None = None,
+    ):
+        stat = os.stat(path)
+        self.path = path
+        self.background = None
+        self.size = stat.st_size
+        self.start, self.end = 0, self.size - 1
+        self.send_body = request.method != "HEAD"
+        self.media_type = media_type or MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+        # Content-addressed files have a natural strong ETag; otherwise one is derived from mtime and size
+        etag = etag or f'"{stat.st_mtime_ns:x}-{self.size:x}"'
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": formatdate(stat.st_mtime, usegmt=True),
+            "cache-control": cache_control,
+        }
+
+        if accel_redirect:
+            self.status_code = 200
+            self.send_body = False
+            headers["x-accel-redirect"] = accel_redirect
+        elif (if_none_match := request.headers.get("if-none-match")) and etag_matches(if_none_match, etag):
+            self.status_code = 304
+            self.send_body = False
+        else:
+            self.status_code = 200
+            range_header = request.headers.get("range")
+            if range_header and _if_range_allows(request.headers.get("if-range"), etag, stat.st_mtime):
+                try:
+                    byte_range = parse_range(range_header, self.size)
+                except RangeNotSatisfiable:
+                    byte_range = None
+                    self.status_code = 416
+                    self.send_body = False
+                    headers["content-range"] = f"bytes */{self.size}"
+                if byte_range:
+                    self.start, self.end = byte_range
+                    self.status_code = 206
+                    headers["content-range"] = f"bytes {self.start}-{self.end}/{self.size}"
+            if self.status_code != 416:
+                headers["content-length"] = str(self.end - self.start + 1)
+                headers["content-type"] = self.media_type
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if not self.send_body or count <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopy" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopy", "file": f, "offset": self.start, "count": count})
+                return
+            offset, remaining = self.start, count
+            while remaining:
+                piece = await asyncio.to_thread(os.pread, f.fileno(), min(STREAM_CHUNK_SIZE, remaining), offset)
+                if not piece:
+                    # The file shrank underneath us; end the response rather than hang
+                    break
+                offset += len(piece)
+                remaining -= len(piece)
+                await send({"type": "http.response.body", "body": piece, "more_body": remaining > 0})
+            if remaining:
+                await send({"type": "http.response.body", "body": b""})
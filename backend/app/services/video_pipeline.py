@@ -0,0 +1,184 @@
+import asyncio
+import os
+import shutil
+from contextlib import asynccontextmanager
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.models.course import Lesson
+from app.services.video_processing import extract_audio_for_transcription, generate_video_insights
+from app.crud.rag import sync_lesson_document
+from app.crud import jobs as jobs_crud
+from app.crud.lesson_context import invalidate_lesson_contexts
+from app.models.job import JobType
+from app.services.hls import find_hls_package
+from app.services.transcript_store import transcript_store, video_key
+
+VIDEO_STAGES = ("extract_audio", "insights", "indexing")
+
+async def reuse_processed_video(db: AsyncSession, lesson_id: int, video_sha256: str) -> bool:
+    """
+    Copy the transcript and insights of an already processed lesson with the
+    same video file. Re-indexing the transcript reuses the stored chunk
+    vectors, so no model is called. The caller is responsible for committing.
+    """
+    result = await db.execute(
+        select(Lesson)
+        .options(load_only(Lesson.id, Lesson.transcript, Lesson.key_takeaways, Lesson.chapters, Lesson.vocabulary, Lesson.quiz_questions))
+        .where(Lesson.video_sha256 == video_sha256, Lesson.id != lesson_id, Lesson.transcript.is_not(None))
+        .order_by(Lesson.id)
+        .limit(1)
+    )
+    source = result.scalar_one_or_none()
+    if source is None:
+        return False
+
+    await db.execute(
+        update(Lesson)
+        .where(Lesson.id == lesson_id)
+        .values(
+            transcript=source.transcript,
+            key_takeaways=source.key_takeaways,
+            chapters=source.chapters,
+            vocabulary=source.vocabulary,
+            quiz_questions=source.quiz_questions,
+        )
+    )
+    await invalidate_lesson_contexts(db, [lesson_id])
+    if source.transcript:
+        await sync_lesson_document(db, lesson_id, "transcript", source.transcript)
+    return True
+
+async def create_video_lesson(db: AsyncSession, module_id: int, title: str, video_path: str, video_sha256: str) -> dict:
+    """
+    Create the lesson for a stored video and queue its processing, or reuse
+    the results of an identical video processed before. Commits, so the job
+    becomes visible to workers together with the lesson.
+    Returns {"lesson_id", "job_id", "status"}.
+    With HLS_ENABLED, HLS packaging of the video is queued as a separate job.
+    """
+    db_lesson = Lesson(
+        module_id=module_id,
+        title=title,
+        content="Video Lesson",
+        video_url=video_path,
+        video_sha256=video_sha256,
+        order=1 # Simplify for demo
+    )
+    db.add(db_lesson)
+    await db.flush()
+
+    if settings.HLS_ENABLED and not find_hls_package(video_sha256):
+        jobs_crud.enqueue_job(
+            db,
+            JobType.HLS_PACKAGING,
+            lesson_id=db_lesson.id,
+            payload={"video_path": video_path, "video_sha256": video_sha256},
+        )
+
+    # Identical video already processed: copy its results, nothing to queue
+    if await reuse_processed_video(db, db_lesson.id, video_sha256):
+        await db.commit()
+        return {"lesson_id": db_lesson.id, "job_id": None, "status": "reused"}
+
+    # Picked up by `python -m app.worker`
+    job = jobs_crud.enqueue_job(
+        db,
+        JobType.VIDEO_PROCESSING,
+        lesson_id=db_lesson.id,
+        payload={"video_path": video_path, "video_sha256": video_sha256},
+    )
+    await db.commit()
+    return {"lesson_id": db_lesson.id, "job_id": job.id, "status": job.status}
+
+@asynccontextmanager
+async def untracked_stage(name: str):
+    yield
+
+def segments_dir(video_path: str, lesson_id: int) -> str:
+    # Finished transcription segments survive a failed attempt, so a retry only redoes the rest
+    return f"{video_path}.{lesson_id}.segments"
+
+async def process_video_task(
+    lesson_id: int,
+    video_path: str,
+    db_session_maker,
+    stage=untracked_stage,
+    video_sha256: str | None = None,
+):
+    """
+    Process an uploaded video: Extract Audio -> Insights -> Update DB -> RAG Indexing.
+
+    `stage(name)` wraps each step; the worker uses it to apply per-stage
+    concurrency limits and report progress. Errors propagate so the job can be retried.
+    If an identical video has been processed meanwhile, its results are reused instead,
+    and a video transcribed before (even for a since deleted lesson) is read from the
+    transcript store rather than transcribed again.
+    """
+    if video_sha256:
+        async with db_session_maker() as db:
+            with timed_stage("video", "reuse_lookup"):
+                reused = await reuse_processed_video(db, lesson_id, video_sha256)
+            if reused:
+                await db.commit()
+                return
+
+    insights = None
+    if video_sha256 and transcript_store is not None:
+        with timed_stage("video", "transcript_store_lookup"):
+            insights = await asyncio.to_thread(transcript_store.get, video_key(video_sha256))
+
+    audio_path = None
+    work_dir = segments_dir(video_path, lesson_id)
+    try:
+        if insights is None:
+            # 1. Extract Audio (ffmpeg child process or process pool, off the event loop).
+            # Named per lesson: identical uploads share one video file
+            async with stage("extract_audio"):
+                with timed_stage("video", "extract_audio"):
+                    audio_path = await extract_audio_for_transcription(video_path, f"{video_path}.{lesson_id}")
+
+            # 2. Generate Insights with Gemini
+            async with stage("insights"):
+                # Broken down further (upload, generation, parsing, ...) inside the transcription service
+                with timed_stage("video", "insights"):
+                    insights = await generate_video_insights(audio_path, work_dir)
+
+            if video_sha256 and transcript_store is not None and insights.get("transcript"):
+                await asyncio.to_thread(
+                    transcript_store.put,
+                    video_key(video_sha256),
+                    insights["transcript"],
+                    insights.get("segments"),
+                    key_takeaways=insights.get("key_takeaways", []),
+                    chapters=insights.get("chapters", []),
+                )
+
+        # 3. Update Database and index the transcript for RAG
+        async with stage("indexing"), db_session_maker() as db:
+            stmt = (
+                update(Lesson)
+                .where(Lesson.id == lesson_id)
+                .values(
+                    transcript=insights.get("transcript", ""),
+                    key_takeaways=insights.get("key_takeaways", []),
+                    chapters=insights.get("chapters", [])
+                )
+            )
+            with timed_stage("video", "db_write"):
+                await db.execute(stmt)
+                await invalidate_lesson_contexts(db, [lesson_id])
+
+            transcript = insights.get("transcript", "")
+            if transcript:
+                with timed_stage("video", "index_transcript"):
+                    await sync_lesson_document(db, lesson_id, "transcript", transcript)
+
+            with timed_stage("video", "commit"):
+                await db.commit()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    finally:
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
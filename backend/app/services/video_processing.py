@@ -1,11 +1,10 @@
 import os
+import asyncio
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 import moviepy.editor as mp
-import google.generativeai as genai
-import json
 from app.core.config import settings
 
-genai.configure(api_key=settings.GOOGLE_API_KEY)
-
 def extract_audio(video_path: str, output_audio_path: str):
     """
     Extracts audio from a video file and saves it as MP3.
@@ -18,53 +17,125 @@ def extract_audio(video_path: str, output_audio_path: str):
         print(f"Error extracting audio: {e}")
         raise e
 
-async def generate_video_insights(audio_path: str):
+AUDIO_EXTRACTION_MODES = ("ffmpeg", "moviepy")
+# ffmpeg codec -> file extension (the extension also tells Gemini the MIME type)
+AUDIO_EXTENSIONS = {"opus": ".ogg", "mp3": ".mp3", "copy": ".aac"}
+
+_process_pool: ProcessPoolExecutor | None = None
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.AUDIO_EXTRACTION_WORKERS)
+    return _process_pool
+
+def get_ffmpeg_binary() -> str:
+    """
+    settings.FFMPEG_BINARY, else ffmpeg on PATH, else the static build bundled
+    with imageio-ffmpeg (installed with moviepy).
+    """
+    if settings.FFMPEG_BINARY:
+        return settings.FFMPEG_BINARY
+    if path := shutil.which("ffmpeg"):
+        return path
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+def ffmpeg_audio_args(video_path: str, output_audio_path: str, codec: str = "opus") -> list[str]:
+    """
+    ffmpeg command that writes only the first audio stream; the video stream is never decoded.
+    - opus: mono 16 kHz Opus at 24 kbps, all speech transcription needs (~10 MB per hour).
+    - mp3: mono 16 kHz MP3 at 32 kbps, for consumers without Opus support.
+    - copy: the original AAC stream as is, no decode or encode at all.
+    The output is bit-exact (no random Ogg serial or encoder tags), so the same
+    video always gives the same audio hash and the insights cache can match it.
+    """
+    args = [
+        get_ffmpeg_binary(), "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", video_path, "-map", "0:a:0", "-vn", "-sn", "-dn",
+    ]
+    if codec == "opus":
+        # Lowest encoder complexity: much faster, and transcription doesn't notice the difference
+        args += ["-ac", "1", "-ar", "16000", "-c:a", "libopus", "-b:a", "24k", "-application", "voip", "-compression_level", "0",
+                 "-serial_offset", "1"]
+    elif codec == "mp3":
+        args += ["-ac", "1", "-ar", "16000", "-c:a", "libmp3lame", "-b:a", "32k"]
+    elif codec == "copy":
+        args += ["-c:a", "copy", "-f", "adts"]
+    else:
+        raise ValueError(f"Unknown audio codec: {codec}")
+    return args + ["-fflags", "+bitexact", "-flags:a", "+bitexact", output_audio_path]
+
+async def ffmpeg_extract_audio(video_path: str, output_stem: str, codec: str = "opus", timeout: float | None = None) -> str:
+    """
+    Run ffmpeg as a child process (the event loop only waits on it) and return
+    the written path. ffmpeg is killed if it runs longer than `timeout` seconds,
+    or if the caller is cancelled.
+    """
+    output_audio_path = f"{output_stem}{AUDIO_EXTENSIONS[codec]}"
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_audio_args(video_path, output_audio_path, codec),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"ffmpeg audio extraction timed out after {timeout}s")
+    finally:
+        if process.returncode is None:
+            # Timed out, or cancelled (worker shutdown, lost lease): don't leave ffmpeg writing
+            process.kill()
+            await process.wait()
+            if os.path.exists(output_audio_path):
+                os.remove(output_audio_path)
+
+    if process.returncode != 0:
+        if os.path.exists(output_audio_path):
+            os.remove(output_audio_path)
+        raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace').strip()[-500:]}")
+    return output_audio_path
+
+async def extract_audio_for_transcription(video_path: str, output_stem: str) -> str:
     """
-    Uploads audio to Gemini, transcribes it, and generates Key Takeaways & Chapters.
+    Extract the audio track per settings.AUDIO_EXTRACTION_MODE without blocking
+    the event loop, and return the written path (the extension depends on the codec).
+
+    - ffmpeg: direct ffmpeg call with settings.AUDIO_CODEC; "copy" falls back
+      to Opus when the source audio isn't AAC.
+    - moviepy: the original full decode + MP3 re-encode, in a process pool.
+      On timeout the job fails, but the pool process finishes its work in the background.
     """
+    timeout = settings.AUDIO_EXTRACTION_TIMEOUT
+    mode = settings.AUDIO_EXTRACTION_MODE
+    if mode == "moviepy":
+        output_audio_path = f"{output_stem}.mp3"
+        loop = asyncio.get_running_loop()
+        await asyncio.wait_for(loop.run_in_executor(_get_process_pool(), extract_audio, video_path, output_audio_path), timeout)
+        return output_audio_path
+    if mode != "ffmpeg":
+        raise ValueError(f"Unknown audio extraction mode: {mode}")
+
+    codec = settings.AUDIO_CODEC
+    if codec == "copy":
+        try:
+            return await ffmpeg_extract_audio(video_path, output_stem, "copy", timeout)
+        except RuntimeError as e:
+            print(f"Audio stream copy failed, re-encoding to Opus: {e}")
+            codec = "opus"
+    return await ffmpeg_extract_audio(video_path, output_stem, codec, timeout)
+
+async def generate_video_insights(audio_path: str, work_dir: str | None = None):
+    """
+    Transcribes the lecture audio and generates Key Takeaways & Chapters.
+    Long recordings are transcribed as parallel segments (see app.services.transcription);
+    `work_dir` keeps finished segments so a retry only redoes the failed ones.
+    """
+    from app.services.transcription import transcribe_lecture
+
     try:
-        # 1. Upload file to Gemini
-        # Note: In a real production environment with high scale, we'd handle file cleanup and caching.
-        # For this implementation, we upload fresh.
-        audio_file = genai.upload_file(path=audio_path)
-        
-        # 2. Prepare Prompt
-        prompt = """
-        Listen to this audio lecture carefully.
-        1. Generate a verbatim TRANSCRIPT of the audio.
-        2. Extract KEY TAKEAWAYS (list of 3-5 main points).
-        3. Create AUTO-CHAPTERS (list of objects with 'timestamp' and 'title').
-        
-        Return the result in the following JSON format ONLY:
-        {
-            "transcript": "Full text here...",
-            "key_takeaways": ["Point 1", "Point 2", ...],
-            "chapters": [
-                {"timestamp": "00:00", "title": "Introduction"},
-                {"timestamp": "05:30", "title": "Topic A"}
-            ]
-        }
-        """
-        
-        # 3. Generate Content
-        model = genai.GenerativeModel('models/gemini-1.5-flash')
-        response = model.generate_content([prompt, audio_file])
-        
-        # 4. Parse JSON
-        # Clean up potential markdown formatting ```json ... ```
-        text_response = response.text
-        if text_response.startswith("```json"):
-            text_response = text_response[7:]
-        if text_response.endswith("```"):
-            text_response = text_response[:-3]
-            
-        return json.loads(text_response)
-        
+        return await transcribe_lecture(audio_path, work_dir)
     except Exception as e:
         print(f"Error generating insights: {e}")
-        # Return empty structure on failure to avoid breaking the flow
-        return {
-            "transcript": "Error processing audio.",
-            "key_takeaways": [],
-            "chapters": []
-        }
+        # Let the job fail so the worker retries it, instead of storing a placeholder transcript
+        raise e
@@ -1,6 +1,21 @@
+import youtube_transcript_api
 from youtube_transcript_api import YouTubeTranscriptApi
 from typing import Optional, List
 import re
+from app.services.transcript_store import transcript_store, youtube_key
+
+class TranscriptFetchError(Exception):
+    """
+    The transcript couldn't be fetched right now (network down, YouTube blocking
+    or failing requests), as opposed to the video having none. Worth retrying.
+    """
+
+# Names differ between youtube-transcript-api versions; requests' exceptions are OSErrors
+TRANSIENT_TRANSCRIPT_ERRORS = tuple(
+    getattr(youtube_transcript_api, name)
+    for name in ("RequestBlocked", "IpBlocked", "TooManyRequests", "YouTubeRequestFailed")
+    if hasattr(youtube_transcript_api, name)
+) + (OSError,)
 
 def extract_video_id(url: str) -> Optional[str]:
     """
@@ -64,25 +79,68 @@ def generate_smart_chapters(transcript: str) -> List[dict]:
         {"title": "Conclusion", "start_time": "5:00"}
     ]
 
+def generate_lesson_content(transcript: str) -> dict:
+    """
+    Lesson column values derived from a transcript: the transcript itself,
+    summary, chapters, vocabulary and quiz.
+    """
+    return {
+        "transcript": transcript,
+        "key_takeaways": generate_summary(transcript),
+        "chapters": generate_smart_chapters(transcript),
+        "vocabulary": generate_vocabulary(transcript),
+        "quiz_questions": generate_quiz(transcript),
+    }
+
+def fetch_transcript_segments(video_id: str) -> List[dict]:
+    """
+    Timed caption snippets of a YouTube video as [{"start", "end", "text"}, ...].
+    """
+    if hasattr(YouTubeTranscriptApi, "get_transcript"):
+        items = YouTubeTranscriptApi.get_transcript(video_id)
+    else:
+        # youtube-transcript-api >= 1.0 replaced the class methods with an instance API
+        items = YouTubeTranscriptApi().fetch(video_id).to_raw_data()
+    return [
+        {"start": round(item["start"], 2), "end": round(item["start"] + item.get("duration", 0), 2), "text": item["text"]}
+        for item in items
+    ]
+
 def get_transcript(video_url: str) -> Optional[str]:
     """
-    Fetches the transcript of a YouTube video.
-    Returns the transcript as a single string or None if failed.
+    Fetches the transcript of a YouTube video, from the transcript store when
+    it has been fetched before.
+    Returns the transcript as a single string, or None if the video has none.
+    Raises TranscriptFetchError when fetching failed for a transient reason.
     """
     video_id = extract_video_id(video_url)
     if not video_id:
         return None
 
+    if transcript_store is not None:
+        try:
+            stored = transcript_store.get(youtube_key(video_id))
+        except Exception as e:
+            # The store only saves a request; a broken one must not fail the lookup
+            print(f"Transcript store read failed for {video_id}: {e}")
+            stored = None
+        if stored is not None:
+            return stored["transcript"]
+
     try:
         # Fetch transcript
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
+        segments = fetch_transcript_segments(video_id)
         
         # Combine text parts
-        full_text = " ".join([item['text'] for item in transcript_list])
-        return full_text
+        full_text = " ".join([item['text'] for item in segments])
+    except TRANSIENT_TRANSCRIPT_ERRORS as e:
+        raise TranscriptFetchError(f"Error fetching transcript for {video_id}: {e}") from e
     except Exception as e:
-        print(f"Error fetching transcript for {video_id}: {e}")
+        print(f"No transcript for {video_id}: {e}")
         return None
+    if transcript_store is not None and full_text:
+        transcript_store.put(youtube_key(video_id), full_text, segments)
+    return full_text
 
 def get_video_metadata(video_url: str) -> dict:
     """
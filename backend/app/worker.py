@@ -0,0 +1,166 @@
+"""
+Background job worker: runs queued processing jobs (video processing, ...) outside the API process.
+Run from backend directory: python -m app.worker --concurrency 4
+Start as many worker processes as needed; they coordinate through the processing_jobs table.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import signal
+import socket
+import sys
+import traceback
+from contextlib import asynccontextmanager, nullcontext
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from prometheus_client import start_http_server
+from app.core.config import settings
+from app.core.metrics import timed_stage
+from app.crud import jobs as jobs_crud
+from app.db.session import AsyncSessionLocal
+from app.models.job import ProcessingJob, JobType, JobStatus
+from app.services.video_pipeline import process_video_task, segments_dir
+from app.services.hls import package_hls
+from app.services.playlist_importer import import_playlist_videos
+from app.services.transcription import insights_cache_stats
+
+async def run_video_processing(job: ProcessingJob, stage):
+    try:
+        await process_video_task(
+            job.lesson_id, job.payload["video_path"], AsyncSessionLocal, stage, video_sha256=job.payload.get("video_sha256"),
+        )
+    finally:
+        # Hit rates since this worker started
+        print(f"Insights cache: {insights_cache_stats()}")
+
+async def run_hls_packaging(job: ProcessingJob, stage):
+    async with stage("package_hls"):
+        with timed_stage("video", "package_hls"):
+            await package_hls(job.payload["video_path"], job.payload["video_sha256"])
+
+async def run_playlist_import(job: ProcessingJob, stage):
+    progress = await import_playlist_videos(job.id, job.payload["module_id"], AsyncSessionLocal, stage)
+    print(f"Playlist import for course {job.payload['course_id']}: {progress}")
+
+JOB_HANDLERS = {
+    JobType.VIDEO_PROCESSING: run_video_processing,
+    JobType.HLS_PACKAGING: run_hls_packaging,
+    JobType.PLAYLIST_IMPORT: run_playlist_import,
+}
+
+def discard_video_processing(job: ProcessingJob):
+    shutil.rmtree(segments_dir(job.payload["video_path"], job.lesson_id), ignore_errors=True)
+
+# Run once a job has failed for good, to remove what was kept on disk for its retries
+JOB_FAILURE_CLEANUP = {
+    JobType.VIDEO_PROCESSING: discard_video_processing,
+}
+
+class Worker:
+    """
+    Keeps up to `concurrency` jobs in flight. Within the process, each
+    pipeline stage has its own limit, so e.g. CPU-heavy audio extraction
+    can't occupy every slot while the AI calls sit idle.
+    """
+    def __init__(self, concurrency: int, session_maker=AsyncSessionLocal):
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.session_maker = session_maker
+        self.stage_limits = {
+            "extract_audio": asyncio.Semaphore(settings.WORKER_EXTRACT_CONCURRENCY),
+            "insights": asyncio.Semaphore(settings.WORKER_AI_CONCURRENCY),
+            "indexing": asyncio.Semaphore(settings.WORKER_INDEX_CONCURRENCY),
+            "package_hls": asyncio.Semaphore(settings.WORKER_HLS_CONCURRENCY),
+        }
+        self.running: set[asyncio.Task] = set()
+        self.stopping = asyncio.Event()
+
+    @asynccontextmanager
+    async def stage(self, job_id: int, name: str):
+        async with self.stage_limits.get(name) or nullcontext():
+            async with self.session_maker() as db:
+                await jobs_crud.set_job_stage(db, job_id, name)
+            yield
+
+    async def heartbeat(self, job_id: int, handler: asyncio.Task):
+        """
+        Renew the job's lease every JOB_LEASE_TIMEOUT / 3 for as long as it runs,
+        so a long stage (insights, HLS packaging) isn't reclaimed by another worker
+        and run twice. If the lease was lost anyway, the handler is cancelled.
+        """
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_TIMEOUT / 3)
+            try:
+                async with self.session_maker() as db:
+                    leased = await jobs_crud.renew_job_lease(db, job_id, self.id)
+            except Exception as e:
+                print(f"Error renewing lease of job {job_id}: {e}")
+                continue
+            if not leased:
+                print(f"⚠️ Job {job_id} is no longer leased to this worker, cancelling it")
+                handler.cancel()
+                return
+
+    async def execute(self, job: ProcessingJob):
+        handler = asyncio.create_task(JOB_HANDLERS[job.type](job, lambda name: self.stage(job.id, name)))
+        heartbeat = asyncio.create_task(self.heartbeat(job.id, handler))
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                raise
+            # Lease lost: the job is someone else's now, so its status is left alone
+            return
+        except Exception as e:
+            async with self.session_maker() as db:
+                status = await jobs_crud.mark_job_failed(db, job.id, traceback.format_exc())
+            print(f"❌ Job {job.id} ({job.type.value}) attempt {job.attempts} failed, now {status.value}: {e}")
+            if status == JobStatus.FAILED and job.type in JOB_FAILURE_CLEANUP:
+                JOB_FAILURE_CLEANUP[job.type](job)
+        else:
+            async with self.session_maker() as db:
+                await jobs_crud.mark_job_succeeded(db, job.id)
+            print(f"✅ Job {job.id} ({job.type.value}) done")
+        finally:
+            heartbeat.cancel()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stopping.set)
+        stop = asyncio.create_task(self.stopping.wait())
+        print(f"Worker {self.id} started with {self.concurrency} slots")
+
+        while not self.stopping.is_set():
+            free = self.concurrency - len(self.running)
+            if free > 0:
+                try:
+                    async with self.session_maker() as db:
+                        claimed = await jobs_crud.claim_jobs(db, self.id, free)
+                except Exception as e:
+                    print(f"Error claiming jobs: {e}")
+                    claimed = []
+                for job in claimed:
+                    task = asyncio.create_task(self.execute(job))
+                    self.running.add(task)
+                    task.add_done_callback(self.running.discard)
+            # Wake up when a slot frees, on shutdown, or to poll for new jobs
+            await asyncio.wait({stop, *self.running}, timeout=settings.WORKER_POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+
+        if self.running:
+            print(f"⏳ Waiting for {len(self.running)} running jobs to finish")
+            await asyncio.gather(*self.running, return_exceptions=True)
+        print(f"Worker {self.id} stopped")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY, help="Jobs run in parallel")
+    args = parser.parse_args()
+    if settings.WORKER_METRICS_PORT:
+        try:
+            start_http_server(settings.WORKER_METRICS_PORT)
+        except OSError as e:
+            # Another worker on this host already serves it
+            print(f"Metrics server not started on port {settings.WORKER_METRICS_PORT}: {e}")
+    asyncio.run(Worker(args.concurrency).run())
@@ -0,0 +1,122 @@
+"""
+Audio extraction benchmark: the moviepy path (full decode + MP3 re-encode)
+against direct ffmpeg (Opus mono 16 kHz, MP3 mono, AAC stream copy).
+
+Generates H.264 + AAC test clips of the given durations with ffmpeg, then runs
+every mode on every clip in a fresh process and reports wall time, peak RSS
+of the Python process and of its ffmpeg children, and output size. The Python
+RSS includes importing the app; for the ffmpeg modes it stays flat.
+Peak RSS is sampled from /proc (VmHWM), so this needs Linux.
+
+Run from backend directory:
+    python -m benchmarks.audio_extraction --durations 60 600 1800 --json audio_extraction.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.video_processing import AUDIO_EXTENSIONS, ffmpeg_audio_args, get_ffmpeg_binary
+
+MODES = ("moviepy", "ffmpeg-opus", "ffmpeg-mp3", "ffmpeg-copy")
+
+def make_clip(path: str, seconds: int, height: int):
+    """
+    Test pattern video with a tone: the audio content doesn't matter for
+    extraction cost, the container and codecs do.
+    """
+    subprocess.run([
+        get_ffmpeg_binary(), "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={height * 16 // 9}x{height}:rate=25",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(seconds), "-c:v", "libx264", "-preset", "ultrafast", "-crf", "30",
+        "-c:a", "aac", "-b:a", "128k", "-ac", "2", path,
+    ], check=True)
+
+def _process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    for current in pids:
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+def _peak_rss_mb(pid: int) -> float:
+    # ru_maxrss would be useless here: it carries the parent's high-water mark across fork + exec
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def _extract(mode: str, video_path: str, output_stem: str, results):
+    # Runs in a fresh process so its memory only reflects this extraction
+    started = time.perf_counter()
+    if mode == "moviepy":
+        from app.services.video_processing import extract_audio
+        output = f"{output_stem}.mp3"
+        extract_audio(video_path, output)
+    else:
+        codec = mode.split("-", 1)[1]
+        output = f"{output_stem}{AUDIO_EXTENSIONS[codec]}"
+        subprocess.run(ffmpeg_audio_args(video_path, output, codec), check=True)
+    elapsed = time.perf_counter() - started
+    results.put({"wall_s": round(elapsed, 2), "output_mb": round(os.path.getsize(output) / 2**20, 2)})
+    os.remove(output)
+
+def run_mode(mode: str, video_path: str, workdir: str) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_extract, args=(mode, video_path, os.path.join(workdir, f"out-{mode}"), results))
+    process.start()
+    python_rss = ffmpeg_rss = 0.0
+    while process.is_alive():
+        pids = _process_tree(process.pid)
+        python_rss = max(python_rss, _peak_rss_mb(process.pid))
+        ffmpeg_rss = max([ffmpeg_rss] + [_peak_rss_mb(pid) for pid in pids[1:]])
+        time.sleep(0.01)
+    process.join()
+    if process.exitcode != 0:
+        return {"error": f"exit code {process.exitcode}"}
+    return {**results.get(), "python_rss_mb": round(python_rss, 1), "ffmpeg_rss_mb": round(ffmpeg_rss, 1)}
+
+def main(args):
+    workdir = tempfile.mkdtemp(prefix="audio_bench_")
+    report = {"ffmpeg": get_ffmpeg_binary(), "clips": []}
+    try:
+        for seconds in args.durations:
+            clip = os.path.join(workdir, f"clip-{seconds}s.mp4")
+            make_clip(clip, seconds, args.height)
+            entry = {"duration_s": seconds, "video_mb": round(os.path.getsize(clip) / 2**20, 1), "modes": {}}
+            for mode in args.modes:
+                result = run_mode(mode, clip, workdir)
+                entry["modes"][mode] = result
+                print(f"{seconds:>6}s  {mode:<12} " + "  ".join(f"{key}={value}" for key, value in result.items()))
+            report["clips"].append(entry)
+            os.remove(clip)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--durations", nargs="+", type=int, default=[60, 600], help="Clip lengths in seconds")
+    parser.add_argument("--height", type=int, default=720, help="Video height of the generated clips")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--json", help="Write the report to this file as JSON")
+    main(parser.parse_args())
@@ -0,0 +1,155 @@
+"""
+Recall / latency benchmark for the document_chunks ANN index.
+
+Loads synthetic 768-d clustered vectors into a scratch table at each corpus
+size, computes exact top-k with a sequential scan, then builds HNSW and
+IVFFlat indexes and reports recall@k and p50/p99 latency for a sweep of
+ef_search / probes values.
+
+Run from backend directory against a pgvector Postgres:
+    python -m benchmarks.vector_index_recall --sizes 100000 1000000 5000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+from app.core.config import settings
+from app.db.vector_index import vector_index_ddl
+
+TABLE = "bench_vectors"
+DIMENSIONS = 768
+LOAD_BATCH = 50_000
+
+def percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+def default_lists(size: int) -> int:
+    # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond
+    return max(size // 1000, 10) if size <= 1_000_000 else int(size ** 0.5)
+
+def synthetic_batch(rng: np.random.Generator, centers: np.ndarray, size: int) -> np.ndarray:
+    """
+    Points scattered around random cluster centers, which is closer to real
+    embedding distributions than uniform noise.
+    """
+    labels = rng.integers(0, len(centers), size)
+    points = centers[labels] + rng.normal(0, 0.3, (size, DIMENSIONS)).astype(np.float32)
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+async def load_corpus(conn, rng, centers, size: int):
+    await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await conn.execute(f"CREATE TABLE {TABLE} (id bigint PRIMARY KEY, embedding vector({DIMENSIONS}))")
+    started = time.perf_counter()
+    for offset in range(0, size, LOAD_BATCH):
+        batch = synthetic_batch(rng, centers, min(LOAD_BATCH, size - offset))
+        await conn.copy_records_to_table(
+            TABLE,
+            records=((offset + i, vector) for i, vector in enumerate(batch)),
+            columns=["id", "embedding"],
+        )
+    await conn.execute(f"ANALYZE {TABLE}")
+    return time.perf_counter() - started
+
+async def top_k(conn, query: np.ndarray, k: int) -> tuple[list[int], float]:
+    started = time.perf_counter()
+    rows = await conn.fetch(f"SELECT id FROM {TABLE} ORDER BY embedding <=> $1 LIMIT {k}", query)
+    return [row["id"] for row in rows], (time.perf_counter() - started) * 1000
+
+async def exact_top_k(conn, queries, k: int) -> list[set[int]]:
+    truth = []
+    async with conn.transaction():
+        await conn.execute("SET LOCAL enable_indexscan = off")
+        for query in queries:
+            ids, _ = await top_k(conn, query, k)
+            truth.append(set(ids))
+    return truth
+
+async def sweep(conn, queries, truth, k: int, setting: str, values: list[int]) -> list[dict]:
+    results = []
+    for value in values:
+        latencies, recalls = [], []
+        async with conn.transaction():
+            await conn.execute(f"SET LOCAL {setting} = {int(value)}")
+            for query, expected in zip(queries, truth):
+                ids, elapsed_ms = await top_k(conn, query, k)
+                latencies.append(elapsed_ms)
+                recalls.append(len(expected.intersection(ids)) / k)
+        results.append({
+            setting: value,
+            f"recall@{k}": round(float(np.mean(recalls)), 4),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        })
+    return results
+
+async def run(args):
+    dsn = str(settings.SQLALCHEMY_DATABASE_URI).replace("postgresql+asyncpg://", "postgresql://")
+    conn = await asyncpg.connect(args.dsn or dsn)
+    await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    await register_vector(conn)
+    await conn.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(0, 1, (args.clusters, DIMENSIONS)).astype(np.float32)
+    report = []
+
+    try:
+        for size in args.sizes:
+            load_s = await load_corpus(conn, rng, centers, size)
+            queries = list(synthetic_batch(rng, centers, args.queries))
+            exact_started = time.perf_counter()
+            truth = await exact_top_k(conn, queries, args.k)
+            exact_ms = (time.perf_counter() - exact_started) * 1000 / len(queries)
+            print(f"\n{size:,} chunks: loaded in {load_s:.1f}s, exact scan {exact_ms:.1f} ms/query")
+            entry = {"size": size, "load_s": round(load_s, 2), "exact_ms_per_query": round(exact_ms, 2), "indexes": []}
+
+            for index_type in args.index:
+                await conn.execute(f"DROP INDEX IF EXISTS {TABLE}_embedding_idx")
+                lists = args.lists or default_lists(size)
+                started = time.perf_counter()
+                await conn.execute(vector_index_ddl(
+                    index_type, table=TABLE, name=f"{TABLE}_embedding_idx",
+                    m=args.m, ef_construction=args.ef_construction, lists=lists,
+                ))
+                build_s = time.perf_counter() - started
+                setting, values = ("hnsw.ef_search", args.ef_search) if index_type == "hnsw" else ("ivfflat.probes", args.probes)
+                results = await sweep(conn, queries, truth, args.k, setting, values)
+                entry["indexes"].append({"type": index_type, "build_s": round(build_s, 2), "results": results})
+
+                print(f"  {index_type} (built in {build_s:.1f}s)")
+                for row in results:
+                    print("    " + "  ".join(f"{key}={value}" for key, value in row.items()))
+            report.append(entry)
+    finally:
+        await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", help="Postgres DSN (defaults to the app settings)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--index", nargs="+", choices=["hnsw", "ivfflat"], default=["hnsw", "ivfflat"])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--m", type=int, default=settings.HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=settings.HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[20, 40, 80, 160])
+    parser.add_argument("--lists", type=int, help="IVFFlat lists (default: rows/1000 up to 1M, sqrt(rows) above)")
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--maintenance-work-mem", default="2GB")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Write the report to this file as JSON")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,152 @@
+"""
+Memory / latency / recall comparison of embedding storage modes:
+vector (float32), halfvec (float16), and each of them with a binary-quantized
+Hamming index for the coarse pass plus exact re-ranking.
+
+Recall is measured against exact float32 search. Needs pgvector >= 0.7.
+Run from backend directory against a pgvector Postgres:
+    python -m benchmarks.vector_storage --size 1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+from app.core.config import settings
+from app.db.vector_index import vector_index_ddl, binary_index_ddl
+from benchmarks.vector_index_recall import DIMENSIONS, LOAD_BATCH, percentile, synthetic_batch
+
+MODES = {
+    "vector": ("vector", False),
+    "halfvec": ("halfvec", False),
+    "vector+binary": ("vector", True),
+    "halfvec+binary": ("halfvec", True),
+}
+
+def query_sql(table: str, storage: str, binary: bool, k: int, rerank_factor: int) -> str:
+    query = f"$1::vector({DIMENSIONS})::{storage}({DIMENSIONS})"
+    if not binary:
+        return f"SELECT id FROM {table} ORDER BY embedding <=> {query} LIMIT {k}"
+    return (
+        f"SELECT id FROM ("
+        f"SELECT id, embedding FROM {table} "
+        f"ORDER BY binary_quantize(embedding)::bit({DIMENSIONS}) <~> binary_quantize({query})::bit({DIMENSIONS}) "
+        f"LIMIT {k * rerank_factor}"
+        f") candidates ORDER BY embedding <=> {query} LIMIT {k}"
+    )
+
+async def relation_mb(conn, name: str, size_function: str = "pg_relation_size") -> float:
+    # pg_table_size includes TOAST, where 768-d float32 vectors end up
+    return round(await conn.fetchval(f"SELECT {size_function}($1::regclass)", name) / 2**20, 1)
+
+async def run(args):
+    dsn = str(settings.SQLALCHEMY_DATABASE_URI).replace("postgresql+asyncpg://", "postgresql://")
+    conn = await asyncpg.connect(args.dsn or dsn)
+    await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    await register_vector(conn)
+    await conn.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(0, 1, (args.clusters, DIMENSIONS)).astype(np.float32)
+    source = "bench_storage_source"
+    tables = [source]
+
+    try:
+        # Float32 source table, also used for the exact ground truth
+        await conn.execute(f"DROP TABLE IF EXISTS {source}")
+        await conn.execute(f"CREATE TABLE {source} (id bigint PRIMARY KEY, embedding vector({DIMENSIONS}))")
+        for offset in range(0, args.size, LOAD_BATCH):
+            batch = synthetic_batch(rng, centers, min(LOAD_BATCH, args.size - offset))
+            await conn.copy_records_to_table(
+                source,
+                records=((offset + i, vector) for i, vector in enumerate(batch)),
+                columns=["id", "embedding"],
+            )
+
+        queries = list(synthetic_batch(rng, centers, args.queries))
+        truth = []
+        async with conn.transaction():
+            await conn.execute("SET LOCAL enable_indexscan = off")
+            for query in queries:
+                rows = await conn.fetch(f"SELECT id FROM {source} ORDER BY embedding <=> $1 LIMIT {args.k}", query)
+                truth.append({row["id"] for row in rows})
+
+        report = {"size": args.size, "k": args.k, "modes": []}
+        for mode in args.modes:
+            storage, binary = MODES[mode]
+            table = f"bench_storage_{storage}"
+            if table not in tables:
+                await conn.execute(f"DROP TABLE IF EXISTS {table}")
+                await conn.execute(
+                    f"CREATE TABLE {table} AS SELECT id, embedding::{storage}({DIMENSIONS}) AS embedding FROM {source}"
+                )
+                await conn.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id)")
+                tables.append(table)
+
+            index = f"{table}_ann"
+            await conn.execute(f"DROP INDEX IF EXISTS {index}")
+            started = time.perf_counter()
+            if binary:
+                await conn.execute(binary_index_ddl(table=table, name=index, m=args.m, ef_construction=args.ef_construction))
+            else:
+                await conn.execute(vector_index_ddl(
+                    "hnsw", table=table, name=index, storage=storage, m=args.m, ef_construction=args.ef_construction,
+                ))
+            build_s = time.perf_counter() - started
+            await conn.execute(f"ANALYZE {table}")
+
+            sql = query_sql(table, storage, binary, args.k, args.rerank_factor)
+            latencies, recalls = [], []
+            async with conn.transaction():
+                ef_search = max(args.ef_search, args.k * args.rerank_factor) if binary else args.ef_search
+                await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+                for query, expected in zip(queries, truth):
+                    started = time.perf_counter()
+                    rows = await conn.fetch(sql, query)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    recalls.append(len(expected.intersection(row["id"] for row in rows)) / args.k)
+
+            result = {
+                "mode": mode,
+                "table_mb": await relation_mb(conn, table, "pg_table_size"),
+                "index_mb": await relation_mb(conn, index),
+                "build_s": round(build_s, 2),
+                f"recall@{args.k}": round(float(np.mean(recalls)), 4),
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p99_ms": round(percentile(latencies, 99), 2),
+            }
+            report["modes"].append(result)
+            print("  ".join(f"{key}={value}" for key, value in result.items()))
+            await conn.execute(f"DROP INDEX IF EXISTS {index}")
+    finally:
+        for table in tables:
+            await conn.execute(f"DROP TABLE IF EXISTS {table}")
+        await conn.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", help="Postgres DSN (defaults to the app settings)")
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--m", type=int, default=settings.HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=settings.HNSW_EF_CONSTRUCTION)
+    parser.add_argument("--ef-search", type=int, default=settings.HNSW_EF_SEARCH)
+    parser.add_argument("--rerank-factor", type=int, default=settings.BINARY_RERANK_FACTOR)
+    parser.add_argument("--maintenance-work-mem", default="2GB")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Write the report to this file as JSON")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,35 @@
+"""
+Run from backend directory (pip install pytest): python -m pytest tests
+Tests needing Postgres (with pgvector) run against TEST_DATABASE_URL, e.g.
+postgresql+asyncpg://postgres@localhost/lms_test, and are skipped without it.
+The database is wiped.
+"""
+import asyncio
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+@pytest.fixture
+def session_maker():
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from app.db.base import Base
+
+    # No pooled connections, so each test can run its own event loop
+    engine = create_async_engine(url, poolclass=NullPool)
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(reset())
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(engine.dispose())
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import pytest
+from app.core.config import settings
+from app.services.ai_client import AIClient, CircuitOpenError, FakeAPIError, FakeBackend
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "AI_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "AI_RETRY_BASE_DELAY", 0.0)
+    monkeypatch.setattr(settings, "AI_BREAKER_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "AI_BREAKER_COOLDOWN", 0.2)
+    monkeypatch.setattr(settings, "AI_RATE_LIMITS", {})
+
+def test_retryable_errors_are_retried_up_to_the_limit():
+    backend = FakeBackend(error_rate=1.0, error_status=503)
+    client = AIClient(backend)
+    with pytest.raises(FakeAPIError):
+        asyncio.run(client.generate_content("model", "hello"))
+    assert len(backend.requests) == 3
+    assert client.metrics["generate_content"].retries == 2
+    assert client.metrics["generate_content"].failures == 3
+
+def test_other_errors_are_not_retried():
+    backend = FakeBackend(error_rate=1.0, error_status=400)
+    client = AIClient(backend)
+    with pytest.raises(FakeAPIError):
+        asyncio.run(client.generate_content("model", "hello"))
+    assert len(backend.requests) == 1
+    assert client.stats()["generate_content"]["circuit"] == "closed"
+
+def test_success_returns_the_backend_result():
+    backend = FakeBackend()
+    client = AIClient(backend)
+    assert asyncio.run(client.embed_content("model", "hello", "retrieval_query"))
+    assert client.metrics["embed_content"].successes == 1
+
+def test_circuit_opens_after_consecutive_failures_and_recovers():
+    backend = FakeBackend(error_rate=1.0, error_status=503)
+    client = AIClient(backend)
+
+    async def scenario():
+        with pytest.raises(FakeAPIError):
+            await client.generate_content("model", "hello")
+        # The third failure opened the circuit: calls fail without reaching the API
+        with pytest.raises(CircuitOpenError):
+            await client.generate_content("model", "hello")
+        assert len(backend.requests) == 3
+        assert client.stats()["generate_content"]["circuit"] == "open"
+
+        # After the cooldown a single trial call goes through, and its success closes the circuit
+        await asyncio.sleep(settings.AI_BREAKER_COOLDOWN)
+        backend.error_rate = 0.0
+        await client.generate_content("model", "hello")
+        assert client.stats()["generate_content"]["circuit"] == "closed"
+
+    asyncio.run(scenario())
+    assert client.metrics["generate_content"].rejected == 1
+
+def test_operation_concurrency_limit(monkeypatch):
+    monkeypatch.setattr(settings, "AI_OPERATION_CONCURRENCY", {"generate_content": 2})
+    backend = FakeBackend(latency=0.1)
+    client = AIClient(backend)
+
+    async def scenario():
+        started = time.perf_counter()
+        await asyncio.gather(*(client.generate_content("model", str(i)) for i in range(4)))
+        return time.perf_counter() - started
+
+    assert asyncio.run(scenario()) >= 0.2
+    assert len(backend.requests) == 4
+
+def test_cancelled_trial_call_releases_the_half_open_circuit(monkeypatch):
+    monkeypatch.setattr(settings, "AI_MAX_RETRIES", 0)
+    monkeypatch.setattr(settings, "AI_BREAKER_THRESHOLD", 1)
+    backend = FakeBackend(error_rate=1.0, error_status=503)
+    client = AIClient(backend)
+
+    async def scenario():
+        with pytest.raises(FakeAPIError):
+            await client.generate_content("model", "hello")
+        await asyncio.sleep(settings.AI_BREAKER_COOLDOWN)
+        assert client.stats()["generate_content"]["circuit"] == "half_open"
+
+        # The trial call is cancelled by its caller's timeout before the API answers
+        backend.error_rate = 0.0
+        backend.latency = 0.2
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.generate_content("model", "hello"), 0.05)
+
+        # The next call becomes the trial, and its success closes the circuit
+        backend.latency = 0.0
+        await client.generate_content("model", "hello")
+        assert client.stats()["generate_content"]["circuit"] == "closed"
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from sqlalchemy import select
+from app.core.config import settings
+from app.crud import jobs as jobs_crud
+from app.models.course import Language, Lesson
+from app.models.user import User, UserRole
+from app.services import playlist_importer
+from app.services.playlist_importer import LocalVideoFetcher, import_playlist_videos, import_youtube_playlist
+
+VIDEO_URLS = [
+    "https://www.youtube.com/watch?v=aaaaaaaaaa1",
+    "https://www.youtube.com/watch?v=aaaaaaaaaa2",
+    "https://www.youtube.com/watch?v=missing0003",
+    "https://www.youtube.com/watch?v=aaaaaaaaaa4",
+    "https://www.youtube.com/watch?v=aaaaaaaaaa5",
+]
+
+@pytest.fixture
+def local_fetcher(monkeypatch):
+    monkeypatch.setattr(settings, "YOUTUBE_FETCHER", "local")
+    # Batches of 2 leave a partial one at the end
+    monkeypatch.setattr(settings, "PLAYLIST_WRITE_BATCH_SIZE", 2)
+    playlist_importer.get_video_fetcher.cache_clear()
+    yield
+    playlist_importer.get_video_fetcher.cache_clear()
+
+async def create_playlist(session_maker) -> dict:
+    async with session_maker() as db:
+        teacher = User(email="teacher@example.com", hashed_password="x", full_name="Teacher", role=UserRole.TEACHER)
+        db.add(teacher)
+        await db.flush()
+        return await import_youtube_playlist(
+            db, "https://www.youtube.com/playlist?list=PL123", "Playlist", "Imported", Language.EN, teacher.id, VIDEO_URLS,
+        )
+
+def test_playlist_import_fills_lessons_from_the_fetcher(session_maker, local_fetcher):
+    async def scenario():
+        created = await create_playlist(session_maker)
+        async with session_maker() as db:
+            job = await jobs_crud.get_job(db, created["job_id"])
+        progress = await import_playlist_videos(job.id, job.payload["module_id"], session_maker)
+
+        async with session_maker() as db:
+            result = await db.execute(
+                select(Lesson.title, Lesson.transcript, Lesson.key_takeaways, Lesson.quiz_questions).order_by(Lesson.order)
+            )
+            lessons = result.all()
+            job = await jobs_crud.get_job(db, created["job_id"])
+        return created, progress, lessons, job
+
+    created, progress, lessons, job = asyncio.run(scenario())
+    assert created["lessons"] == 5
+    assert progress == {"total": 5, "done": 5, "without_transcript": 1, "errors": 0}
+    assert job.progress == progress
+    # Every fetched lesson is written, including the last partial batch
+    assert [lesson.title for lesson in lessons] == [f"Local video {url[-11:]}" for url in VIDEO_URLS]
+    assert [lesson.transcript is not None for lesson in lessons] == [True, True, False, True, True]
+    assert lessons[0].transcript.startswith("Sentence 1 of local video aaaaaaaaaa1.")
+    assert lessons[0].key_takeaways and lessons[0].quiz_questions is not None
+
+def test_retried_import_only_fetches_what_is_missing(session_maker, local_fetcher, monkeypatch):
+    fetched = []
+
+    class RecordingFetcher(LocalVideoFetcher):
+        async def fetch(self, video_url: str) -> dict:
+            fetched.append(video_url)
+            return await super().fetch(video_url)
+
+    monkeypatch.setitem(playlist_importer.VIDEO_FETCHERS, "recording", RecordingFetcher)
+    monkeypatch.setattr(settings, "YOUTUBE_FETCHER", "recording")
+
+    async def scenario():
+        created = await create_playlist(session_maker)
+        async with session_maker() as db:
+            job = await jobs_crud.get_job(db, created["job_id"])
+        await import_playlist_videos(job.id, job.payload["module_id"], session_maker)
+        fetched.clear()
+        return await import_playlist_videos(job.id, job.payload["module_id"], session_maker)
+
+    progress = asyncio.run(scenario())
+    # Only the video without a transcript is tried again
+    assert fetched == [VIDEO_URLS[2]]
+    assert progress == {"total": 5, "done": 5, "without_transcript": 1, "errors": 0}
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import subprocess
+import pytest
+from app.core.config import settings
+from app.services import transcription
+from app.services.transcription import StubTranscriptionModel, plan_segments, stitch_segments, transcribe_lecture
+from app.services.video_processing import get_ffmpeg_binary
+
+def test_plan_segments_cuts_in_the_middle_of_nearby_silences():
+    silences = [(22.0, 25.0), (47.0, 50.0), (72.0, 75.0)]
+    assert plan_segments(100.0, silences, 30, 10) == [(0.0, 23.5), (23.5, 48.5), (48.5, 73.5), (73.5, 100.0)]
+
+def test_plan_segments_without_silences_cuts_at_the_target():
+    assert plan_segments(100.0, [], 30, 10) == [(0.0, 30.0), (30.0, 60.0), (60.0, 90.0), (90.0, 100.0)]
+
+def test_plan_segments_keeps_short_audio_whole():
+    # Up to a quarter over the target is not worth a second segment
+    assert plan_segments(37.0, [], 30, 10) == [(0.0, 37.0)]
+
+def test_stitch_segments_drops_the_overlap():
+    results = [
+        {"offset": 0.0, "start": 0.0, "end": 60.0, "transcript": "one two three four five",
+         "chapters": [{"timestamp": "00:00", "title": "Intro"}]},
+        # Starts 3 seconds early: the first words repeat the end of the previous segment
+        {"offset": 57.0, "start": 60.0, "end": 120.0, "transcript": "Three, four five six seven",
+         "chapters": [{"timestamp": "00:01", "title": "In the overlap"}, {"timestamp": "00:33", "title": "Second"}]},
+    ]
+    transcript, chapters, segments = stitch_segments(results)
+    assert transcript == "one two three four five\n\nsix seven"
+    assert chapters == [{"timestamp": "00:00", "title": "Intro"}, {"timestamp": "01:30", "title": "Second"}]
+    assert [(segment["start"], segment["end"]) for segment in segments] == [(0.0, 60.0), (60.0, 120.0)]
+
+@pytest.fixture
+def lecture(tmp_path):
+    # 100 seconds: 22 s of tone, then 3 s of silence, repeated
+    path = str(tmp_path / "lecture.ogg")
+    try:
+        subprocess.run(
+            [get_ffmpeg_binary(), "-nostdin", "-loglevel", "error", "-f", "lavfi",
+             "-i", "aevalsrc='0.5*sin(440*2*PI*t)*lt(mod(t,25),22)':d=100:s=16000", "-c:a", "libopus", path],
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        pytest.skip(f"ffmpeg unavailable: {e}")
+    return path
+
+@pytest.fixture
+def segmentation(monkeypatch):
+    monkeypatch.setattr(settings, "TRANSCRIPTION_SEGMENT_SECONDS", 30)
+    monkeypatch.setattr(settings, "TRANSCRIPTION_SILENCE_SEARCH", 10)
+    monkeypatch.setattr(transcription, "insights_cache", None)
+
+def test_transcribe_lecture_with_stub_model(lecture, segmentation, tmp_path):
+    model = StubTranscriptionModel()
+    insights = asyncio.run(transcribe_lecture(lecture, str(tmp_path / "work"), model))
+
+    segments = insights["segments"]
+    assert len(segments) == 4
+    assert segments[0]["start"] == 0.0 and segments[-1]["end"] == pytest.approx(100.0, abs=0.5)
+    assert all(previous["end"] == following["start"] for previous, following in zip(segments, segments[1:]))
+    # Each cut falls inside one of the silences
+    assert all(22.0 <= segment["end"] % 25 <= 25.0 for segment in segments[:-1])
+    assert insights["transcript"].startswith("Sentence at 00:00")
+    assert insights["key_takeaways"]
+    assert sorted(model.calls.values()) == [1, 1, 1, 1]
+
+def test_failed_lecture_resumes_from_saved_segments(lecture, segmentation, tmp_path):
+    work_dir = str(tmp_path / "work")
+    model = StubTranscriptionModel(fail_times=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(transcribe_lecture(lecture, work_dir, model))
+    first = asyncio.run(transcribe_lecture(lecture, work_dir, model))
+    assert sorted(model.calls.values()) == [2, 2, 2, 2]
+    assert len([name for name in os.listdir(work_dir) if name.endswith(".json")]) == 4
+
+    # Everything is saved now: nothing is sent again
+    resumed_model = StubTranscriptionModel()
+    assert asyncio.run(transcribe_lecture(lecture, work_dir, resumed_model)) == first
+    assert resumed_model.calls == {}